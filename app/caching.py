@@ -2,7 +2,7 @@ import logging
 import sqlite3
 import threading
 from threading import Lock
-from . import database
+from . import database, snapshot, tagindex
 
 log = logging.getLogger(__name__)
 
@@ -10,11 +10,70 @@ log = logging.getLogger(__name__)
 _tag_counts_cache = {}
 _cache_lock = Lock()
 
+# Role of this process in a multi-worker deployment (see app/leader.py). The leader
+# recomputes tag counts and dashboard totals and writes them to the shared snapshot
+# (see app/snapshot.py) that every worker, itself included, reads. A single process
+# without election is 'standalone' and keeps its own in-memory cache.
+STANDALONE, LEADER, FOLLOWER = 'standalone', 'leader', 'follower'
+_role = STANDALONE
+_reader = None
+REFRESH_INTERVAL = 300
+
+# Sorted tag index for the tag cloud and tags page, rebuilt from each new count and
+# adjusted incrementally by this process's own tag writes in between.
+_tag_index = tagindex.TagIndex()
+_tag_index_version = None
+
+# Until the leader publishes its first snapshot a follower computes the aggregates once
+# itself, like a standalone process does at startup, rather than serving empty counts.
+_fallback_loaded = False
+_fallback_totals = None
+
+def _load_local_fallback():
+    global _tag_counts_cache, _fallback_loaded, _fallback_totals
+    with _cache_lock:
+        if _fallback_loaded:
+            return
+        log.info("No aggregates snapshot yet, calculating them locally.")
+        _tag_counts_cache = _calculate_tag_counts()
+        _fallback_totals = _calculate_totals()
+        _tag_index.load(_tag_counts_cache)
+        _fallback_loaded = True
+
 def get_tag_counts():
-    """Returns a copy of the tag counts from the cache."""
+    """Returns the tag counts: the shared snapshot's as a read-only mapping, or a copy of the cache."""
+    if _reader is not None:
+        current = _reader.current()
+        if current is not None:
+            return current.tag_counts()
+        if _role == FOLLOWER:
+            _load_local_fallback()
     with _cache_lock:
         return _tag_counts_cache.copy()
 
+def get_tag_index():
+    """Returns the tag index, reloading it when the leader has published a new snapshot."""
+    global _tag_index_version
+    if _reader is not None:
+        current = _reader.current()
+        if current is not None and current.version != _tag_index_version:
+            _tag_index.load(current.tag_counts())
+            _tag_index_version = current.version
+        elif current is None and _role == FOLLOWER:
+            _load_local_fallback()
+    return _tag_index
+
+def get_totals():
+    """Returns the dashboard totals from the shared snapshot, or None without one."""
+    if _reader is not None:
+        current = _reader.current()
+        if current is not None:
+            return current.totals()
+        if _role == FOLLOWER:
+            _load_local_fallback()
+            return _fallback_totals
+    return None
+
 def _calculate_tag_counts():
     """Calculates tag counts from the database."""
     log.info("Calculating tag counts from database...")
@@ -36,23 +95,47 @@ def _calculate_tag_counts():
     finally:
         conn.close()
 
+def _calculate_totals():
+    """Reads the photo counters (all, tagged, untagged, new, deleted) for the snapshot."""
+    return database.get_photo_counters()
+
 def update_tag_counts_cache():
-    """Updates the tag counts cache with fresh data from the database."""
+    """Updates the tag counts cache, or as leader the shared snapshot, with fresh data from the database."""
     log.info("Updating tag counts cache...")
     new_counts = _calculate_tag_counts()
+    if _role == LEADER:
+        totals = _calculate_totals()
+        if totals is not None:
+            try:
+                snapshot.write_snapshot(_reader.path, totals, new_counts)
+                log.info("Aggregates snapshot updated.")
+                return
+            except OSError as e:
+                log.error(f"Could not write aggregates snapshot: {e}")
     with _cache_lock:
         global _tag_counts_cache
         _tag_counts_cache = new_counts
+    _tag_index.load(new_counts)
     log.info("Tag counts cache updated.")
 
-def start_background_refresh():
-    """Starts a background timer to refresh the tag counts cache every 5 minutes."""
+def start_background_refresh(role: str = STANDALONE):
+    """
+    Starts a background timer to refresh the tag counts cache every 5 minutes.
+    Followers start no timer: they read the snapshot the leader keeps up to date.
+    """
+    global _role, _reader, _fallback_loaded
+    _role = role
+    _fallback_loaded = False
+    _reader = snapshot.SnapshotReader() if role != STANDALONE else None
+    if role == FOLLOWER:
+        log.info("Reading aggregates from the leader's snapshot.")
+        return
     log.info("Starting background cache refresh timer.")
     # Initial population
     update_tag_counts_cache()
     
     # Schedule periodic updates
-    timer = threading.Timer(300, _background_refresh_task)
+    timer = threading.Timer(REFRESH_INTERVAL, _background_refresh_task)
     timer.daemon = True
     timer.start()
 
@@ -60,6 +143,10 @@ def _background_refresh_task():
     """The task that runs periodically to refresh the cache."""
     update_tag_counts_cache()
     # Reschedule the timer
-    timer = threading.Timer(300, _background_refresh_task)
+    timer = threading.Timer(REFRESH_INTERVAL, _background_refresh_task)
     timer.daemon = True
     timer.start()
+
+def promote_to_leader():
+    """Called when a follower wins the election: from now on this process writes the snapshot."""
+    start_background_refresh(LEADER)
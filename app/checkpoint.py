@@ -0,0 +1,106 @@
+import json
+import logging
+import sqlite3
+from datetime import datetime, timezone
+from . import database
+
+# Durable progress of an index run. Discovery walks directories in a fixed order and
+# records the files it found together with the last directory it completed; the
+# processing stage marks files done in the same transaction that writes their rows.
+# A run killed at any point can therefore continue without re-walking finished
+# directories or re-processing finished files.
+
+class IndexCheckpoint:
+    """Reads and writes the checkpoint of the index run identified by scope."""
+
+    def __init__(self, scope: str):
+        self.scope = scope
+        self.position = None
+        self.phase = None
+
+    def start(self, resume: bool):
+        """
+        Loads the saved checkpoint when resume is set and it belongs to the same scope,
+        otherwise clears it. Returns True if a previous run is being resumed.
+        """
+        conn = database.get_db_connection()
+        try:
+            row = conn.execute("SELECT scope, phase, walk_position FROM index_checkpoint WHERE id = 1").fetchone()
+            if resume and row and row['scope'] == self.scope:
+                self.phase = row['phase']
+                self.position = tuple(json.loads(row['walk_position'])) if row['walk_position'] else None
+                return True
+            if row and row['scope'] != self.scope:
+                logging.info("Discarding checkpoint from an index run over different folders.")
+            conn.execute("DELETE FROM index_checkpoint")
+            conn.execute("DELETE FROM index_checkpoint_files")
+            conn.execute(
+                "INSERT INTO index_checkpoint (id, scope, phase, walk_position, updated) VALUES (1, ?, 'discovery', NULL, ?)",
+                (self.scope, datetime.now(timezone.utc).isoformat())
+            )
+            conn.commit()
+        except sqlite3.Error as e:
+            logging.error(f"Database error when reading index checkpoint: {e}")
+        finally:
+            conn.close()
+        self.phase = 'discovery'
+        self.position = None
+        return False
+
+    def record_discovered(self, files: list, position: tuple):
+        """Durably records discovered (path, dev, inode, size, mtime_ns) rows and the walk position reached."""
+        conn = database.get_db_connection()
+        try:
+            conn.executemany(
+                "INSERT OR REPLACE INTO index_checkpoint_files (path, dev, inode, size, mtime_ns, done) VALUES (?, ?, ?, ?, ?, 0)",
+                files
+            )
+            conn.execute(
+                "UPDATE index_checkpoint SET walk_position = ?, updated = ? WHERE id = 1",
+                (json.dumps(list(position)) if position is not None else None, datetime.now(timezone.utc).isoformat())
+            )
+            conn.commit()
+            self.position = position
+        except sqlite3.Error as e:
+            logging.error(f"Database error when writing discovery checkpoint: {e}")
+        finally:
+            conn.close()
+
+    def set_phase(self, phase: str):
+        self.phase = phase
+        conn = database.get_db_connection()
+        try:
+            conn.execute("UPDATE index_checkpoint SET phase = ?, updated = ? WHERE id = 1", (phase, datetime.now(timezone.utc).isoformat()))
+            conn.commit()
+        except sqlite3.Error as e:
+            logging.error(f"Database error when updating index checkpoint: {e}")
+        finally:
+            conn.close()
+
+    def discovered_files(self):
+        """Returns all files recorded so far as sqlite rows (path, dev, inode, size, mtime_ns, done)."""
+        conn = database.get_db_connection()
+        try:
+            return conn.execute("SELECT path, dev, inode, size, mtime_ns, done FROM index_checkpoint_files ORDER BY rowid").fetchall()
+        except sqlite3.Error as e:
+            logging.error(f"Database error when reading index checkpoint: {e}")
+            return []
+        finally:
+            conn.close()
+
+    @staticmethod
+    def mark_done(conn: sqlite3.Connection, paths: list):
+        """Marks paths processed as part of the caller's transaction."""
+        conn.executemany("UPDATE index_checkpoint_files SET done = 1 WHERE path = ?", [(p,) for p in paths])
+
+    def finish(self):
+        """Removes the checkpoint once a run completes."""
+        conn = database.get_db_connection()
+        try:
+            conn.execute("DELETE FROM index_checkpoint")
+            conn.execute("DELETE FROM index_checkpoint_files")
+            conn.commit()
+        except sqlite3.Error as e:
+            logging.error(f"Database error when clearing index checkpoint: {e}")
+        finally:
+            conn.close()
@@ -1,3 +1,4 @@
+import re
 import sqlite3
 import logging
 import os
@@ -15,6 +16,483 @@ def get_db_connection(db_path: str = None):
     conn.row_factory = sqlite3.Row
     return conn
 
+# Optional normalized path storage, enabled once with `indexer.py normalize-paths`.
+# Photos then live in photo_files with a directory id and a filename, and each folder
+# path is stored once in directories. The photos view joins them back into the usual
+# columns, path included, and its INSTEAD OF triggers route writes to photo_files, so
+# code and scripts written against photos keep working. Folder paths keep their
+# trailing '/', so a path is its folder followed by its filename and moving a folder
+# updates one directories row.
+
+# SQL for the folder part of a path: rtrim() with every non-slash character of the
+# path strips the filename.
+_FOLDER = "rtrim({0}, replace({0}, '/', ''))"
+
+def is_normalized(conn: sqlite3.Connection) -> bool:
+    """True if photos is the view over normalized path storage."""
+    row = conn.execute("SELECT type FROM sqlite_master WHERE name = 'photos'").fetchone()
+    return row is not None and row[0] == 'view'
+
+def split_path(path: str):
+    """Splits a path into its folder (ending in '/', or empty) and filename."""
+    path = str(path)
+    cut = path.rfind('/') + 1
+    return path[:cut], path[cut:]
+
+def path_condition(conn: sqlite3.Connection, path: str):
+    """WHERE clause and parameters that find a photo by path through an index in either storage mode."""
+    if is_normalized(conn):
+        folder, filename = split_path(path)
+        return "directory_id = (SELECT id FROM directories WHERE path = ?) AND filename = ?", (folder, filename)
+    return "path = ?", (str(path),)
+
+def _photo_file_columns(conn: sqlite3.Connection):
+    """PRAGMA table_xinfo rows of photo_files, less id, directory_id and filename. row[6] is non-zero for generated columns."""
+    return [row for row in conn.execute("PRAGMA table_xinfo(photo_files)") if row[1] not in ('id', 'directory_id', 'filename')]
+
+def _create_photos_view(conn: sqlite3.Connection):
+    """(Re)creates the photos view and its write triggers over the current photo_files columns."""
+    columns = _photo_file_columns(conn)
+    names = [row[1] for row in columns]
+    # Generated columns are shown by the view but never written
+    columns = [row for row in columns if not row[6]]
+    writable = [row[1] for row in columns]
+    folder = _FOLDER.format('NEW.path')
+    conn.execute("DROP VIEW IF EXISTS photos")
+    conn.execute(f"""
+        CREATE VIEW photos AS
+        SELECT f.id AS id, d.path || f.filename AS path, {', '.join(f'f.{name} AS {name}' for name in names)},
+            f.directory_id AS directory_id, f.filename AS filename
+        FROM photo_files f JOIN directories d ON d.id = f.directory_id
+    """)
+    # A view has no column defaults, so apply photo_files' own
+    values = [f"coalesce(NEW.{row[1]}, {row[4]})" if row[4] is not None else f"NEW.{row[1]}" for row in columns]
+    conn.execute(f"""
+        CREATE TRIGGER photos_view_insert INSTEAD OF INSERT ON photos BEGIN
+            INSERT INTO directories (path) SELECT {folder} WHERE NOT EXISTS (SELECT 1 FROM directories WHERE path = {folder});
+            INSERT INTO photo_files (id, directory_id, filename, {', '.join(writable)})
+            VALUES (NEW.id, (SELECT id FROM directories WHERE path = {folder}), substr(NEW.path, length({folder}) + 1), {', '.join(values)});
+        END;
+    """)
+    # One statement per column, so the column triggers on photo_files fire only for real changes
+    updates = '\n'.join(f"UPDATE photo_files SET {name} = NEW.{name} WHERE id = OLD.id AND NEW.{name} IS NOT OLD.{name};" for name in writable)
+    conn.execute(f"""
+        CREATE TRIGGER photos_view_update INSTEAD OF UPDATE ON photos BEGIN
+            INSERT INTO directories (path) SELECT {folder}
+                WHERE NEW.path IS NOT OLD.path AND NOT EXISTS (SELECT 1 FROM directories WHERE path = {folder});
+            UPDATE photo_files SET directory_id = (SELECT id FROM directories WHERE path = {folder}), filename = substr(NEW.path, length({folder}) + 1)
+                WHERE id = OLD.id AND NEW.path IS NOT OLD.path;
+            {updates}
+        END;
+    """)
+    conn.execute("CREATE TRIGGER photos_view_delete INSTEAD OF DELETE ON photos BEGIN DELETE FROM photo_files WHERE id = OLD.id; END;")
+
+def normalize_paths(db_path: str = None) -> bool:
+    """
+    Moves the photos table into normalized path storage (directories + photo_files
+    behind a photos view). Photo ids are kept. Returns False if the migration failed.
+    """
+    conn = get_db_connection(db_path)
+    try:
+        if is_normalized(conn):
+            logging.info("Photo paths are already normalized.")
+            return True
+        logging.info("Normalizing photo paths...")
+        columns = [row for row in conn.execute("PRAGMA table_info(photos)") if row['name'] not in ('id', 'path')]
+        definitions = [
+            f"{row['name']} {row['type']}" + (" NOT NULL" if row['notnull'] else "") + (f" DEFAULT {row['dflt_value']}" if row['dflt_value'] is not None else "")
+            for row in columns
+        ]
+        names = [row['name'] for row in columns]
+        conn.execute("BEGIN")
+        conn.execute("CREATE TABLE IF NOT EXISTS directories (id INTEGER PRIMARY KEY, path TEXT NOT NULL UNIQUE);")
+        conn.execute(f"""
+            CREATE TABLE photo_files (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                directory_id INTEGER NOT NULL REFERENCES directories (id),
+                filename TEXT NOT NULL,
+                {', '.join(definitions)},
+                UNIQUE (directory_id, filename)
+            );
+        """)
+        conn.execute(f"INSERT OR IGNORE INTO directories (path) SELECT DISTINCT {_FOLDER.format('path')} FROM photos")
+        conn.execute(f"""
+            INSERT INTO photo_files (id, directory_id, filename, {', '.join(names)})
+            SELECT p.id, d.id, substr(p.path, length(d.path) + 1), {', '.join(f'p.{name}' for name in names)}
+            FROM photos p JOIN directories d ON d.path = {_FOLDER.format('p.path')}
+        """)
+        # Dropping photos also drops its indexes and triggers; init_db recreates them on photo_files
+        conn.execute("DROP TABLE photos")
+        _create_photos_view(conn)
+        conn.commit()
+        logging.info("Photo paths normalized.")
+    except sqlite3.Error as e:
+        conn.rollback()
+        logging.error(f"Failed to normalize photo paths: {e}")
+        return False
+    finally:
+        conn.close()
+    init_db(db_path)
+    return True
+
+def move_directory(old_path: str, new_path: str, conn: sqlite3.Connection = None):
+    """
+    Points every photo under folder old_path, subfolders included, at new_path. With
+    normalized paths this rewrites one directories row per folder rather than every
+    photo row. Returns the number of rows updated, or None on error.
+    """
+    own_conn = conn is None
+    if own_conn:
+        conn = get_db_connection()
+    old_prefix, new_prefix = str(old_path).rstrip('/') + '/', str(new_path).rstrip('/') + '/'
+    # Paths under old_prefix sort from it up to the same prefix with its '/' bumped to '0'
+    upper = old_prefix[:-1] + '0'
+    try:
+        table = 'directories' if is_normalized(conn) else 'photos'
+        cursor = conn.execute(
+            f"UPDATE {table} SET path = ? || substr(path, ?) WHERE path >= ? AND path < ?",
+            (new_prefix, len(old_prefix) + 1, old_prefix, upper)
+        )
+        if own_conn:
+            conn.commit()
+        logging.info(f"Moved {cursor.rowcount} {table} rows from {old_prefix} to {new_prefix}")
+        return cursor.rowcount
+    except sqlite3.Error as e:
+        logging.error(f"Database error when moving folder {old_prefix}: {e}")
+        return None
+    finally:
+        if own_conn:
+            conn.close()
+
+# Materialized counters for the dashboard and slideshow pages. Triggers on photos keep
+# them in step with every write (web app, indexer and scripts alike) inside the
+# writer's own transaction, so pages read them instead of scanning photos.
+PHOTO_COUNTERS = ('total', 'tagged', 'untagged', 'new', 'deleted')
+# Whitespace stripped from tag names, like str.strip() does for the common cases
+_TAG_WHITESPACE = "' ' || char(9) || char(10) || char(13)"
+
+def _tags_json(tags: str):
+    """SQL expression turning a comma-separated tags column into a JSON array for json_each."""
+    escaped = f"replace(replace(replace(replace({tags}, '\\', '\\\\'), '\"', '\\\"'), char(10), '\\n'), char(13), '\\r')"
+    array = f"""'["' || replace({escaped}, ',', '","') || '"]'"""
+    return f"(CASE WHEN {tags} IS NOT NULL AND {tags} != '' AND json_valid({array}) THEN {array} ELSE '[]' END)"
+
+def tag_condition(tag: str):
+    """WHERE clause and parameters selecting the photos tag_counters counts under tag."""
+    return (f"EXISTS (SELECT 1 FROM json_each({_tags_json('tags')}) WHERE trim(value, {_TAG_WHITESPACE}) = ?)", (tag.strip(),))
+
+def _counter_updates(row: str, sign: int):
+    """Trigger statements adding (sign=1) or removing (sign=-1) the NEW or OLD row from the counters."""
+    return f"""
+        UPDATE photo_counters SET count = count + ({sign}) WHERE name = 'total';
+        UPDATE photo_counters SET count = count + ({sign})
+            WHERE name = CASE WHEN {row}.tags IS NOT NULL AND {row}.tags != '' THEN 'tagged' ELSE 'untagged' END;
+        UPDATE photo_counters SET count = count + ({sign})
+            WHERE name = 'new' AND {row}.datetime_added IS NOT NULL AND {row}.datetime_added != '';
+        UPDATE photo_counters SET count = count + ({sign})
+            WHERE name = 'deleted' AND {row}.datetime_deleted IS NOT NULL AND {row}.datetime_deleted != '';
+        INSERT INTO tag_counters (tag, count)
+            SELECT trim(value, {_TAG_WHITESPACE}), {sign} FROM json_each({_tags_json(f'{row}.tags')}) WHERE trim(value, {_TAG_WHITESPACE}) != ''
+            ON CONFLICT (tag) DO UPDATE SET count = count + excluded.count;
+    """
+
+def _create_counters(conn: sqlite3.Connection, table: str = 'photos'):
+    conn.execute("CREATE TABLE IF NOT EXISTS photo_counters (name TEXT PRIMARY KEY, count INTEGER NOT NULL) WITHOUT ROWID;")
+    conn.execute("CREATE TABLE IF NOT EXISTS tag_counters (tag TEXT PRIMARY KEY, count INTEGER NOT NULL) WITHOUT ROWID;")
+    conn.execute(f"CREATE TRIGGER IF NOT EXISTS photo_counters_insert AFTER INSERT ON {table} BEGIN {_counter_updates('NEW', 1)} END;")
+    conn.execute(f"CREATE TRIGGER IF NOT EXISTS photo_counters_delete AFTER DELETE ON {table} BEGIN {_counter_updates('OLD', -1)} END;")
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS photo_counters_update AFTER UPDATE OF tags, datetime_added, datetime_deleted ON {table}
+        BEGIN {_counter_updates('OLD', -1)} {_counter_updates('NEW', 1)} END;
+    """)
+    if conn.execute("SELECT COUNT(*) FROM photo_counters").fetchone()[0] == 0:
+        rebuild_counters(conn)
+
+def rebuild_counters(conn: sqlite3.Connection):
+    """Recomputes all counters from the photos table. The caller commits."""
+    logging.info("Rebuilding photo counters...")
+    conn.execute("DELETE FROM photo_counters")
+    conn.execute("DELETE FROM tag_counters")
+    conn.execute("""
+        INSERT INTO photo_counters (name, count)
+        SELECT 'total', COUNT(*) FROM photos
+        UNION ALL SELECT 'tagged', COUNT(*) FROM photos WHERE tags IS NOT NULL AND tags != ''
+        UNION ALL SELECT 'untagged', COUNT(*) FROM photos WHERE tags IS NULL OR tags = ''
+        UNION ALL SELECT 'new', COUNT(*) FROM photos WHERE datetime_added IS NOT NULL AND datetime_added != ''
+        UNION ALL SELECT 'deleted', COUNT(*) FROM photos WHERE datetime_deleted IS NOT NULL AND datetime_deleted != ''
+    """)
+    conn.execute(f"""
+        INSERT INTO tag_counters (tag, count)
+        SELECT trim(j.value, {_TAG_WHITESPACE}), COUNT(*) FROM photos, json_each({_tags_json('photos.tags')}) AS j
+        WHERE trim(j.value, {_TAG_WHITESPACE}) != '' GROUP BY 1
+    """)
+
+# Full-text index over tags, file basenames and folder names for /search/photos. Like
+# the counters it is kept current by triggers, so the indexer's inserts and moves and
+# the web app's tag writes all update it. Its rowid is the photo id.
+SEARCH_WEIGHTS = (10.0, 5.0, 2.0)  # bm25 weights for the tags, filename and folders columns
+
+def _search_columns(row: str, normalized: bool = False):
+    """SQL expressions for the tags, filename and folders of the NEW or OLD row."""
+    tags = f"replace(coalesce({row}.tags, ''), ',', ' ')"
+    if normalized:
+        return f"{tags}, {row}.filename, (SELECT path FROM directories WHERE id = {row}.directory_id)"
+    folder = _FOLDER.format(f"{row}.path")
+    return f"{tags}, substr({row}.path, length({folder}) + 1), {folder}"
+
+def _create_search_index(conn: sqlite3.Connection, table: str = 'photos'):
+    try:
+        conn.execute("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS photos_fts USING fts5(
+                tags, filename, folders, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'
+            );
+        """)
+    except sqlite3.OperationalError as e:
+        logging.warning(f"Full-text search is unavailable (SQLite without FTS5?): {e}")
+        return
+    normalized = table == 'photo_files'
+    path_columns = "directory_id, filename" if normalized else "path"
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS photos_fts_insert AFTER INSERT ON {table} BEGIN
+            INSERT INTO photos_fts (rowid, tags, filename, folders) VALUES (NEW.id, {_search_columns('NEW', normalized)});
+        END;
+    """)
+    conn.execute(f"CREATE TRIGGER IF NOT EXISTS photos_fts_delete AFTER DELETE ON {table} BEGIN DELETE FROM photos_fts WHERE rowid = OLD.id; END;")
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS photos_fts_update AFTER UPDATE OF tags, {path_columns} ON {table} BEGIN
+            DELETE FROM photos_fts WHERE rowid = OLD.id;
+            INSERT INTO photos_fts (rowid, tags, filename, folders) VALUES (NEW.id, {_search_columns('NEW', normalized)});
+        END;
+    """)
+    if normalized:
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS photos_fts_directory_update AFTER UPDATE OF path ON directories BEGIN
+                DELETE FROM photos_fts WHERE rowid IN (SELECT id FROM photo_files WHERE directory_id = NEW.id);
+                INSERT INTO photos_fts (rowid, tags, filename, folders)
+                    SELECT f.id, {_search_columns('f', normalized)} FROM photo_files f WHERE f.directory_id = NEW.id;
+            END;
+        """)
+    if conn.execute("SELECT NOT EXISTS (SELECT 1 FROM photos_fts)").fetchone()[0]:
+        logging.info("Building full-text search index...")
+        conn.execute(f"INSERT INTO photos_fts (rowid, tags, filename, folders) SELECT photos.id, {_search_columns('photos')} FROM photos")
+
+def _search_expression(query: str):
+    """Turns free text into an FTS5 query matching every word as a prefix, or None if it has no words."""
+    words = re.findall(r'\w+', query)
+    return ' '.join(f'"{word}"*' for word in words) or None
+
+def search_photos(query: str, limit: int, offset: int = 0):
+    """
+    Returns (total, rows) of the photos not marked deleted whose tags, filename or folders
+    contain every word of query, best matches first. Returns None if the index is unavailable.
+    """
+    expression = _search_expression(query)
+    if expression is None:
+        return 0, []
+    weights = ', '.join(str(weight) for weight in SEARCH_WEIGHTS)
+    conn = get_db_connection()
+    try:
+        matches = """
+            FROM photos_fts JOIN photos ON photos.id = photos_fts.rowid
+            WHERE photos_fts MATCH ? AND (photos.datetime_deleted IS NULL OR photos.datetime_deleted = '')
+        """
+        total = conn.execute(f"SELECT COUNT(*) {matches}", (expression,)).fetchone()[0]
+        rows = conn.execute(
+            f"SELECT photos.* {matches} ORDER BY bm25(photos_fts, {weights}), photos.id LIMIT ? OFFSET ?",
+            (expression, limit, offset)
+        ).fetchall()
+        return total, rows
+    except sqlite3.Error as e:
+        logging.error(f"Database error when searching photos: {e}")
+        return None
+    finally:
+        conn.close()
+
+# Photos per folder, not counting those marked deleted, for folder browsing (see
+# app/folders.py). Keyed by folder path with its trailing '/', so a subtree is the range
+# of keys starting with its path. Only folders that directly contain photos have rows.
+_NOT_DELETED = "({0}.datetime_deleted IS NULL OR {0}.datetime_deleted = '')"
+
+def _folder_of(row: str, normalized: bool):
+    if normalized:
+        return f"(SELECT path FROM directories WHERE id = {row}.directory_id)"
+    return _FOLDER.format(f"{row}.path")
+
+def _folder_counter_update(row: str, sign: int, normalized: bool):
+    return f"""
+        INSERT INTO folder_counters (path, count) SELECT {_folder_of(row, normalized)}, {sign} WHERE {_NOT_DELETED.format(row)}
+        ON CONFLICT (path) DO UPDATE SET count = count + excluded.count;
+    """
+
+def _create_folder_counters(conn: sqlite3.Connection, table: str = 'photos'):
+    normalized = table == 'photo_files'
+    path_columns = "directory_id, filename" if normalized else "path"
+    conn.execute("CREATE TABLE IF NOT EXISTS folder_counters (path TEXT PRIMARY KEY, count INTEGER NOT NULL) WITHOUT ROWID;")
+    conn.execute(f"CREATE TRIGGER IF NOT EXISTS folder_counters_insert AFTER INSERT ON {table} BEGIN {_folder_counter_update('NEW', 1, normalized)} END;")
+    conn.execute(f"CREATE TRIGGER IF NOT EXISTS folder_counters_delete AFTER DELETE ON {table} BEGIN {_folder_counter_update('OLD', -1, normalized)} END;")
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS folder_counters_update AFTER UPDATE OF {path_columns}, datetime_deleted ON {table}
+        BEGIN {_folder_counter_update('OLD', -1, normalized)} {_folder_counter_update('NEW', 1, normalized)} END;
+    """)
+    if normalized:
+        # A folder move renames its directories rows; merge their counts into the new paths
+        conn.execute("""
+            CREATE TRIGGER IF NOT EXISTS folder_counters_directory_update AFTER UPDATE OF path ON directories BEGIN
+                INSERT INTO folder_counters (path, count) SELECT NEW.path, count FROM folder_counters WHERE path = OLD.path
+                ON CONFLICT (path) DO UPDATE SET count = count + excluded.count;
+                DELETE FROM folder_counters WHERE path = OLD.path;
+            END;
+        """)
+    if conn.execute("SELECT NOT EXISTS (SELECT 1 FROM folder_counters)").fetchone()[0]:
+        conn.execute(f"""
+            INSERT INTO folder_counters (path, count)
+            SELECT {_FOLDER.format('path')}, COUNT(*) FROM photos WHERE {_NOT_DELETED.format('photos')} GROUP BY 1
+        """)
+
+# Date parts of an ISO datetime_taken ('YYYY-MM-DDTHH:MM:SS'), NULL when it is missing
+# or malformed. taken_month_day is month * 100 + day, e.g. 704 for 4 July.
+_VALID_DATE = "{0} GLOB '[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]*'"
+TAKEN_DATE_COLUMNS = {
+    'taken_year': f"CASE WHEN {_VALID_DATE} THEN CAST(substr({{0}}, 1, 4) AS INTEGER) END",
+    'taken_month': f"CASE WHEN {_VALID_DATE} THEN CAST(substr({{0}}, 6, 2) AS INTEGER) END",
+    'taken_month_day': f"CASE WHEN {_VALID_DATE} THEN CAST(substr({{0}}, 6, 2) || substr({{0}}, 9, 2) AS INTEGER) END",
+}
+
+# Photos per year and month taken, not counting those marked deleted, for /timeline.
+def _timeline_counter_update(row: str, sign: int):
+    taken = f"{row}.datetime_taken"
+    return f"""
+        INSERT INTO timeline_counters (year, month, count)
+            SELECT {TAKEN_DATE_COLUMNS['taken_year'].format(taken)}, {TAKEN_DATE_COLUMNS['taken_month'].format(taken)}, {sign}
+            WHERE {_VALID_DATE.format(taken)} AND {_NOT_DELETED.format(row)}
+        ON CONFLICT (year, month) DO UPDATE SET count = count + excluded.count;
+    """
+
+def _create_timeline_counters(conn: sqlite3.Connection, table: str = 'photos'):
+    conn.execute("CREATE TABLE IF NOT EXISTS timeline_counters (year INTEGER, month INTEGER, count INTEGER NOT NULL, PRIMARY KEY (year, month)) WITHOUT ROWID;")
+    conn.execute(f"CREATE TRIGGER IF NOT EXISTS timeline_counters_insert AFTER INSERT ON {table} BEGIN {_timeline_counter_update('NEW', 1)} END;")
+    conn.execute(f"CREATE TRIGGER IF NOT EXISTS timeline_counters_delete AFTER DELETE ON {table} BEGIN {_timeline_counter_update('OLD', -1)} END;")
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS timeline_counters_update AFTER UPDATE OF datetime_taken, datetime_deleted ON {table}
+        BEGIN {_timeline_counter_update('OLD', -1)} {_timeline_counter_update('NEW', 1)} END;
+    """)
+    if conn.execute("SELECT NOT EXISTS (SELECT 1 FROM timeline_counters)").fetchone()[0]:
+        conn.execute(f"""
+            INSERT INTO timeline_counters (year, month, count)
+            SELECT taken_year, taken_month, COUNT(*) FROM photos
+            WHERE taken_year IS NOT NULL AND {_NOT_DELETED.format('photos')} GROUP BY 1, 2
+        """)
+
+# Numeric coordinates parsed from the 'lat,lon' geolocation text, NULL when it is
+# missing or out of range.
+_LATITUDE = "CAST(trim(substr({0}, 1, instr({0}, ',') - 1)) AS REAL)"
+_LONGITUDE = "CAST(trim(substr({0}, instr({0}, ',') + 1)) AS REAL)"
+_VALID_LOCATION = (f"{{0}} GLOB '*[0-9]*,*[0-9]*' AND {_LATITUDE} BETWEEN -90 AND 90 AND {_LONGITUDE} BETWEEN -180 AND 180")
+# Displayed width / height, with the sides swapped when the EXIF orientation turns the
+# image a quarter turn, for orientation and aspect ratio filters (see app/shape.py).
+ASPECT_RATIO = "CASE WHEN width > 0 AND height > 0 THEN CASE WHEN exif_orientation BETWEEN 5 AND 8 THEN CAST(height AS REAL) / width ELSE CAST(width AS REAL) / height END END"
+
+GEO_COLUMNS = {
+    'latitude': f"CASE WHEN {_VALID_LOCATION} THEN {_LATITUDE} END",
+    'longitude': f"CASE WHEN {_VALID_LOCATION} THEN {_LONGITUDE} END",
+}
+
+# Photo points in an R*Tree for radius and bounding box queries, and photo counts with
+# coordinate sums per grid cell at each level for map clusters (see app/geo.py). Level
+# n divides the world into 2^n x 2^n cells. Photos marked deleted are not clustered.
+GEO_CLUSTER_LEVELS = 18
+_LEVELS = '[' + ','.join(str(level) for level in range(GEO_CLUSTER_LEVELS)) + ']'
+
+def _geo_cluster_update(row: str, sign: int):
+    return f"""
+        INSERT INTO geo_clusters (level, cell_y, cell_x, count, latitude_sum, longitude_sum)
+            SELECT level.value,
+                min(CAST(({row}.latitude + 90.0) * (1 << level.value) / 180.0 AS INTEGER), (1 << level.value) - 1),
+                min(CAST(({row}.longitude + 180.0) * (1 << level.value) / 360.0 AS INTEGER), (1 << level.value) - 1),
+                {sign}, {sign} * {row}.latitude, {sign} * {row}.longitude
+            FROM json_each('{_LEVELS}') AS level
+            WHERE {row}.latitude IS NOT NULL AND {_NOT_DELETED.format(row)}
+        ON CONFLICT (level, cell_y, cell_x) DO UPDATE SET
+            count = count + excluded.count,
+            latitude_sum = latitude_sum + excluded.latitude_sum,
+            longitude_sum = longitude_sum + excluded.longitude_sum;
+    """
+
+def _location_insert(row: str):
+    return f"""
+        INSERT INTO photo_locations (id, min_lat, max_lat, min_lon, max_lon)
+            SELECT {row}.id, {row}.latitude, {row}.latitude, {row}.longitude, {row}.longitude WHERE {row}.latitude IS NOT NULL;
+    """
+
+def _create_geo_index(conn: sqlite3.Connection, table: str = 'photos'):
+    try:
+        conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS photo_locations USING rtree(id, min_lat, max_lat, min_lon, max_lon);")
+    except sqlite3.OperationalError as e:
+        logging.warning(f"Geospatial index is unavailable (SQLite without R*Tree?): {e}")
+        return
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS geo_clusters (
+            level INTEGER, cell_y INTEGER, cell_x INTEGER,
+            count INTEGER NOT NULL, latitude_sum REAL NOT NULL, longitude_sum REAL NOT NULL,
+            PRIMARY KEY (level, cell_y, cell_x)
+        ) WITHOUT ROWID;
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS geo_index_insert AFTER INSERT ON {table}
+        BEGIN {_location_insert('NEW')} {_geo_cluster_update('NEW', 1)} END;
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS geo_index_delete AFTER DELETE ON {table}
+        BEGIN DELETE FROM photo_locations WHERE id = OLD.id; {_geo_cluster_update('OLD', -1)} END;
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS geo_index_update AFTER UPDATE OF geolocation, datetime_deleted ON {table} BEGIN
+            DELETE FROM photo_locations WHERE id = OLD.id;
+            {_location_insert('NEW')}
+            {_geo_cluster_update('OLD', -1)} {_geo_cluster_update('NEW', 1)}
+        END;
+    """)
+    if conn.execute("SELECT NOT EXISTS (SELECT 1 FROM photo_locations)").fetchone()[0]:
+        conn.execute("""
+            INSERT INTO photo_locations (id, min_lat, max_lat, min_lon, max_lon)
+            SELECT id, latitude, latitude, longitude, longitude FROM photos WHERE latitude IS NOT NULL
+        """)
+        conn.execute("DELETE FROM geo_clusters")
+        conn.execute(f"""
+            INSERT INTO geo_clusters (level, cell_y, cell_x, count, latitude_sum, longitude_sum)
+            SELECT level.value,
+                min(CAST((latitude + 90.0) * (1 << level.value) / 180.0 AS INTEGER), (1 << level.value) - 1),
+                min(CAST((longitude + 180.0) * (1 << level.value) / 360.0 AS INTEGER), (1 << level.value) - 1),
+                COUNT(*), SUM(latitude), SUM(longitude)
+            FROM photos, json_each('{_LEVELS}') AS level
+            WHERE latitude IS NOT NULL AND {_NOT_DELETED.format('photos')}
+            GROUP BY 1, 2, 3
+        """)
+
+def get_photo_counters():
+    """Returns the photo counters by name, or None if they are unavailable."""
+    conn = get_db_connection()
+    try:
+        counters = {row['name']: row['count'] for row in conn.execute("SELECT name, count FROM photo_counters")}
+        return counters if len(counters) == len(PHOTO_COUNTERS) else None
+    except sqlite3.Error as e:
+        logging.error(f"Database error when reading photo counters: {e}")
+        return None
+    finally:
+        conn.close()
+
+def get_tag_count(tag: str):
+    """Returns the number of photos tagged with tag, or None if the counters are unavailable."""
+    conn = get_db_connection()
+    try:
+        row = conn.execute("SELECT count FROM tag_counters WHERE tag = ?", (tag.strip(),)).fetchone()
+        return row['count'] if row else 0
+    except sqlite3.Error as e:
+        logging.error(f"Database error when reading tag counter: {e}")
+        return None
+    finally:
+        conn.close()
+
 def init_db(db_path: str = None):
     """Initializes the database and handles schema migrations."""
     logging.info(f"Initializing database at {get_db_path(db_path)}")
@@ -38,24 +516,132 @@ def init_db(db_path: str = None):
 
         # Check for and add missing columns (simple migration)
         cursor = conn.cursor()
-        cursor.execute("PRAGMA table_info(photos)")
+        cursor.execute("PRAGMA table_xinfo(photos)")
         columns = [row['name'] for row in cursor.fetchall()]
+        # With normalized paths, columns live in photo_files behind the photos view
+        table = 'photo_files' if is_normalized(conn) else 'photos'
         
         if 'datetime_added' not in columns:
             logging.info("Adding 'datetime_added' column to photos table.")
-            conn.execute("ALTER TABLE photos ADD COLUMN datetime_added TEXT;")
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN datetime_added TEXT;")
 
         if 'md5sum' not in columns:
             logging.info("Adding 'md5sum' column to photos table.")
-            conn.execute("ALTER TABLE photos ADD COLUMN md5sum TEXT;")
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN md5sum TEXT;")
 
         if 'metadata_extraction_attempts' not in columns:
             logging.info("Adding 'metadata_extraction_attempts' column to photos table.")
-            conn.execute("ALTER TABLE photos ADD COLUMN metadata_extraction_attempts INTEGER DEFAULT 0;")
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN metadata_extraction_attempts INTEGER DEFAULT 0;")
         
         if 'datetime_deleted' not in columns:
             logging.info("Adding 'datetime_deleted' column to photos table.")
-            conn.execute("ALTER TABLE photos ADD COLUMN datetime_deleted TEXT;")
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN datetime_deleted TEXT;")
+
+        # File fingerprint and quick-hash used for cheap change, move and duplicate detection
+        if 'file_size' not in columns:
+            logging.info("Adding 'file_size' column to photos table.")
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN file_size INTEGER;")
+
+        if 'file_mtime_ns' not in columns:
+            logging.info("Adding 'file_mtime_ns' column to photos table.")
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN file_mtime_ns INTEGER;")
+
+        if 'quick_hash' not in columns:
+            logging.info("Adding 'quick_hash' column to photos table.")
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN quick_hash TEXT;")
+
+        if 'exif_orientation' not in columns:
+            logging.info("Adding 'exif_orientation' column to photos table.")
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN exif_orientation INTEGER;")
+
+        if 'aspect_ratio' not in columns:
+            logging.info("Adding 'aspect_ratio' column to photos table.")
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN aspect_ratio REAL GENERATED ALWAYS AS ({ASPECT_RATIO}) VIRTUAL;")
+        conn.execute(f"CREATE INDEX IF NOT EXISTS idx_photos_aspect_ratio ON {table} (aspect_ratio);")
+
+        # Place name reverse geocoded from geolocation by the indexer, see app/geocode.py
+        if 'place' not in columns:
+            logging.info("Adding 'place' column to photos table.")
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN place TEXT;")
+
+        conn.execute(f"CREATE INDEX IF NOT EXISTS idx_photos_quick_hash ON {table} (quick_hash);")
+
+        # Date parts of datetime_taken for the timeline and date sequences (see app/timeline.py)
+        for name, expression in TAKEN_DATE_COLUMNS.items():
+            if name not in columns and 'datetime_taken' in columns:
+                logging.info(f"Adding '{name}' column to photos table.")
+                conn.execute(f"ALTER TABLE {table} ADD COLUMN {name} INTEGER GENERATED ALWAYS AS ({expression.format('datetime_taken')}) VIRTUAL;")
+        # Coordinates parsed from geolocation for the geospatial index
+        for name, expression in GEO_COLUMNS.items():
+            if name not in columns and 'geolocation' in columns:
+                logging.info(f"Adding '{name}' column to photos table.")
+                conn.execute(f"ALTER TABLE {table} ADD COLUMN {name} REAL GENERATED ALWAYS AS ({expression.format('geolocation')}) VIRTUAL;")
+        if 'datetime_taken' in columns:
+            conn.execute(f"CREATE INDEX IF NOT EXISTS idx_photos_taken_year ON {table} (taken_year, datetime_taken);")
+            conn.execute(f"CREATE INDEX IF NOT EXISTS idx_photos_taken_month_day ON {table} (taken_month_day, datetime_taken);")
+        if table == 'photo_files':
+            _create_photos_view(conn)
+
+        # Content hashes keyed by file identity, shared by the indexer and importphotos.py
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS hash_cache (
+                dev INTEGER NOT NULL,
+                inode INTEGER NOT NULL,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                md5sum TEXT,
+                quick_hash TEXT,
+                PRIMARY KEY (dev, inode, size, mtime_ns)
+            ) WITHOUT ROWID;
+        """)
+
+        # Progress of the current or last index run, see app/indexstatus.py
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS index_status (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                pid INTEGER,
+                phase TEXT,
+                started TEXT,
+                heartbeat TEXT,
+                finished TEXT,
+                discovered INTEGER,
+                total INTEGER,
+                processed INTEGER,
+                rate REAL,
+                eta TEXT
+            );
+        """)
+
+        # Durable progress of an interrupted index run, see app/checkpoint.py
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS index_checkpoint (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                scope TEXT NOT NULL,
+                phase TEXT NOT NULL,
+                walk_position TEXT,
+                updated TEXT
+            );
+        """)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS index_checkpoint_files (
+                path TEXT PRIMARY KEY,
+                dev INTEGER,
+                inode INTEGER,
+                size INTEGER,
+                mtime_ns INTEGER,
+                done INTEGER NOT NULL DEFAULT 0
+            );
+        """)
+
+        # Place names by coordinates rounded to geocode.CACHE_PRECISION decimal places
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS place_cache (
+                lat_key INTEGER NOT NULL,
+                lon_key INTEGER NOT NULL,
+                place TEXT NOT NULL,
+                PRIMARY KEY (lat_key, lon_key)
+            ) WITHOUT ROWID;
+        """)
 
         conn.commit()
 
@@ -78,17 +664,43 @@ def init_db(db_path: str = None):
             conn.commit()
             logging.info("Finished back-filling datetime_added.")
 
+        # Counters are created last so the back-fill above is part of their first count
+        if 'tags' in columns:
+            _create_counters(conn, table)
+            _create_folder_counters(conn, table)
+            if 'datetime_taken' in columns:
+                _create_timeline_counters(conn, table)
+            if 'geolocation' in columns:
+                _create_geo_index(conn, table)
+            _create_search_index(conn, table)
+            conn.commit()
+
     except sqlite3.Error as e:
         logging.error(f"Database initialization failed: {e}")
     finally:
         conn.close()
 
-def add_photo_to_index(photo_path: str, md5sum: str, exif_data: dict | None, update_md5sum: bool = False):
-    """Adds or updates a photo in the database index."""
-    conn = get_db_connection()
+def _exif_orientation(exif_data: dict):
+    """The EXIF Orientation value 1-8 from exif_data, or None if it is missing or invalid."""
+    try:
+        orientation = int(exif_data.get('orientation'))
+    except (TypeError, ValueError):
+        return None
+    return orientation if 1 <= orientation <= 8 else None
+
+def add_photo_to_index(photo_path: str, md5sum: str, exif_data: dict | None, update_md5sum: bool = False, file_info: dict | None = None, conn: sqlite3.Connection = None):
+    """
+    Adds or updates a photo in the database index.
+    file_info optionally carries the file_size, file_mtime_ns and quick_hash fingerprint.
+    When conn is given the write joins the caller's transaction and the caller commits.
+    """
+    own_conn = conn is None
+    if own_conn:
+        conn = get_db_connection()
     try:
         cursor = conn.cursor()
-        cursor.execute("SELECT id, md5sum, metadata_extraction_attempts FROM photos WHERE path = ?", (str(photo_path),))
+        condition, params = path_condition(conn, photo_path)
+        cursor.execute(f"SELECT id, md5sum, metadata_extraction_attempts FROM photos WHERE {condition}", params)
         row = cursor.fetchone()
         
         if row:
@@ -98,12 +710,19 @@ def add_photo_to_index(photo_path: str, md5sum: str, exif_data: dict | None, upd
             
             if exif_data:
                 new_attempts = (row['metadata_extraction_attempts'] or 0) + 1
-                update_clauses.extend(["width = ?", "height = ?", "geolocation = ?", "datetime_taken = ?", "metadata_extraction_attempts = ?"])
-                update_params.extend([exif_data['width'], exif_data['height'], exif_data['geolocation'], exif_data['datetime_taken'], new_attempts])
+                # A moved location clears the place so the indexer resolves it again
+                update_clauses.extend(["width = ?", "height = ?", "exif_orientation = ?", "geolocation = ?", "place = CASE WHEN geolocation IS ? THEN place END", "datetime_taken = ?", "metadata_extraction_attempts = ?"])
+                update_params.extend([exif_data['width'], exif_data['height'], _exif_orientation(exif_data), exif_data['geolocation'], exif_data['geolocation'], exif_data['datetime_taken'], new_attempts])
             
             if update_md5sum and row['md5sum'] != md5sum:
                 update_clauses.append("md5sum = ?")
                 update_params.append(md5sum)
+
+            if file_info:
+                for column in ('file_size', 'file_mtime_ns', 'quick_hash'):
+                    if file_info.get(column) is not None:
+                        update_clauses.append(f"{column} = ?")
+                        update_params.append(file_info[column])
             
             if update_clauses:
                 query = "UPDATE photos SET " + ", ".join(update_clauses) + " WHERE id = ?"
@@ -118,68 +737,58 @@ def add_photo_to_index(photo_path: str, md5sum: str, exif_data: dict | None, upd
                 return
 
             datetime_added = datetime.now(timezone.utc).isoformat()
+            file_info = file_info or {}
             cursor.execute(
-                "INSERT INTO photos (path, width, height, geolocation, datetime_taken, datetime_added, md5sum, metadata_extraction_attempts) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
-                (str(photo_path), exif_data['width'], exif_data['height'], exif_data['geolocation'], exif_data['datetime_taken'], datetime_added, md5sum, 1)
+                "INSERT INTO photos (path, width, height, exif_orientation, geolocation, datetime_taken, datetime_added, md5sum, metadata_extraction_attempts, file_size, file_mtime_ns, quick_hash) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (str(photo_path), exif_data['width'], exif_data['height'], _exif_orientation(exif_data), exif_data['geolocation'], exif_data['datetime_taken'], datetime_added, md5sum, 1,
+                 file_info.get('file_size'), file_info.get('file_mtime_ns'), file_info.get('quick_hash'))
             )
             logging.info(f"Indexed new photo: {photo_path}")
         
-        conn.commit()
+        if own_conn:
+            conn.commit()
 
     except sqlite3.IntegrityError:
         logging.warning(f"Integrity error for photo {photo_path}, likely a race condition. Skipping.")
     except Exception as e:
         logging.error(f"Failed to index photo {photo_path}: {e}")
     finally:
-        conn.close()
-
-def get_all_tags(sort_by: str = 'tag', order: str = 'asc', search: str = ''):
-    """Gets all tags with their counts, with sorting and searching."""
-    conn = get_db_connection()
-    try:
-        # Base query to get tags and their counts
-        query = "SELECT tags FROM photos WHERE tags IS NOT NULL AND tags != ''"
-        cursor = conn.cursor()
-        cursor.execute(query)
-        rows = cursor.fetchall()
-
-        tag_counts = {}
-        for row in rows:
-            tags = row['tags'].split(',')
-            for tag in tags:
-                tag = tag.strip()
-                if tag:
-                    tag_counts[tag] = tag_counts.get(tag, 0) + 1
-        
-        # Search
-        if search:
-            tag_counts = {tag: count for tag, count in tag_counts.items() if search.lower() in tag.lower()}
-
-        # Sort
-        if sort_by == 'tag':
-            sorted_tags = sorted(tag_counts.items(), key=lambda item: item[0], reverse=order == 'desc')
-        elif sort_by == 'count':
-            sorted_tags = sorted(tag_counts.items(), key=lambda item: item[1], reverse=order == 'desc')
-        else:
-            sorted_tags = sorted(tag_counts.items())
-
-        return [{"tag": tag, "count": count} for tag, count in sorted_tags]
-
-    except sqlite3.Error as e:
-        logging.error(f"Database error when getting all tags: {e}")
-        return []
-    finally:
-        conn.close()
+        if own_conn:
+            conn.close()
 
-def update_photo_path(md5sum: str, new_path: str):
+def update_photo_path(md5sum: str, new_path: str, conn: sqlite3.Connection = None):
     """Updates the path of a photo with a given md5sum."""
-    conn = get_db_connection()
+    own_conn = conn is None
+    if own_conn:
+        conn = get_db_connection()
     try:
         cursor = conn.cursor()
         cursor.execute("UPDATE photos SET path = ? WHERE md5sum = ?", (new_path, md5sum))
-        conn.commit()
+        if own_conn:
+            conn.commit()
         logging.info(f"Updated path for photo with md5sum {md5sum} to {new_path}")
     except sqlite3.Error as e:
         logging.error(f"Database error when updating photo path: {e}")
     finally:
-        conn.close()
\ No newline at end of file
+        if own_conn:
+            conn.close()
+
+def move_photo(photo_id: int, new_path: str, file_info: dict | None = None, conn: sqlite3.Connection = None):
+    """Points an existing photo record at its new path, refreshing its file fingerprint."""
+    own_conn = conn is None
+    if own_conn:
+        conn = get_db_connection()
+    try:
+        file_info = file_info or {}
+        conn.execute(
+            "UPDATE photos SET path = ?, file_size = COALESCE(?, file_size), file_mtime_ns = COALESCE(?, file_mtime_ns), quick_hash = COALESCE(?, quick_hash) WHERE id = ?",
+            (str(new_path), file_info.get('file_size'), file_info.get('file_mtime_ns'), file_info.get('quick_hash'), photo_id)
+        )
+        if own_conn:
+            conn.commit()
+        logging.info(f"Moved photo {photo_id} to {new_path}")
+    except sqlite3.Error as e:
+        logging.error(f"Database error when moving photo {photo_id}: {e}")
+    finally:
+        if own_conn:
+            conn.close()
@@ -0,0 +1,113 @@
+import os
+import sqlite3
+from . import database
+
+# Folder browsing and per-folder slideshows. A folder is addressed by its path, and its
+# subtree is every path that starts with the folder path plus '/'. Those paths sort in
+# one contiguous range, from the prefix up to the same prefix with its '/' bumped to
+# '0', so subtree counts and stepping through a subtree are index range scans on
+# folder_counters and the photo paths.
+
+def folder_prefix(folder: str) -> str:
+    return str(folder).rstrip('/') + '/'
+
+def _prefix_range(prefix: str):
+    return prefix, prefix[:-1] + '0'
+
+def photo_roots():
+    """The configured photo folders, the top level of the folder tree."""
+    return [folder_prefix(d.strip()) for d in os.environ.get("PHOTOSHARE_PHOTO_DIRS", "").split(',') if d.strip()]
+
+def list_folders(parent: str):
+    """
+    Returns the immediate subfolders of parent with the number of photos in each subtree,
+    plus the number of photos directly in parent and in its whole subtree.
+    """
+    prefix = folder_prefix(parent)
+    low, high = _prefix_range(prefix)
+    conn = database.get_db_connection()
+    try:
+        rows = conn.execute(
+            "SELECT path, count FROM folder_counters WHERE path >= ? AND path < ? AND count > 0",
+            (low, high)
+        ).fetchall()
+    finally:
+        conn.close()
+
+    direct = 0
+    children = {}
+    for row in rows:
+        rest = row['path'][len(prefix):]
+        if not rest:
+            direct += row['count']
+        else:
+            name = rest.split('/', 1)[0]
+            children[name] = children.get(name, 0) + row['count']
+    return {
+        "folder": prefix,
+        "photo_count": direct,
+        "total_count": direct + sum(children.values()),
+        "folders": [{"name": name, "path": prefix + name + '/', "photo_count": count} for name, count in sorted(children.items())],
+    }
+
+def count_photos(folder: str) -> int:
+    """Number of photos in folder and its subfolders."""
+    low, high = _prefix_range(folder_prefix(folder))
+    conn = database.get_db_connection()
+    try:
+        return conn.execute("SELECT COALESCE(SUM(count), 0) FROM folder_counters WHERE path >= ? AND path < ?", (low, high)).fetchone()[0]
+    finally:
+        conn.close()
+
+def sequence_photo_id(conn: sqlite3.Connection, folder: str, current_photo_id: int = None, direction: str = None, shape_filter=None):
+    """
+    Returns the id of the first photo under folder, or of the one after ('next') or
+    before current_photo_id, wrapping around at the ends. Photos are in path order, or
+    folder by folder with normalized paths. shape_filter (see app/shape.py) further
+    limits the photos. Returns None if the folder has no matching photos.
+    """
+    photo_ids = sequence_photo_ids(conn, folder, current_photo_id, direction, shape_filter)
+    return photo_ids[0] if photo_ids else None
+
+def sequence_photo_ids(conn: sqlite3.Connection, folder: str, current_photo_id: int = None, direction: str = None, shape_filter=None, count: int = 1):
+    """
+    Like sequence_photo_id, but returns up to count ids continuing in the same direction,
+    with one range query up to the end of the folder and one from the other end when it
+    wraps around, stopping before the sequence repeats.
+    """
+    low, high = _prefix_range(folder_prefix(folder))
+    if database.is_normalized(conn):
+        source = "photo_files p JOIN directories d ON d.id = p.directory_id"
+        key, range_column = "d.path, p.filename", "d.path"
+    else:
+        source = "photos p"
+        key, range_column = "p.path", "p.path"
+    where = f"{range_column} >= ? AND {range_column} < ? AND (p.datetime_deleted IS NULL OR p.datetime_deleted = '')"
+    params = (low, high)
+    if shape_filter:
+        where += f" AND {shape_filter[0]}"
+        params += tuple(shape_filter[1])
+    ascending = f"ORDER BY {key}"
+    descending = f"ORDER BY {', '.join(column + ' DESC' for column in key.split(', '))}"
+
+    photo_ids = []
+    if direction and current_photo_id:
+        current = conn.execute(f"SELECT {key} FROM {source} WHERE p.id = ?", (current_photo_id,)).fetchone()
+        if current is not None:
+            placeholders = ', '.join('?' for _ in current)
+            operator, order = ('>', ascending) if direction == 'next' else ('<', descending)
+            rows = conn.execute(
+                f"SELECT p.id FROM {source} WHERE {where} AND ({key}) {operator} ({placeholders}) {order} LIMIT ?",
+                (*params, *current, count)
+            )
+            photo_ids = [row['id'] for row in rows]
+        order = ascending if direction == 'next' else descending
+    else:
+        order = ascending
+
+    if len(photo_ids) < count:
+        for row in conn.execute(f"SELECT p.id FROM {source} WHERE {where} {order} LIMIT ?", (*params, count - len(photo_ids))):
+            if row['id'] in photo_ids:
+                break
+            photo_ids.append(row['id'])
+    return photo_ids
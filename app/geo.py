@@ -0,0 +1,71 @@
+import math
+from . import database
+
+# Radius search over the photo_locations R*Tree and map clusters from the geo_clusters
+# grid (see database._create_geo_index). A map at zoom z shows tiles 360/2^z degrees
+# wide; clusters come from the grid level CLUSTER_DETAIL finer, i.e. about 2^3 x 2^3
+# clusters per 256px tile, so a viewport reads a few hundred precomputed rows.
+
+EARTH_RADIUS_M = 6371000.0
+CLUSTER_DETAIL = 3
+MAX_NEAR_RESULTS = 100
+
+def distance_m(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Great-circle (haversine) distance in meters."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi, dlambda = phi2 - phi1, math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(a)))
+
+def near(lat: float, lon: float, radius_m: float, limit: int = 30):
+    """
+    Returns up to limit (photo row, distance) pairs within radius_m of (lat, lon), nearest
+    first. Candidates come from the R*Tree bounding box around the circle.
+    """
+    dlat = math.degrees(radius_m / EARTH_RADIUS_M)
+    dlon = dlat / max(math.cos(math.radians(lat)), 1e-6)
+    conn = database.get_db_connection()
+    try:
+        rows = conn.execute("""
+            SELECT p.* FROM photo_locations l JOIN photos p ON p.id = l.id
+            WHERE l.min_lat <= ? AND l.max_lat >= ? AND l.min_lon <= ? AND l.max_lon >= ?
+              AND (p.datetime_deleted IS NULL OR p.datetime_deleted = '')
+        """, (lat + dlat, lat - dlat, lon + dlon, lon - dlon)).fetchall()
+    finally:
+        conn.close()
+    matches = [(row, distance_m(lat, lon, row['latitude'], row['longitude'])) for row in rows]
+    matches = [match for match in matches if match[1] <= radius_m]
+    matches.sort(key=lambda match: match[1])
+    return matches[:limit]
+
+def parse_bbox(bbox: str):
+    """Parses 'min_lon,min_lat,max_lon,max_lat'. Raises ValueError if it is malformed."""
+    min_lon, min_lat, max_lon, max_lat = (float(part) for part in bbox.split(','))
+    if not (-180 <= min_lon <= max_lon <= 180 and -90 <= min_lat <= max_lat <= 90):
+        raise ValueError("bbox must be min_lon,min_lat,max_lon,max_lat within the world")
+    return min_lon, min_lat, max_lon, max_lat
+
+def _cell(value: float, offset: float, span: float, level: int) -> int:
+    cells = 1 << level
+    return min(int((value + offset) * cells / span), cells - 1)
+
+def clusters(bbox, zoom: int):
+    """
+    Returns [{"lat", "lon", "count"}] for the grid cells overlapping bbox at the level
+    for map zoom, each positioned at the mean location of its photos.
+    """
+    min_lon, min_lat, max_lon, max_lat = bbox
+    level = max(0, min(zoom + CLUSTER_DETAIL, database.GEO_CLUSTER_LEVELS - 1))
+    conn = database.get_db_connection()
+    try:
+        rows = conn.execute("""
+            SELECT count, latitude_sum, longitude_sum FROM geo_clusters
+            WHERE level = ? AND cell_y BETWEEN ? AND ? AND cell_x BETWEEN ? AND ? AND count > 0
+        """, (
+            level,
+            _cell(min_lat, 90.0, 180.0, level), _cell(max_lat, 90.0, 180.0, level),
+            _cell(min_lon, 180.0, 360.0, level), _cell(max_lon, 180.0, 360.0, level),
+        )).fetchall()
+    finally:
+        conn.close()
+    return [{"lat": row['latitude_sum'] / row['count'], "lon": row['longitude_sum'] / row['count'], "count": row['count']} for row in rows]
@@ -0,0 +1,118 @@
+import math
+import os
+import logging
+import sqlite3
+import threading
+from . import database, geo
+
+# Offline reverse geocoding of photo locations to place names. Places come from a
+# gazetteer file (PHOTOSHARE_GAZETTEER), either a GeoNames dump such as cities1000.txt
+# or lines of 'name<TAB>lat<TAB>lon[<TAB>country]', bucketed into a grid of
+# CELL_DEGREES cells so a lookup only measures the places in the neighbouring cells.
+# Results are cached in place_cache by coordinates rounded to CACHE_PRECISION decimal
+# places (about 1 km), and the indexer stores each photo's place once in photos.place.
+
+CELL_DEGREES = 1.0
+MAX_DISTANCE_KM = 50
+CACHE_PRECISION = 2
+
+class Gazetteer:
+    """Nearest-place lookup over a grid of (lat, lon, name) places."""
+
+    def __init__(self, places):
+        self._cells = {}
+        for lat, lon, name in places:
+            self._cells.setdefault(self._cell(lat, lon), []).append((lat, lon, name))
+        self.size = len(places)
+
+    @staticmethod
+    def _cell(lat: float, lon: float):
+        return math.floor(lat / CELL_DEGREES), math.floor(lon / CELL_DEGREES)
+
+    @classmethod
+    def load(cls, path: str):
+        places = []
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                fields = line.rstrip('\n').split('\t')
+                try:
+                    if len(fields) >= 9:
+                        # GeoNames: geonameid, name, asciiname, alternatenames, latitude, longitude, class, code, country code, ...
+                        name, lat, lon, country = fields[1], float(fields[4]), float(fields[5]), fields[8]
+                    elif len(fields) >= 3:
+                        name, lat, lon = fields[0], float(fields[1]), float(fields[2])
+                        country = fields[3] if len(fields) > 3 else ''
+                    else:
+                        continue
+                except ValueError:
+                    continue
+                places.append((lat, lon, f"{name}, {country}" if country else name))
+        logging.info(f"Loaded {len(places)} places from gazetteer {path}")
+        return cls(places)
+
+    def nearest(self, lat: float, lon: float, max_km: float = MAX_DISTANCE_KM):
+        """Name of the nearest place within max_km, or None."""
+        lat_cells = math.ceil(max_km / (111.0 * CELL_DEGREES))
+        lon_cells = math.ceil(max_km / (111.0 * CELL_DEGREES * max(math.cos(math.radians(lat)), 0.01)))
+        cell_lat, cell_lon = self._cell(lat, lon)
+        best, best_distance = None, max_km * 1000
+        for dy in range(-lat_cells, lat_cells + 1):
+            for dx in range(-lon_cells, lon_cells + 1):
+                for place_lat, place_lon, name in self._cells.get((cell_lat + dy, cell_lon + dx), ()):
+                    distance = geo.distance_m(lat, lon, place_lat, place_lon)
+                    if distance <= best_distance:
+                        best, best_distance = name, distance
+        return best
+
+_gazetteer = None
+_gazetteer_lock = threading.Lock()
+
+def get_gazetteer():
+    """The configured gazetteer, loaded on first use, or None if none is configured."""
+    global _gazetteer
+    path = os.environ.get("PHOTOSHARE_GAZETTEER")
+    if not path:
+        return None
+    with _gazetteer_lock:
+        if _gazetteer is None:
+            try:
+                _gazetteer = Gazetteer.load(path)
+            except (OSError, ValueError) as e:
+                # ValueError covers UnicodeDecodeError from a file that is not UTF-8
+                logging.error(f"Could not load gazetteer {path}: {e}")
+                return None
+        return _gazetteer
+
+def resolve(conn: sqlite3.Connection, gazetteer: Gazetteer, lat: float, lon: float) -> str:
+    """Place name for (lat, lon) through place_cache; '' when nothing is near."""
+    key = (round(lat * 10 ** CACHE_PRECISION), round(lon * 10 ** CACHE_PRECISION))
+    row = conn.execute("SELECT place FROM place_cache WHERE lat_key = ? AND lon_key = ?", key).fetchone()
+    if row:
+        return row['place']
+    place = gazetteer.nearest(key[0] / 10 ** CACHE_PRECISION, key[1] / 10 ** CACHE_PRECISION) or ''
+    conn.execute("INSERT OR REPLACE INTO place_cache (lat_key, lon_key, place) VALUES (?, ?, ?)", (*key, place))
+    return place
+
+def update_places(batch_size: int = 500) -> int:
+    """Resolves the place of every located photo that has none yet. Returns how many were resolved."""
+    gazetteer = get_gazetteer()
+    if gazetteer is None:
+        return 0
+    conn = database.get_db_connection()
+    resolved = 0
+    try:
+        rows = conn.execute("SELECT id, latitude, longitude FROM photos WHERE latitude IS NOT NULL AND place IS NULL").fetchall()
+        for row in rows:
+            place = resolve(conn, gazetteer, row['latitude'], row['longitude'])
+            conn.execute("UPDATE photos SET place = ? WHERE id = ?", (place, row['id']))
+            resolved += 1
+            if resolved % batch_size == 0:
+                conn.commit()
+        conn.commit()
+        if resolved:
+            logging.info(f"Resolved place names for {resolved} photos.")
+    except sqlite3.Error as e:
+        logging.error(f"Database error when resolving place names: {e}")
+    finally:
+        conn.close()
+    return resolved
@@ -0,0 +1,88 @@
+import os
+import logging
+import sqlite3
+from . import database
+
+# Pending writes are flushed in short transactions so the cache never holds
+# the database write lock while other connections are indexing.
+FLUSH_BATCH_SIZE = 500
+
+def cache_key(st: os.stat_result):
+    """Returns the (dev, inode, size, mtime_ns) key identifying a file's current content."""
+    return (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns)
+
+class HashCache:
+    """
+    Persistent cache of content hashes keyed by file identity, shared by the
+    indexer and importphotos.py. Files that were already hashed cost only a stat.
+    """
+
+    def __init__(self, db_path: str = None):
+        self.conn = database.get_db_connection(db_path)
+        self.pending = {}
+        self.hits = 0
+        self.misses = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def get(self, key):
+        """Returns a dict with md5sum and quick_hash for key, or None if the file is not cached."""
+        entry = self.pending.get(key)
+        if entry is None:
+            try:
+                row = self.conn.execute(
+                    "SELECT md5sum, quick_hash FROM hash_cache WHERE dev = ? AND inode = ? AND size = ? AND mtime_ns = ?", key
+                ).fetchone()
+            except sqlite3.Error as e:
+                logging.error(f"Database error when reading hash cache: {e}")
+                row = None
+            entry = {'md5sum': row['md5sum'], 'quick_hash': row['quick_hash']} if row else None
+        if entry:
+            self.hits += 1
+        else:
+            self.misses += 1
+        return entry
+
+    def put(self, key, md5sum: str = None, quick_hash: str = None):
+        """Records hashes for key. Values that are None keep what is already cached."""
+        if md5sum is None and quick_hash is None:
+            return
+        entry = self.pending.setdefault(key, {'md5sum': None, 'quick_hash': None})
+        entry['md5sum'] = md5sum or entry['md5sum']
+        entry['quick_hash'] = quick_hash or entry['quick_hash']
+        if len(self.pending) >= FLUSH_BATCH_SIZE:
+            self.flush()
+
+    def flush(self):
+        """Writes pending entries to the hash_cache table."""
+        if not self.pending:
+            return
+        rows = [(*key, entry['md5sum'], entry['quick_hash']) for key, entry in self.pending.items()]
+        try:
+            self.conn.executemany(
+                """
+                INSERT INTO hash_cache (dev, inode, size, mtime_ns, md5sum, quick_hash) VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT (dev, inode, size, mtime_ns) DO UPDATE SET
+                    md5sum = COALESCE(excluded.md5sum, md5sum),
+                    quick_hash = COALESCE(excluded.quick_hash, quick_hash)
+                """,
+                rows
+            )
+            self.conn.commit()
+            self.pending.clear()
+        except sqlite3.Error as e:
+            logging.error(f"Database error when writing hash cache, dropping {len(rows)} entries: {e}")
+            self.conn.rollback()
+            self.pending.clear()
+
+    def close(self):
+        self.flush()
+        self.conn.close()
+
+    def summary(self):
+        return f"{self.hits} hits, {self.misses} misses"
@@ -0,0 +1,145 @@
+import os
+import time
+import logging
+import hashlib
+import threading
+
+# 1 MiB reads keep the syscall count low on network storage while staying cache friendly.
+DEFAULT_BUFFER_SIZE = 1024 * 1024
+
+# Bytes read from each end of a file for its quick-hash.
+QUICK_HASH_EDGE_SIZE = 64 * 1024
+
+SUPPORTED_ALGORITHMS = ('md5', 'blake2b', 'sha1', 'sha256')
+
+_local = threading.local()
+
+class HashStats:
+    """Accumulates bytes hashed and time spent so hashing throughput can be reported."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.files = 0
+        self.bytes = 0
+        self.seconds = 0.0
+
+    def record(self, num_bytes, seconds):
+        self.merge(num_bytes, seconds)
+
+    def merge(self, num_bytes, seconds, files=1):
+        """Adds figures measured in another process (e.g. a pool worker)."""
+        with self._lock:
+            self.files += files
+            self.bytes += num_bytes
+            self.seconds += seconds
+
+    def reset(self):
+        with self._lock:
+            self.files = 0
+            self.bytes = 0
+            self.seconds = 0.0
+
+    @property
+    def mb_per_sec(self):
+        """Rate of one thread while it hashes; divide bytes by wall-clock time for the aggregate rate."""
+        if self.seconds <= 0:
+            return 0.0
+        return (self.bytes / (1024 * 1024)) / self.seconds
+
+    def summary(self):
+        """Returns a one-line human-readable throughput summary."""
+        return (f"{self.files} files, {self.bytes / (1024 * 1024):.1f} MB hashed "
+                f"in {self.seconds:.2f}s of hashing time summed over threads ({self.mb_per_sec:.2f} MB/s per busy thread)")
+
+# Process-wide stats, read by the indexer and importer for their final summaries.
+stats = HashStats()
+
+def get_algorithm(algorithm: str = None):
+    """Validates a hash algorithm name, defaulting to md5 for compatibility with md5sum values."""
+    algorithm = (algorithm or "md5").lower()
+    if algorithm not in SUPPORTED_ALGORITHMS:
+        raise ValueError(f"Unsupported hash algorithm: {algorithm}")
+    return algorithm
+
+def get_buffer_size():
+    """Returns the read buffer size in bytes from PHOTOSHARE_HASH_BUFFER_KB, or the default."""
+    try:
+        return max(64, int(os.environ.get("PHOTOSHARE_HASH_BUFFER_KB", DEFAULT_BUFFER_SIZE // 1024))) * 1024
+    except ValueError:
+        return DEFAULT_BUFFER_SIZE
+
+def _get_buffer(size):
+    """Returns a per-thread reusable buffer so hashing does not allocate a bytes object per read."""
+    buf = getattr(_local, 'buffer', None)
+    if buf is None or len(buf) != size:
+        buf = bytearray(size)
+        _local.buffer = buf
+        _local.view = memoryview(buf)
+    return _local.view
+
+def _advise_sequential(fd):
+    """Hints the kernel that the file will be read sequentially, where supported."""
+    if hasattr(os, 'posix_fadvise'):
+        try:
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_SEQUENTIAL)
+        except OSError:
+            pass
+
+def new_hasher(algorithm: str = None):
+    """Creates a hashlib object for the given algorithm."""
+    algorithm = get_algorithm(algorithm)
+    if algorithm == 'md5':
+        return hashlib.md5(usedforsecurity=False)
+    return hashlib.new(algorithm)
+
+def calculate_hash(file_path, algorithm: str = None, buffer_size: int = None):
+    """
+    Calculates the hex digest of a file using a large reusable buffer.
+    Returns None if the file cannot be read.
+    """
+    hasher = new_hasher(algorithm)
+    view = _get_buffer(buffer_size or get_buffer_size())
+    total = 0
+    start = time.perf_counter()
+    try:
+        with open(file_path, "rb", buffering=0) as f:
+            _advise_sequential(f.fileno())
+            while True:
+                n = f.readinto(view)
+                if not n:
+                    break
+                hasher.update(view[:n])
+                total += n
+    except OSError as e:
+        logging.error(f"Could not read file for hashing: {file_path}: {e}")
+        return None
+    stats.record(total, time.perf_counter() - start)
+    return hasher.hexdigest()
+
+def calculate_md5sum(file_path):
+    """Calculates the MD5 checksum of a file, as stored in the photos.md5sum column."""
+    return calculate_hash(file_path, algorithm='md5')
+
+def calculate_quick_hash(file_path, file_size: int = None):
+    """
+    Calculates a cheap content fingerprint from the file size plus the first and last
+    64 KB of the file. Equal quick-hashes mark candidate moves/duplicates; only a full
+    hash can confirm them. Returns None if the file cannot be read.
+    """
+    hasher = hashlib.blake2b(digest_size=16)
+    view = _get_buffer(max(get_buffer_size(), QUICK_HASH_EDGE_SIZE))[:QUICK_HASH_EDGE_SIZE]
+    try:
+        with open(file_path, "rb", buffering=0) as f:
+            if file_size is None:
+                file_size = os.fstat(f.fileno()).st_size
+            hasher.update(file_size.to_bytes(8, 'little'))
+            n = f.readinto(view)
+            hasher.update(view[:n])
+            if file_size > QUICK_HASH_EDGE_SIZE:
+                f.seek(max(QUICK_HASH_EDGE_SIZE, file_size - QUICK_HASH_EDGE_SIZE))
+                n = f.readinto(view)
+                hasher.update(view[:n])
+    except OSError as e:
+        logging.error(f"Could not read file for quick-hash: {file_path}: {e}")
+        return None
+    return hasher.hexdigest()
@@ -1,5 +1,5 @@
-import hashlib
 from PIL import Image
+from . import hashing
 
 def rotate_image(image_path: str, direction: str):
     """Rotates an image and returns the new md5sum."""
@@ -14,10 +14,7 @@ def rotate_image(image_path: str, direction: str):
 
         rotated_image.save(image_path)
 
-        with open(image_path, 'rb') as f:
-            md5sum = hashlib.md5(f.read()).hexdigest()
-        
-        return md5sum
+        return hashing.calculate_md5sum(image_path)
     except Exception as e:
         print(f"Error rotating image: {e}")
         return None
@@ -1,16 +1,32 @@
 import os
+import json
+import stat
+import queue
 import logging
+import sqlite3
+import threading
 import time
-import hashlib
 from pathlib import Path
-from . import database
+from . import checkpoint, database, geocode, hashing, hashcache, indexstatus, metadata, pipeline, throttle
 from PIL import Image
 from PIL.ExifTags import TAGS
 from datetime import datetime
-from functools import lru_cache
 from multiprocessing import Pool, cpu_count
 from dotenv import load_dotenv
 
+# Pipeline sizing. Writes go out in a batch of 100 first so new photos show up
+# quickly, then in batches of 1000.
+MAX_HASH_THREADS = 32
+RESULT_QUEUE_DEPTH = 2000
+FIRST_WRITE_BATCH_SIZE = 100
+WRITE_BATCH_SIZE = 1000
+
+# Discovery checkpoints are written at least this often (files or seconds).
+CHECKPOINT_BATCH_SIZE = 1000
+CHECKPOINT_INTERVAL = 5
+
+PHOTO_EXTENSIONS = ['.jpg', '.jpeg', '.png']
+
 def _format_time(seconds):
     """Formats a duration in seconds into a human-readable string like 1d2h3m4s."""
     if seconds < 0:
@@ -42,36 +58,47 @@ def _convert_gps_to_decimal(dms, ref):
         decimal = -decimal
     return decimal
 
-@lru_cache(maxsize=None)
 def _calculate_md5sum(file_path):
     """Calculates the MD5 checksum of a file."""
-    hash_md5 = hashlib.md5()
-    try:
-        with open(file_path, "rb") as f:
-            for chunk in iter(lambda: f.read(4096), b""):
-                hash_md5.update(chunk)
-        return hash_md5.hexdigest()
-    except IOError as e:
-        logging.error(f"Could not read file for md5sum: {file_path}: {e}")
-        return None
+    return hashing.calculate_md5sum(file_path)
 
 def _get_exif_data(image_path):
-    """Extracts width, height, geolocation, and datetime_taken from image EXIF data."""
+    """
+    Extracts width, height, geolocation, datetime_taken and orientation from image EXIF data.
+    JPEG and PNG headers are parsed directly; Pillow is the fallback for other files.
+    """
+    exif_data = metadata.read_metadata(image_path)
+    if exif_data:
+        return exif_data
+    return _get_exif_data_with_pillow(image_path)
+
+def _get_exif_data_with_pillow(image_path):
+    """Extracts the same fields as _get_exif_data by opening the image with Pillow."""
     try:
-        image = Image.open(image_path)
-        width, height = image.size
-        exif_data = image._getexif()
-        
-        geolocation = None
-        datetime_taken = None
+        with Image.open(image_path) as image:
+            width, height = image.size
+            try:
+                exif_data = image._getexif() if hasattr(image, '_getexif') else None
+            except Exception as e:
+                logging.warning(f"Could not process EXIF data for {image_path}: {e}")
+                exif_data = None
+    except Exception as e:
+        logging.error(f"Could not even open image {image_path}: {e}")
+        return None
+
+    geolocation = None
+    datetime_taken = None
+    orientation = None
 
-        if exif_data:
+    if exif_data:
+        try:
             exif = {
                 TAGS[k]: v
                 for k, v in exif_data.items()
                 if k in TAGS
             }
-            
+            orientation = exif.get('Orientation')
+
             dt_str = exif.get('DateTimeOriginal')
             if dt_str:
                 try:
@@ -87,47 +114,89 @@ def _get_exif_data(image_path):
                     lat = _convert_gps_to_decimal(lat_dms, lat_ref)
                     lon = _convert_gps_to_decimal(lon_dms, lon_ref)
                     geolocation = f"{lat},{lon}"
+        except Exception as e:
+            logging.warning(f"Could not process EXIF data for {image_path}: {e}")
 
-        return {'width': width, 'height': height, 'geolocation': geolocation, 'datetime_taken': datetime_taken}
-    except Exception as e:
-        logging.warning(f"Could not process EXIF data for {image_path}: {e}")
-        try:
-            image = Image.open(image_path)
-            return {'width': image.size[0], 'height': image.size[1], 'geolocation': None, 'datetime_taken': None}
-        except Exception as e2:
-            logging.error(f"Could not even open image {image_path}: {e2}")
-            return None
+    return {'width': width, 'height': height, 'geolocation': geolocation, 'datetime_taken': datetime_taken, 'orientation': orientation}
 
-def _process_photo_wrapper(args):
-    """Helper to unpack arguments for the worker."""
-    return _process_photo(*args)
+def _env_int(name, default):
+    """Reads a positive integer setting from the environment."""
+    try:
+        return max(1, int(os.environ.get(name, default)))
+    except ValueError:
+        return default
 
-def _process_photo(photo_path, needs_exif):
-    """Worker function to process a single photo and return stats."""
-    exif_data = None
-    exif_collected = False
-    
-    if needs_exif:
-        exif_data = _get_exif_data(photo_path)
-        if exif_data:
-            if (exif_data['width'] * exif_data['height']) < 10000:
-                logging.info(f"Skipping photo {photo_path} because it is too small.")
-                return None
-            exif_collected = True
+def _hash_photo(job):
+    """
+    Hash stage (I/O-bound, runs on a thread): returns (quick_hash, md5sum, moved_from_id),
+    or None if the file could not be read.
+
+    The job's hash_mode selects how much of the file is read:
+      'none'   - fingerprint unchanged, no hashing needed
+      'full'   - quick-hash plus full md5sum
+      'detect' - new path: quick-hash, then a full md5sum only if the quick-hash does not
+                 single out one orphaned record in move_candidates
+    move_candidates is a list of (id, path, quick_hash, orphaned) tuples for records of the same size.
+    cached_hashes holds md5sum/quick_hash values from the persistent hash cache, which are used
+    instead of reading the file.
+    """
+    photo_path, _needs_exif, hash_mode, move_candidates, cached_hashes = job
+    cached_hashes = cached_hashes or {}
+    quick_hash = None
+    md5sum = None
+    moved_from_id = None
+
+    if hash_mode != 'none':
+        quick_hash = cached_hashes.get('quick_hash') or hashing.calculate_quick_hash(photo_path)
+        if not quick_hash:
+            return None
+
+    if hash_mode == 'detect':
+        matches = [c for c in (move_candidates or []) if c[2] == quick_hash]
+        if len(matches) == 1 and matches[0][3] and not os.path.exists(matches[0][1]):
+            moved_from_id = matches[0][0]
         else:
-            return None # Failed to get even basic dimensions
+            hash_mode = 'full'
+
+    if hash_mode == 'full':
+        md5sum = cached_hashes.get('md5sum') or _calculate_md5sum(photo_path)
+        if not md5sum:
+            return None
 
-    md5sum = _calculate_md5sum(photo_path)
-    if md5sum:
-        # Return a tuple indicating success for md5 and exif collection
-        return (str(photo_path), md5sum, exif_data, True, exif_collected)
-    return None
+    return (quick_hash, md5sum, moved_from_id)
 
-def run_indexing(update_md5sum: bool = False, folder: str = None):
+def _extract_exif(photo_path):
+    """
+    EXIF stage (CPU-bound, runs in a worker process): returns the photo's metadata,
+    or None if it cannot be read or the photo is too small to index.
+    """
+    exif_data = _get_exif_data(photo_path)
+    if exif_data and (exif_data['width'] * exif_data['height']) < 10000:
+        logging.info(f"Skipping photo {photo_path} because it is too small.")
+        return None
+    return exif_data
+
+def run_indexing(update_md5sum: bool = False, folder: str = None, throttler: throttle.Throttle = None, resume: bool = False,
+                 progress_channel=None):
     """
     Scans photo directories in parallel, respects ignore patterns, and logs progress
-    while adding photos to the database.
+    while adding photos to the database. A throttler limits the I/O budget and lowers
+    the priority of the worker threads and processes. With resume, a run interrupted
+    over the same folders continues from its last checkpoint. Progress is published
+    to the index_status table and, when given, sent over progress_channel. Photos with
+    a location and no place yet get one from the gazetteer, if one is configured.
     """
+    reporter = indexstatus.ProgressReporter(progress_channel)
+    reporter.start()
+    try:
+        _run_indexing(update_md5sum, folder, throttler, resume, reporter)
+        geocode.update_places()
+    except BaseException:
+        reporter.stop('failed')
+        raise
+    reporter.stop('finished')
+
+def _run_indexing(update_md5sum, folder, throttler, resume, reporter):
     load_dotenv()
     logging.info("Photo indexing process started.")
     
@@ -149,7 +218,7 @@ def run_indexing(update_md5sum: bool = False, folder: str = None):
     # 2. Get current state from DB
     conn = database.get_db_connection()
     try:
-        photos_in_db = {row['path']: row for row in conn.execute("SELECT path, datetime_taken, metadata_extraction_attempts FROM photos")}
+        photos_in_db = {row['path']: row for row in conn.execute("SELECT id, path, datetime_taken, metadata_extraction_attempts, file_size, file_mtime_ns, quick_hash FROM photos")}
         md5sums_in_db = {row['md5sum']: row['path'] for row in conn.execute("SELECT md5sum, path FROM photos WHERE md5sum IS NOT NULL")}
     finally:
         conn.close()
@@ -163,87 +232,312 @@ def run_indexing(update_md5sum: bool = False, folder: str = None):
         except Exception as e:
             logging.error(f"Could not read ignore file {ignore_file}: {e}")
 
-    logging.info("Starting photo discovery...")
+    # Directories are walked in sorted order, so the checkpoint's walk position
+    # (photo dir index plus relative path parts) identifies every finished directory.
+    index_checkpoint = checkpoint.IndexCheckpoint(json.dumps({'dirs': photo_dirs, 'update_md5sum': update_md5sum}))
+    resumed = index_checkpoint.start(resume)
+
     all_photo_paths = []
-    discovery_start_time = time.time()
-    last_discovery_log_time = discovery_start_time
-    
-    for photo_dir in photo_dirs:
-        p = Path(photo_dir)
-        if not p.is_dir():
-            logging.warning(f"Specified photo directory does not exist, skipping: {photo_dir}")
-            continue
-        
-        for f in p.glob('**/*'):
-            if f.is_file() and f.suffix.lower() in ['.jpg', '.jpeg', '.png']:
-                if any(f.match(pat) for pat in ignore_pats):
+    fingerprints = {}
+    done_paths = set()
+    if resumed:
+        for row in index_checkpoint.discovered_files():
+            all_photo_paths.append(Path(row['path']))
+            fingerprints[row['path']] = (row['dev'], row['inode'], row['size'], row['mtime_ns'])
+            if row['done']:
+                done_paths.add(row['path'])
+        logging.info(f"Resuming index run: {len(all_photo_paths)} photos already discovered, {len(done_paths)} already processed.")
+
+    if index_checkpoint.phase == 'discovery':
+        reporter.update(phase='discovery', discovered=len(all_photo_paths))
+        logging.info("Starting photo discovery...")
+        discovery_start_time = time.time()
+        last_discovery_log_time = discovery_start_time
+        last_checkpoint_time = discovery_start_time
+        position = index_checkpoint.position
+        unrecorded = []
+        here = position
+
+        for dir_index, photo_dir in enumerate(photo_dirs):
+            p = Path(photo_dir)
+            if not p.is_dir():
+                logging.warning(f"Specified photo directory does not exist, skipping: {photo_dir}")
+                continue
+
+            for dirpath, dirnames, filenames in os.walk(p):
+                dirnames.sort()
+                here = (dir_index, *Path(dirpath).relative_to(p).parts)
+                if position is not None and here <= position:
+                    if position[:len(here)] != here:
+                        dirnames[:] = []  # the whole subtree was walked before
                     continue
-                all_photo_paths.append(f)
 
-                current_time = time.time()
-                if current_time - last_discovery_log_time > 15:
-                    elapsed = current_time - discovery_start_time
-                    rate = len(all_photo_paths) / elapsed if elapsed > 0 else 0
-                    logging.info(f"Discovered {len(all_photo_paths)} photos... Rate: {rate:.2f} files/sec")
-                    last_discovery_log_time = current_time
+                for name in sorted(filenames):
+                    f = Path(dirpath) / name
+                    if f.suffix.lower() not in PHOTO_EXTENSIONS:
+                        continue
+                    if any(f.match(pat) for pat in ignore_pats):
+                        continue
+                    try:
+                        st = f.stat()
+                    except OSError as e:
+                        logging.warning(f"Could not stat {f}, skipping: {e}")
+                        continue
+                    if not stat.S_ISREG(st.st_mode):
+                        continue
+                    key = hashcache.cache_key(st)
+                    all_photo_paths.append(f)
+                    fingerprints[str(f)] = key
+                    unrecorded.append((str(f), *key))
 
-    total_discovery_time = time.time() - discovery_start_time
-    logging.info(f"Discovery finished. Found {len(all_photo_paths)} total photos in {total_discovery_time:.2f}s.")
+                    current_time = time.time()
+                    if current_time - last_discovery_log_time > 15:
+                        elapsed = current_time - discovery_start_time
+                        rate = len(all_photo_paths) / elapsed if elapsed > 0 else 0
+                        logging.info(f"Discovered {len(all_photo_paths)} photos... Rate: {rate:.2f} files/sec")
+                        reporter.update(discovered=len(all_photo_paths), rate=rate)
+                        last_discovery_log_time = current_time
+
+                # This directory's files are all listed, so it becomes the walk position.
+                if len(unrecorded) >= CHECKPOINT_BATCH_SIZE or time.time() - last_checkpoint_time > CHECKPOINT_INTERVAL:
+                    index_checkpoint.record_discovered(unrecorded, here)
+                    unrecorded = []
+                    last_checkpoint_time = time.time()
+
+        index_checkpoint.record_discovered(unrecorded, here)
+        index_checkpoint.set_phase('processing')
+
+        total_discovery_time = time.time() - discovery_start_time
+        logging.info(f"Discovery finished. Found {len(all_photo_paths)} total photos in {total_discovery_time:.2f}s.")
 
     if not all_photo_paths:
         logging.info("No photos found to index.")
+        index_checkpoint.finish()
         return
 
-    # 4. Determine work to be done
+    # 4. Determine work to be done. Records whose path vanished are candidates for moves;
+    # records are grouped by size so new files only compare quick-hashes against same-sized ones.
+    records_by_size = {}
+    for db_path, row in photos_in_db.items():
+        if row['file_size'] is not None and row['quick_hash']:
+            orphaned = db_path not in fingerprints
+            records_by_size.setdefault(row['file_size'], []).append((row['id'], db_path, row['quick_hash'], orphaned))
+
+    hash_cache = hashcache.HashCache()
     jobs = []
     for path in all_photo_paths:
+        if str(path) in done_paths:
+            continue
         db_entry = photos_in_db.get(str(path))
         needs_exif = db_entry is None or (db_entry['metadata_extraction_attempts'] is None or db_entry['metadata_extraction_attempts'] < 3)
-        jobs.append((path, needs_exif))
+        key = fingerprints[str(path)]
+        file_size, file_mtime_ns = key[2], key[3]
+        if db_entry is None:
+            jobs.append((path, needs_exif, 'detect', records_by_size.get(file_size, []), hash_cache.get(key)))
+            continue
+
+        fingerprint_changed = (db_entry['file_size'], db_entry['file_mtime_ns']) != (file_size, file_mtime_ns) or not db_entry['quick_hash']
+        if update_md5sum or fingerprint_changed:
+            # A changed file gets a fresh md5sum too, or the stored one would go stale
+            hash_mode = 'full'
+        else:
+            hash_mode = 'none'
+
+        if hash_mode == 'none' and not needs_exif:
+            continue
+        jobs.append((path, needs_exif, hash_mode, None, hash_cache.get(key) if hash_mode != 'none' else None))
 
-    # 5. Process photos in parallel
-    num_processes = max(1, cpu_count() // 2)
+    # 5. Process photos in a staged pipeline: hashing (I/O-bound) on a thread stage,
+    # EXIF extraction (CPU-bound) on a process stage, and batched writes on this thread.
+    # Each stage has its own queue depth and worker count, tuned from measured throughput.
     total_jobs = len(jobs)
-    logging.info(f"Starting photo processing for {total_jobs} photos with {num_processes} processes.")
+    max_processes = max(1, cpu_count())
+    hash_tuner = pipeline.StageTuner("hash", _env_int("PHOTOSHARE_INDEX_HASH_THREADS", 4), 1, MAX_HASH_THREADS)
+    exif_tuner = pipeline.StageTuner("exif", _env_int("PHOTOSHARE_INDEX_EXIF_PROCESSES", max(1, cpu_count() // 2)), 1, max_processes)
+    reporter.update(phase='processing', discovered=len(all_photo_paths), total=total_jobs, processed=0, rate=0.0, eta=None)
+    logging.info(f"Starting photo processing for {total_jobs} photos with {hash_tuner.workers} hashing threads and {exif_tuner.workers} EXIF processes.")
     
+    hashing.stats.reset()
     photos_processed = 0
+    photos_moved = 0
+    duplicates_skipped = 0
+    claimed_ids = set()
+    claimed_paths = {}  # orphaned path -> (record id, path of the file that claimed it)
     md5sums_computed = 0
     exif_data_collected = 0
     processing_start_time = time.time()
     last_processing_log_time = processing_start_time
 
-    with Pool(processes=num_processes) as pool:
-        for result in pool.imap_unordered(_process_photo_wrapper, jobs):
-            if result:
-                photo_path, md5sum, exif_data, md5_success, exif_success = result
-                
-                if md5_success:
-                    md5sums_computed += 1
-                if exif_success:
-                    exif_data_collected += 1
-
-                if md5sum in md5sums_in_db:
-                    if md5sums_in_db[md5sum] != photo_path:
-                        database.update_photo_path(md5sum, photo_path)
+    def write_batch(batch):
+        """Applies a batch of stage results to the database in a single transaction."""
+        nonlocal photos_moved, duplicates_skipped
+        conn = database.get_db_connection()
+        try:
+            for job, hashes, exif_data in batch:
+                if hashes is None:
+                    continue
+                photo_path = str(job[0])
+                quick_hash, md5sum, moved_from_id = hashes
+                key = fingerprints[photo_path]
+                hash_cache.put(key, md5sum=md5sum, quick_hash=quick_hash)
+                file_info = {'file_size': key[2], 'file_mtime_ns': key[3], 'quick_hash': quick_hash}
+
+                if photo_path in photos_in_db:
+                    database.add_photo_to_index(photo_path, md5sum, exif_data, update_md5sum=update_md5sum or md5sum is not None, file_info=file_info, conn=conn)
+                    if md5sum:
+                        md5sums_in_db[md5sum] = photo_path
+                elif moved_from_id is not None and moved_from_id not in claimed_ids:
+                    # The quick-hash singled out one record whose file disappeared: a move.
+                    claimed_ids.add(moved_from_id)
+                    claimed_paths.update((c[1], (moved_from_id, photo_path)) for c in job[3] if c[0] == moved_from_id)
+                    database.move_photo(moved_from_id, photo_path, file_info, conn=conn)
+                    photos_moved += 1
                 else:
-                    database.add_photo_to_index(photo_path, md5sum, exif_data, update_md5sum=update_md5sum)
-                photos_processed += 1
+                    if md5sum is None:
+                        # The quick-hash matched a record another file already claimed. Only the
+                        # full md5sum can tell a duplicate from a collision or a partly edited copy.
+                        md5sum = _calculate_md5sum(photo_path)
+                        if not md5sum:
+                            continue
+                        hash_cache.put(key, md5sum=md5sum)
+                    old_path = md5sums_in_db.get(md5sum)
+                    if old_path is None:
+                        database.add_photo_to_index(photo_path, md5sum, exif_data, update_md5sum=update_md5sum, file_info=file_info, conn=conn)
+                        md5sums_in_db[md5sum] = photo_path
+                    elif old_path in claimed_paths:
+                        record_id, claimant = claimed_paths.pop(old_path)
+                        claimant_md5 = _calculate_md5sum(claimant)
+                        if claimant_md5 and claimant_md5 != md5sum:
+                            # The file that claimed the record by quick-hash is a different photo;
+                            # the record goes to this one and the claimant is indexed as new.
+                            database.move_photo(record_id, photo_path, file_info, conn=conn)
+                            claimant_key = fingerprints[claimant]
+                            claimant_info = {'file_size': claimant_key[2], 'file_mtime_ns': claimant_key[3], 'quick_hash': quick_hash}
+                            database.add_photo_to_index(claimant, claimant_md5, _extract_exif(claimant), file_info=claimant_info, conn=conn)
+                            md5sums_in_db[md5sum] = photo_path
+                            md5sums_in_db[claimant_md5] = claimant
+                        else:
+                            logging.info(f"Skipping duplicate photo {photo_path}")
+                            duplicates_skipped += 1
+                    elif old_path not in fingerprints and not os.path.exists(old_path):
+                        database.update_photo_path(md5sum, photo_path, conn=conn)
+                        photos_moved += 1
+                        md5sums_in_db[md5sum] = photo_path
+                    else:
+                        logging.info(f"Skipping duplicate photo {photo_path}")
+                        duplicates_skipped += 1
+            # Skipped and failed photos count as done too; a resumed run would only fail again.
+            checkpoint.IndexCheckpoint.mark_done(conn, [str(job[0]) for job, _, _ in batch])
+            conn.commit()
+        except sqlite3.Error as e:
+            logging.error(f"Database error when writing index batch: {e}")
+        finally:
+            conn.close()
+
+    def hash_job(job):
+        if throttler:
+            cached = job[4] or {}
+            if job[2] == 'none' or cached.get('md5sum'):
+                num_bytes = 0
+            elif cached.get('quick_hash'):
+                num_bytes = 2 * hashing.QUICK_HASH_EDGE_SIZE
+            else:
+                num_bytes = fingerprints[str(job[0])][2]
+            throttler.acquire(num_bytes=num_bytes, files=1)
+        return _hash_photo(job)
+
+    results = queue.Queue(maxsize=RESULT_QUEUE_DEPTH)
+    pool_kwargs = {}
+    if throttler and throttler.nice:
+        pool_kwargs = {'initializer': throttle.lower_priority, 'initargs': (throttler.nice,)}
+
+    try:
+        with Pool(processes=max_processes, **pool_kwargs) as pool:
+            exif_stage = pipeline.ProcessStage(
+                "exif", pool, _extract_exif,
+                on_result=lambda item, exif_data: results.put((item[0], item[1], exif_data)),
+                tuner=exif_tuner,
+            )
+
+            def on_hashed(job, hashes):
+                if hashes is not None and job[1]:
+                    exif_stage.put((job, hashes), args=(job[0],))
+                else:
+                    results.put((job, hashes, None))
+
+            hash_stage = pipeline.ThreadStage(
+                "hash", hash_job, on_hashed, hash_tuner.workers,
+                queue_depth=MAX_HASH_THREADS * 4, tuner=hash_tuner,
+                initializer=(lambda: throttle.lower_priority(throttler.nice)) if throttler else None,
+            )
+
+            def feed():
+                for job in jobs:
+                    hash_stage.put(job)
+                hash_stage.close()
+
+            threading.Thread(target=feed, name="index-feeder", daemon=True).start()
+
+            batch = []
+            batch_size = FIRST_WRITE_BATCH_SIZE
+            received = 0
+            while received < total_jobs:
+                try:
+                    job, hashes, exif_data = results.get(timeout=1)
+                except queue.Empty:
+                    if batch:
+                        write_batch(batch)
+                        batch = []
+                    hash_stage.tune()
+                    exif_stage.tune()
+                    continue
+                received += 1
+
+                # A failed hash, or failed/too-small EXIF for a photo that needed it, is skipped
+                # but still written with the batch so the checkpoint marks it done.
+                if hashes is None or (job[1] and exif_data is None):
+                    batch.append((job, None, None))
+                else:
+                    if hashes[1]:
+                        md5sums_computed += 1
+                    if exif_data:
+                        exif_data_collected += 1
+                    batch.append((job, hashes, exif_data))
+                    photos_processed += 1
+
+                if len(batch) >= batch_size:
+                    write_batch(batch)
+                    batch = []
+                    batch_size = WRITE_BATCH_SIZE
+
+                hash_stage.tune()
+                exif_stage.tune()
 
                 current_time = time.time()
                 if current_time - last_processing_log_time > 15:
                     elapsed = current_time - processing_start_time
                     rate = photos_processed / elapsed if elapsed > 0 else 0
-                    percentage = (photos_processed / total_jobs) * 100 if total_jobs > 0 else 0
+                    percentage = (received / total_jobs) * 100 if total_jobs > 0 else 0
                     
                     etc_str = ""
+                    eta = None
                     if rate > 0:
-                        remaining_jobs = total_jobs - photos_processed
+                        remaining_jobs = total_jobs - received
                         etc_seconds = remaining_jobs / rate
-                        etc_str = f" ETC: {_format_time(etc_seconds)}"
+                        eta = _format_time(etc_seconds)
+                        etc_str = f" ETC: {eta}"
+                    reporter.update(processed=received, rate=rate, eta=eta)
 
-                    logging.info(f"Processed {photos_processed}/{total_jobs} ({percentage:.1f}%) photos. Rate: {rate:.2f} records/sec.{etc_str}")
+                    logging.info(f"Processed {photos_processed}/{total_jobs} ({percentage:.1f}%) photos. Rate: {rate:.2f} records/sec. Hashing: {hashing.stats.bytes / (1024 * 1024) / elapsed:.2f} MB/s.{etc_str}")
                     last_processing_log_time = current_time
 
+            if batch:
+                write_batch(batch)
+        reporter.update(processed=received, eta=None)
+        index_checkpoint.finish()
+    finally:
+        hash_cache.close()
+
     total_time = time.time() - processing_start_time
     logging.info("--------------------")
     logging.info("Indexing finished.")
@@ -254,5 +548,12 @@ def run_indexing(update_md5sum: bool = False, folder: str = None):
         logging.info(f"Processed {photos_processed} photos.")
     
     logging.info(f"MD5 sums computed: {md5sums_computed}")
+    logging.info(f"Moved photos detected: {photos_moved}")
+    logging.info(f"Duplicate photos skipped: {duplicates_skipped}")
+    logging.info(f"Hashing throughput: {hashing.stats.summary()}")
+    logging.info(f"Hash cache: {hash_cache.summary()}")
+    logging.info(f"Final stage sizes: {hash_tuner.workers} hashing threads, {exif_tuner.workers} EXIF processes")
+    if total_time > 0:
+        logging.info(f"Aggregate hashing rate: {hashing.stats.bytes / (1024 * 1024) / total_time:.2f} MB/s")
     logging.info(f"EXIF data collected: {exif_data_collected}")
     logging.info("--------------------")
\ No newline at end of file
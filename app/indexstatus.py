@@ -0,0 +1,178 @@
+import os
+import fcntl
+import logging
+import sqlite3
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+from . import database
+
+# The index lock and the progress record shared by the standalone and the embedded
+# indexer. The lock is an fcntl lock on index.lock, so the kernel releases it when the
+# indexer exits or crashes; the progress record lives in the index_status table and
+# is refreshed by a heartbeat thread so the web server can tell a live run from a dead one.
+
+HEARTBEAT_INTERVAL = 5
+# A run whose heartbeat is older than this is reported as stalled
+STALE_AFTER = 3 * HEARTBEAT_INTERVAL
+
+def lock_path():
+    db_file = os.environ.get("PHOTOSHARE_DATABASE_FILE", "photoshare.db")
+    return Path(db_file).parent / "index.lock"
+
+class IndexLock:
+    """Exclusive, non-blocking fcntl lock on index.lock (or path) holding the owner's PID."""
+
+    def __init__(self, path: Path = None):
+        self.path = Path(path) if path else lock_path()
+        self._file = None
+
+    def acquire(self) -> bool:
+        """Takes the lock, returning False if another indexer holds it."""
+        f = open(self.path, 'a+')
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            f.close()
+            return False
+        try:
+            replaced = os.stat(self.path).st_ino != os.fstat(f.fileno()).st_ino
+        except FileNotFoundError:
+            replaced = True
+        if replaced:
+            # The holder released and unlinked the file between our open and flock.
+            f.close()
+            return False
+        f.truncate(0)
+        f.write(str(os.getpid()))
+        f.flush()
+        self._file = f
+        return True
+
+    def release(self):
+        if self._file is None:
+            return
+        try:
+            self.path.unlink()
+        except FileNotFoundError:
+            pass
+        fcntl.flock(self._file, fcntl.LOCK_UN)
+        self._file.close()
+        self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+        return False
+
+def is_locked(path: Path = None) -> bool:
+    """Returns True while an indexer holds the lock. A leftover file of a crashed run is not a lock."""
+    path = Path(path) if path else lock_path()
+    try:
+        f = open(path, 'r')
+    except FileNotFoundError:
+        return False
+    with f:
+        try:
+            fcntl.flock(f, fcntl.LOCK_SH | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return True
+        fcntl.flock(f, fcntl.LOCK_UN)
+        return False
+
+class ProgressReporter:
+    """
+    Holds the progress of the running index and writes it to index_status every
+    HEARTBEAT_INTERVAL seconds from a background thread. update() only touches memory.
+    With a channel (a multiprocessing Connection) each heartbeat is also sent to the
+    supervising process.
+    """
+
+    def __init__(self, channel=None):
+        self.channel = channel
+        self.progress = {'phase': 'starting', 'discovered': 0, 'total': 0, 'processed': 0, 'rate': 0.0, 'eta': None}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def update(self, **fields):
+        with self._lock:
+            self.progress.update(fields)
+
+    def start(self):
+        now = datetime.now(timezone.utc).isoformat()
+        conn = database.get_db_connection()
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO index_status (id, pid, phase, started, heartbeat, finished, discovered, total, processed, rate, eta) "
+                "VALUES (1, ?, 'starting', ?, ?, NULL, 0, 0, 0, 0, NULL)",
+                (os.getpid(), now, now)
+            )
+            conn.commit()
+        except sqlite3.Error as e:
+            logging.error(f"Database error when writing index status: {e}")
+        finally:
+            conn.close()
+        self._thread = threading.Thread(target=self._run, name="index-heartbeat", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(HEARTBEAT_INTERVAL):
+            self.write()
+
+    def write(self, finished: bool = False):
+        with self._lock:
+            progress = dict(self.progress)
+        now = datetime.now(timezone.utc).isoformat()
+        conn = database.get_db_connection()
+        try:
+            conn.execute(
+                "UPDATE index_status SET phase = ?, heartbeat = ?, finished = ?, discovered = ?, total = ?, processed = ?, rate = ?, eta = ? WHERE id = 1",
+                (progress['phase'], now, now if finished else None, progress['discovered'], progress['total'],
+                 progress['processed'], progress['rate'], progress['eta'])
+            )
+            conn.commit()
+        except sqlite3.Error as e:
+            logging.error(f"Database error when writing index status: {e}")
+        finally:
+            conn.close()
+        if self.channel is not None:
+            try:
+                self.channel.send(('progress', progress))
+            except OSError as e:
+                logging.debug(f"Could not send index progress to supervisor: {e}")
+
+    def stop(self, phase: str):
+        """Stops the heartbeat and records the final phase ('finished' or 'failed')."""
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        self.update(phase=phase)
+        self.write(finished=True)
+
+def get_status():
+    """Returns the last recorded progress, with 'running' and 'stalled' derived from the lock and heartbeat."""
+    conn = database.get_db_connection()
+    try:
+        row = conn.execute("SELECT * FROM index_status WHERE id = 1").fetchone()
+    except sqlite3.Error as e:
+        logging.error(f"Database error when reading index status: {e}")
+        row = None
+    finally:
+        conn.close()
+
+    running = is_locked()
+    if row is None:
+        return {'running': running, 'stalled': False, 'phase': None}
+
+    status = dict(row)
+    status['running'] = running
+    status['stalled'] = False
+    if status['finished'] is None and status['heartbeat']:
+        age = (datetime.now(timezone.utc) - datetime.fromisoformat(status['heartbeat'])).total_seconds()
+        status['heartbeat_age'] = round(age, 1)
+        # An unfinished run without a lock died; one with a lock but no heartbeat is hung.
+        status['stalled'] = age > STALE_AFTER or not running
+    return status
@@ -0,0 +1,50 @@
+import os
+import logging
+import threading
+from pathlib import Path
+from . import indexstatus
+
+log = logging.getLogger(__name__)
+
+# Leader election among web server workers. With `uvicorn --workers N` every worker
+# runs the lifespan; the one holding leader.lock owns the background jobs (tag count
+# recomputes, the embedded indexer) and the others follow. The lock is an fcntl lock,
+# so when the leader exits the kernel frees it and a follower takes over on its next try.
+
+RETRY_INTERVAL = 30
+
+def leader_lock_path():
+    db_file = os.environ.get("PHOTOSHARE_DATABASE_FILE", "photoshare.db")
+    return Path(db_file).parent / "leader.lock"
+
+class LeaderElection:
+    """Tries to become leader at start, then keeps retrying in the background as a follower."""
+
+    def __init__(self, on_elected, path: Path = None, retry_interval: float = RETRY_INTERVAL):
+        self.lock = indexstatus.IndexLock(path or leader_lock_path())
+        self.on_elected = on_elected
+        self.retry_interval = retry_interval
+        self.is_leader = False
+        self._stop = threading.Event()
+
+    def start(self) -> bool:
+        """Returns True if this process is the leader. on_elected is only called for later promotions."""
+        if self.lock.acquire():
+            self.is_leader = True
+            log.info(f"Process {os.getpid()} elected leader for background jobs.")
+            return True
+        log.info(f"Process {os.getpid()} is a follower; another worker runs background jobs.")
+        threading.Thread(target=self._retry, name="leader-election", daemon=True).start()
+        return False
+
+    def _retry(self):
+        while not self._stop.wait(self.retry_interval):
+            if self.lock.acquire():
+                self.is_leader = True
+                log.info(f"Leader went away; process {os.getpid()} takes over background jobs.")
+                self.on_elected()
+                return
+
+    def stop(self):
+        self._stop.set()
+        self.lock.release()
@@ -1,8 +1,9 @@
 import random
 import logging
 import os
+import re
 import sqlite3
-import threading
+import time
 from typing import Optional
 from contextlib import asynccontextmanager
 from pathlib import Path
@@ -21,7 +22,7 @@ from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from urllib.parse import quote_plus, unquote_plus
 
-from . import caching, database, indexing, zipdownload, image_processing
+from . import caching, database, folders, geo, indexstatus, leader, shape, supervisor, tagquery, timeline, zipdownload, image_processing, throttle
 
 # Load environment variables from .env file
 load_dotenv()
@@ -30,6 +31,30 @@ load_dotenv()
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(name)s - %(message)s', filename='photoshare.log', filemode='a')
 log = logging.getLogger(__name__)
 
+# Leader election and the supervisor of the embedded indexer process, set during startup
+election = None
+indexer_supervisor = None
+
+def _start_indexer():
+    """
+    Starts the indexer in a supervised child process unless another process (the
+    standalone indexer) holds the index lock. The lock is released by the kernel when
+    its holder exits, so a crashed indexer never blocks this. The child runs throttled,
+    backs off when request latency rises, and continues from the checkpoint of a run
+    the last shutdown interrupted.
+    """
+    global indexer_supervisor
+    indexer_supervisor = supervisor.IndexerSupervisor()
+    if indexer_supervisor.start():
+        log.info("Index lock acquired. Started background indexer process.")
+    else:
+        log.info("Index lock is held. Assuming another indexer is running.")
+
+def _start_leader_jobs():
+    """Takes over the background jobs after this worker is promoted to leader."""
+    caching.promote_to_leader()
+    _start_indexer()
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """
@@ -38,19 +63,19 @@ async def lifespan(app: FastAPI):
     database.init_db()
     log.info("Application startup complete.")
     
-    # Start the background cache refresh
-    caching.start_background_refresh()
-
-    # Check for a lock file and start the indexer if needed
-    db_file = os.environ.get("PHOTOSHARE_DATABASE_FILE", "photoshare.db")
-    lock_file = Path(db_file).parent / "index.lock"
-    if not lock_file.exists():
-        log.info("No lock file found. Starting background indexing thread.")
-        thread = threading.Thread(target=indexing.run_indexing, daemon=True)
-        thread.start()
+    # With several uvicorn workers exactly one, the leader, runs the background jobs;
+    # followers load its tag counts and take over if it goes away.
+    global election
+    election = leader.LeaderElection(on_elected=_start_leader_jobs)
+    if election.start():
+        caching.start_background_refresh(caching.LEADER)
+        _start_indexer()
     else:
-        log.info("Lock file found. Assuming external indexer is running.")
+        caching.start_background_refresh(caching.FOLLOWER)
     yield
+    if indexer_supervisor is not None:
+        indexer_supervisor.stop()
+    election.stop()
 
 app = FastAPI(lifespan=lifespan)
 
@@ -63,6 +88,20 @@ app.add_middleware(
     allow_headers=["Authorization"], # Explicitly allow only the required header
 )
 
+# Photo files, downloads and static files take as long as their transfer, which says
+# nothing about how busy the server is, so they are not timed.
+_UNTIMED_PATHS = re.compile(r"^/(?:photos/\d+$|download/|static/)")
+
+@app.middleware("http")
+async def record_request_latency(request: Request, call_next):
+    """Feeds request latency to the background indexer's throttle."""
+    if _UNTIMED_PATHS.match(request.url.path):
+        return await call_next(request)
+    start = time.perf_counter()
+    response = await call_next(request)
+    throttle.latency.record(time.perf_counter() - start)
+    return response
+
 # Mount static files directory
 app.mount("/static", StaticFiles(directory=str(Path(__file__).parent / "static")), name="static")
 
@@ -86,6 +125,7 @@ def _get_photo_response(photo: sqlite3.Row, request: Request):
         "tags": photo['tags'],
         "datetime_taken": photo['datetime_taken'],
         "geolocation": photo['geolocation'],
+        "place": photo['place'] or None,
         "urls": {"raw": photo_url, "full": photo_url, "regular": photo_url, "small": photo_url, "thumb": photo_url},
         "links": {"self": photo_url, "html": photo_url, "download": photo_url}
     }
@@ -127,23 +167,51 @@ async def get_untagged_photos(
 async def get_random_photo_details(
     request: Request,
     authorization: Optional[str] = Header(None),
-    tag: Optional[str] = None
+    tag: Optional[str] = None,
+    q: Optional[str] = None,
+    orientation: Optional[str] = None,
+    min_aspect: Optional[float] = None
 ):
     # Authentication
     api_key_env = os.environ.get("PHOTOSHARE_API_KEY")
     if not api_key_env or not authorization or authorization != f"Client-ID {api_key_env}":
         raise HTTPException(status_code=401, detail="Invalid or missing API Key.")
 
+    shape_filter = _parse_shape_filter(orientation, min_aspect)
+
+    if q:
+        matches = _evaluate_tag_query(q)
+        if shape_filter:
+            matches = shape.restrict(matches, shape_filter)
+        photo_id = matches.random()
+        photo = _get_photo_row(photo_id) if photo_id is not None else None
+        if not photo:
+            raise HTTPException(status_code=404, detail="No photos found.")
+        return JSONResponse(content=_get_photo_response(photo, request))
+
     conn = database.get_db_connection()
     try:
-        query = "SELECT * FROM photos"
-        params = []
-        if tag:
-            query += " WHERE tags LIKE ?"
-            params.append(f"%{tag}%")
-        query += " ORDER BY RANDOM() LIMIT 1"
-        
-        photo = conn.execute(query, tuple(params)).fetchone()
+        if shape_filter and not tag:
+            # Seeks from a random id rather than sorting every matching photo
+            photo_id = shape.random_photo_id(conn, shape_filter)
+            photo = conn.execute("SELECT * FROM photos WHERE id = ?", (photo_id,)).fetchone() if photo_id is not None else None
+        else:
+            query = "SELECT * FROM photos"
+            where_clauses = []
+            params = []
+            if tag:
+                # Exactly the photos the tag's counter counts, so the slideshow matches its header
+                condition, tag_params = database.tag_condition(tag)
+                where_clauses.append(condition)
+                params.extend(tag_params)
+            if shape_filter:
+                where_clauses.append(shape_filter[0])
+                params.extend(shape_filter[1])
+            if where_clauses:
+                query += " WHERE " + " AND ".join(where_clauses)
+            query += " ORDER BY RANDOM() LIMIT 1"
+
+            photo = conn.execute(query, tuple(params)).fetchone()
     except sqlite3.Error as e:
         log.error(f"Database error in /photos/random: {e}")
         raise HTTPException(status_code=500, detail="Database error.")
@@ -155,20 +223,126 @@ async def get_random_photo_details(
     
     return JSONResponse(content=_get_photo_response(photo, request))
 
-@app.get("/photos/sequence/{sequence_name}", response_class=JSONResponse)
+def _parse_shape_filter(orientation: Optional[str], min_aspect: Optional[float]):
+    """Resolves the orientation and min_aspect parameters to a shape filter, or raises a 400."""
+    try:
+        return shape.parse_filter(orientation, min_aspect)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def _evaluate_tag_query(q: str) -> tagquery.Bitmap:
+    """Resolves a boolean tag query to a bitmap of photo ids, or raises a 400."""
+    try:
+        return tagquery.bitmaps.evaluate(q)
+    except tagquery.TagQueryError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid tag query: {e}")
+
+def _get_photo_row(photo_id: int):
+    conn = database.get_db_connection()
+    try:
+        return conn.execute("SELECT * FROM photos WHERE id = ?", (photo_id,)).fetchone()
+    except sqlite3.Error as e:
+        log.error(f"Database error when fetching photo {photo_id}: {e}")
+        raise HTTPException(status_code=500, detail="Database error.")
+    finally:
+        conn.close()
+
+def _query_window_ids(matches: tagquery.Bitmap, is_shuffle: bool, shuffle_id: int, current_photo_id: Optional[int], direction: Optional[str], count: int = 1):
+    """
+    Steps through the photos matching a tag query in id order, or when shuffled in the
+    permutation of their ranks seeded by shuffle_id, wrapping around at the ends. Returns
+    up to count ids from the one after ('next') or before current_photo_id, or the first.
+    """
+    size = len(matches)
+    if not size:
+        return []
+    order = tagquery.ShuffleOrder(size, shuffle_id) if is_shuffle else None
+    step = 1
+    position = 0
+    if direction and current_photo_id:
+        rank = matches.rank(current_photo_id)
+        position = order.position(rank) if order else rank
+        if direction != 'next':
+            # A photo that left the matches sits just before the rank it would have
+            step = -1
+            position -= 1
+        elif current_photo_id in matches:
+            position += 1
+    positions = (position + step * i for i in range(min(count, size)))
+    return [matches.select(order.rank(p) if order else p % size) for p in positions]
+
+def _get_photo_rows(conn: sqlite3.Connection, photo_ids):
+    """The photo rows for photo_ids in one query, in the order of photo_ids."""
+    if not photo_ids:
+        return []
+    placeholders = ', '.join('?' for _ in photo_ids)
+    rows = {row['id']: row for row in conn.execute(f"SELECT * FROM photos WHERE id IN ({placeholders})", tuple(photo_ids))}
+    return [rows[photo_id] for photo_id in photo_ids if photo_id in rows]
+
+def _sequence_response(photos, request: Request, count: Optional[int], shuffle_id: Optional[int] = None):
+    if not photos:
+        raise HTTPException(status_code=404, detail="No photos found for this sequence.")
+    if count is None:
+        response_data = _get_photo_response(photos[0], request)
+    else:
+        response_data = {"photos": [_get_photo_response(photo, request) for photo in photos]}
+    if shuffle_id is not None:
+        response_data['shuffle_id'] = shuffle_id
+    return JSONResponse(content=response_data)
+
+@app.get("/photos/sequence/{sequence_name:path}", response_class=JSONResponse)
 async def get_photo_sequence(
     request: Request,
     sequence_name: str,
     authorization: Optional[str] = Header(None),
     current_photo_id: Optional[int] = None,
     direction: Optional[str] = None,
-    shuffle_id: Optional[int] = None
+    shuffle_id: Optional[int] = None,
+    q: Optional[str] = None,
+    day: Optional[str] = None,
+    orientation: Optional[str] = None,
+    min_aspect: Optional[float] = None,
+    count: Optional[int] = None
 ):
+    """
+    Returns the photo after ('next') or before current_photo_id in the named sequence, or
+    its first photo. With count, returns {"photos": [...]} holding that photo and up to
+    count - 1 more in the same direction, wrapping around, for clients to prefetch.
+    """
     # Authentication
     api_key_env = os.environ.get("PHOTOSHARE_API_KEY")
     if not api_key_env or not authorization or authorization != f"Client-ID {api_key_env}":
         raise HTTPException(status_code=401, detail="Invalid or missing API Key.")
 
+    if count is not None:
+        count = max(1, min(count, 50))
+
+    # Only photos of this orientation and aspect ratio, for portrait or landscape displays
+    shape_filter = _parse_shape_filter(orientation, min_aspect)
+
+    # Photos taken on today's date (or day=MM-DD) in any year, or in year:YYYY, oldest first
+    try:
+        date_sequence = timeline.parse_sequence(sequence_name, day)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid year or day.")
+
+    # Photos under a folder, e.g. folder:/photos/2015/Italy, in path order
+    if sequence_name.startswith('folder:') or date_sequence:
+        conn = database.get_db_connection()
+        try:
+            if date_sequence:
+                photo_ids = timeline.sequence_photo_ids(conn, *date_sequence, current_photo_id, direction, shape_filter, count or 1)
+            else:
+                folder = sequence_name[len('folder:'):]
+                photo_ids = folders.sequence_photo_ids(conn, folder, current_photo_id, direction, shape_filter, count or 1)
+            photos = _get_photo_rows(conn, photo_ids)
+        except sqlite3.Error as e:
+            log.error(f"Database error in /photos/sequence: {e}")
+            raise HTTPException(status_code=500, detail="Database error.")
+        finally:
+            conn.close()
+        return _sequence_response(photos, request, count)
+
     base_query = "SELECT * FROM photos"
     where_clauses = []
     params = []
@@ -182,6 +356,26 @@ async def get_photo_sequence(
     else:
         base_sequence = sequence_name
 
+    # Photos matching a boolean tag query (q), navigated over the tag bitmaps
+    if base_sequence == 'query':
+        if not q:
+            raise HTTPException(status_code=400, detail="Missing tag query 'q'.")
+        if is_shuffle and shuffle_id is None:
+            shuffle_id = random.randint(100, 10000)
+        matches = _evaluate_tag_query(q)
+        if shape_filter:
+            matches = shape.restrict(matches, shape_filter)
+        photo_ids = _query_window_ids(matches, is_shuffle, shuffle_id, current_photo_id, direction, count or 1)
+        conn = database.get_db_connection()
+        try:
+            photos = _get_photo_rows(conn, photo_ids)
+        except sqlite3.Error as e:
+            log.error(f"Database error in /photos/sequence: {e}")
+            raise HTTPException(status_code=500, detail="Database error.")
+        finally:
+            conn.close()
+        return _sequence_response(photos, request, count, shuffle_id if is_shuffle else None)
+
     # Base filter for the sequence
     if base_sequence == 'new':
         where_clauses.append("(datetime_added IS NOT NULL AND datetime_added != '')")
@@ -223,6 +417,13 @@ async def get_photo_sequence(
     else:
         raise HTTPException(status_code=404, detail="Unknown sequence name.")
 
+    if shape_filter:
+        where_clauses.append(shape_filter[0])
+        params.extend(shape_filter[1])
+
+    # A window of count photos comes from the same query with a larger LIMIT
+    limit = count or 1
+
     conn = database.get_db_connection()
     try:
         if direction and current_photo_id:
@@ -264,30 +465,33 @@ async def get_photo_sequence(
 
             where_clauses.append("(datetime_deleted IS NULL OR datetime_deleted = '')")
 
-            query = f"{base_query} WHERE {' AND '.join(where_clauses)} {order_by} LIMIT 1"
-            photo = conn.execute(query, tuple(params)).fetchone()
+            query = f"{base_query} WHERE {' AND '.join(where_clauses)} {order_by} LIMIT ?"
+            photos = conn.execute(query, (*params, limit)).fetchall()
 
         else:
             # Initial load of the sequence
             if base_sequence == 'new' and not is_shuffle:
-                # Get top 1000 newest photos and pick one at random
-                top_1000_query = f"SELECT id FROM photos WHERE {' AND '.join(where_clauses)} {order_by_main} LIMIT 1000"
-                top_1000_ids = [row['id'] for row in conn.execute(top_1000_query, tuple(params)).fetchall()]
+                # Get top 1000 newest photos and pick one at random, followed by the rest of the window
+                top_1000_query = f"SELECT id FROM photos WHERE {' AND '.join(where_clauses)} {order_by_main} LIMIT ?"
+                top_1000_ids = [row['id'] for row in conn.execute(top_1000_query, (*params, 1000 + limit - 1)).fetchall()]
                 if not top_1000_ids:
                     raise HTTPException(status_code=404, detail="No new photos found.")
 
-                random_id = random.choice(top_1000_ids)
-                query = f"{base_query} WHERE id = ?"
-                photo = conn.execute(query, (random_id,)).fetchone()
+                start = random.randrange(min(len(top_1000_ids), 1000))
+                window_ids = top_1000_ids[start:start + limit]
+                if len(top_1000_ids) < 1000 + limit - 1:
+                    # These are all the new photos, so the window wraps around to the newest
+                    window_ids += top_1000_ids[:start][:limit - len(window_ids)]
+                photos = _get_photo_rows(conn, window_ids)
             else:
                 # For shuffle or other sequences, start from the first photo in order
                 where_clauses.append("(datetime_deleted IS NULL OR datetime_deleted = '')")
                 order_by = order_by_main
-                query = f"{base_query} WHERE {' AND '.join(where_clauses)} {order_by} LIMIT 1"
-                photo = conn.execute(query, tuple(params)).fetchone()
+                query = f"{base_query} WHERE {' AND '.join(where_clauses)} {order_by} LIMIT ?"
+                photos = conn.execute(query, (*params, limit)).fetchall()
 
         # Handle wraparound - loop back to first/last photo when reaching the end
-        if not photo and direction:
+        if len(photos) < limit and direction:
             # Reset where_clauses to only include the base filter and datetime_deleted
             wrap_where_clauses = []
 
@@ -299,17 +503,27 @@ async def get_photo_sequence(
             elif base_sequence == 'untagged':
                 wrap_where_clauses.append("(tags IS NULL OR tags = '')")
             # For plain shuffle, no additional filter needed
+            wrap_params = []
+            if shape_filter:
+                wrap_where_clauses.append(shape_filter[0])
+                wrap_params.extend(shape_filter[1])
 
             # Always filter out deleted photos
             wrap_where_clauses.append("(datetime_deleted IS NULL OR datetime_deleted = '')")
 
             # Build wraparound query with appropriate ordering
             if len(wrap_where_clauses) > 0:
-                wrap_query = f"{base_query} WHERE {' AND '.join(wrap_where_clauses)} {order_by_main if direction == 'next' else order_by_rev} LIMIT 1"
+                wrap_query = f"{base_query} WHERE {' AND '.join(wrap_where_clauses)} {order_by_main if direction == 'next' else order_by_rev} LIMIT ?"
             else:
-                wrap_query = f"{base_query} {order_by_main if direction == 'next' else order_by_rev} LIMIT 1"
+                wrap_query = f"{base_query} {order_by_main if direction == 'next' else order_by_rev} LIMIT ?"
 
-            photo = conn.execute(wrap_query).fetchone()
+            # The window ends where the sequence starts repeating itself
+            seen = {photo['id'] for photo in photos}
+            for photo in conn.execute(wrap_query, (*wrap_params, limit - len(photos))).fetchall():
+                if photo['id'] in seen:
+                    break
+                photos.append(photo)
+                seen.add(photo['id'])
 
     except sqlite3.Error as e:
         log.error(f"Database error in /photos/sequence: {e}")
@@ -317,23 +531,142 @@ async def get_photo_sequence(
     finally:
         conn.close()
 
-    if not photo:
-        raise HTTPException(status_code=404, detail="No photos found for this sequence.")
+    # Include shuffle_id in response for any shuffle mode
+    return _sequence_response(photos, request, count, shuffle_id if is_shuffle else None)
 
-    response_data = _get_photo_response(photo, request)
 
-    # Include shuffle_id in response for any shuffle mode
-    if is_shuffle:
-        response_data['shuffle_id'] = shuffle_id
+@app.get("/search/photos", response_class=JSONResponse)
+async def search_photos(
+    request: Request,
+    query: str,
+    authorization: Optional[str] = Header(None),
+    page: int = 1,
+    per_page: int = 10
+):
+    """Full-text search over tags, filenames and folder names, best matches first."""
+    # Authentication
+    api_key_env = os.environ.get("PHOTOSHARE_API_KEY")
+    if not api_key_env or not authorization or authorization != f"Client-ID {api_key_env}":
+        raise HTTPException(status_code=401, detail="Invalid or missing API Key.")
 
-    return JSONResponse(content=response_data)
+    page = max(1, page)
+    per_page = max(1, min(per_page, 30))
+    result = database.search_photos(query, per_page, (page - 1) * per_page)
+    if result is None:
+        raise HTTPException(status_code=503, detail="Search is unavailable.")
+
+    total, photos = result
+    return JSONResponse(content={
+        "total": total,
+        "total_pages": (total + per_page - 1) // per_page,
+        "results": [_get_photo_response(photo, request) for photo in photos]
+    })
 
 
+@app.get("/folders", response_class=JSONResponse)
+async def get_folders(parent: Optional[str] = None, authorization: Optional[str] = Header(None)):
+    """
+    Lists the subfolders of parent with their photo counts (subfolders included).
+    Without parent, lists the configured photo folders.
+    """
+    # Authentication
+    api_key_env = os.environ.get("PHOTOSHARE_API_KEY")
+    if not api_key_env or not authorization or authorization != f"Client-ID {api_key_env}":
+        raise HTTPException(status_code=401, detail="Invalid or missing API Key.")
+
+    try:
+        if parent:
+            return JSONResponse(content=folders.list_folders(parent))
+        roots = [{"name": root, "path": root, "photo_count": folders.count_photos(root)} for root in folders.photo_roots()]
+    except sqlite3.Error as e:
+        log.error(f"Database error in /folders: {e}")
+        raise HTTPException(status_code=500, detail="Database error.")
+    return JSONResponse(content={"folder": None, "photo_count": 0, "total_count": sum(r["photo_count"] for r in roots), "folders": roots})
+
+
+@app.get("/photos/near", response_class=JSONResponse)
+async def get_photos_near(
+    request: Request,
+    lat: float,
+    lon: float,
+    radius: float = 1000,
+    limit: int = 30,
+    authorization: Optional[str] = Header(None)
+):
+    """Photos within radius meters of (lat, lon), nearest first."""
+    # Authentication
+    api_key_env = os.environ.get("PHOTOSHARE_API_KEY")
+    if not api_key_env or not authorization or authorization != f"Client-ID {api_key_env}":
+        raise HTTPException(status_code=401, detail="Invalid or missing API Key.")
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180) or radius <= 0:
+        raise HTTPException(status_code=400, detail="Invalid location or radius.")
+
+    limit = max(1, min(limit, geo.MAX_NEAR_RESULTS))
+    try:
+        matches = geo.near(lat, lon, radius, limit)
+    except sqlite3.Error as e:
+        log.error(f"Database error in /photos/near: {e}")
+        raise HTTPException(status_code=500, detail="Database error.")
+    return JSONResponse(content={"photos": [
+        {**_get_photo_response(photo, request), "distance_m": round(distance, 1)} for photo, distance in matches
+    ]})
+
+
+@app.get("/geo/clusters", response_class=JSONResponse)
+async def get_geo_clusters(bbox: str, zoom: int = 0, authorization: Optional[str] = Header(None)):
+    """Precomputed photo clusters for a map viewport: bbox=min_lon,min_lat,max_lon,max_lat at map zoom."""
+    # Authentication
+    api_key_env = os.environ.get("PHOTOSHARE_API_KEY")
+    if not api_key_env or not authorization or authorization != f"Client-ID {api_key_env}":
+        raise HTTPException(status_code=401, detail="Invalid or missing API Key.")
+    try:
+        bounds = geo.parse_bbox(bbox)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid bbox.")
+    try:
+        clusters = geo.clusters(bounds, zoom)
+    except sqlite3.Error as e:
+        log.error(f"Database error in /geo/clusters: {e}")
+        raise HTTPException(status_code=500, detail="Database error.")
+    return JSONResponse(content={"zoom": zoom, "clusters": clusters})
+
+
+@app.get("/timeline", response_class=JSONResponse)
+async def get_timeline(year: Optional[int] = None, authorization: Optional[str] = Header(None)):
+    """Histogram of photos by year taken, or by month within year."""
+    # Authentication
+    api_key_env = os.environ.get("PHOTOSHARE_API_KEY")
+    if not api_key_env or not authorization or authorization != f"Client-ID {api_key_env}":
+        raise HTTPException(status_code=401, detail="Invalid or missing API Key.")
+
+    try:
+        buckets = timeline.histogram(year)
+    except sqlite3.Error as e:
+        log.error(f"Database error in /timeline: {e}")
+        raise HTTPException(status_code=500, detail="Database error.")
+    return JSONResponse(content={"year": year, "buckets": buckets})
+
+
+def _remove_photo(conn: sqlite3.Connection, photo_id: int, photo: sqlite3.Row):
+    """
+    Lists the photo's file in photos_to_delete.txt, deletes its row and drops it from
+    the tag index and the tag bitmaps.
+    """
+    db_dir = Path(database.get_db_path()).parent
+    delete_file = db_dir / "photos_to_delete.txt"
+    with open(delete_file, "a") as f:
+        f.write(f"{photo['path']}\n")
+
+    conn.execute("DELETE FROM photos WHERE id = ?", (photo_id,))
+    conn.commit()
+    caching.get_tag_index().apply_change(photo['tags'], None)
+    tagquery.bitmaps.remove_photo(photo_id, photo['tags'])
+
 @app.get("/photos/{photo_id}")
 async def get_photo_file(photo_id: int):
     conn = database.get_db_connection()
     try:
-        photo = conn.execute("SELECT path FROM photos WHERE id = ?", (photo_id,)).fetchone()
+        photo = conn.execute("SELECT path, tags FROM photos WHERE id = ?", (photo_id,)).fetchone()
     except sqlite3.Error as e:
         logging.error(f"Database error when fetching photo by ID {photo_id}: {e}")
         raise HTTPException(status_code=500, detail="Database error.")
@@ -350,12 +683,7 @@ async def get_photo_file(photo_id: int):
         # Mark the photo for deletion since the file is missing
         conn = database.get_db_connection()
         try:
-            db_dir = Path(database.get_db_path()).parent
-            delete_file = db_dir / "photos_to_delete.txt"
-            with open(delete_file, "a") as f:
-                f.write(f"{photo['path']}\n")
-            conn.execute("DELETE FROM photos WHERE id = ?", (photo_id,))
-            conn.commit()
+            _remove_photo(conn, photo_id, photo)
             log.info(f"Removed missing photo from database: {photo_id}")
         except Exception as e:
             log.error(f"Error marking missing photo for deletion: {e}")
@@ -374,17 +702,11 @@ async def mark_photo_for_deletion(photo_id: int, authorization: Optional[str] =
 
     conn = database.get_db_connection()
     try:
-        photo = conn.execute("SELECT path FROM photos WHERE id = ?", (photo_id,)).fetchone()
+        photo = conn.execute("SELECT path, tags FROM photos WHERE id = ?", (photo_id,)).fetchone()
         if not photo:
             raise HTTPException(status_code=404, detail="Photo not found in index.")
         
-        db_dir = Path(database.get_db_path()).parent
-        delete_file = db_dir / "photos_to_delete.txt"
-        with open(delete_file, "a") as f:
-            f.write(f"{photo['path']}\n")
-        
-        conn.execute("DELETE FROM photos WHERE id = ?", (photo_id,))
-        conn.commit()
+        _remove_photo(conn, photo_id, photo)
         log.info(f"Marked and removed photo {photo_id}")
 
     except sqlite3.Error as e:
@@ -413,8 +735,12 @@ async def tag_photo(photo_id: int, request: Request, authorization: Optional[str
 
     conn = database.get_db_connection()
     try:
+        photo = conn.execute("SELECT tags FROM photos WHERE id = ?", (photo_id,)).fetchone()
         conn.execute("UPDATE photos SET tags = ? WHERE id = ?", (tags, photo_id))
         conn.commit()
+        if photo:
+            caching.get_tag_index().apply_change(photo['tags'], tags)
+            tagquery.bitmaps.apply_change(photo_id, photo['tags'], tags)
         log.info(f"Tagged photo {photo_id} with: '{tags}'")
     except sqlite3.Error as e:
         log.error(f"Database error during photo tagging: {e}")
@@ -450,7 +776,8 @@ async def rotate_photo(photo_id: int, request: Request, authorization: Optional[
         new_md5sum = image_processing.rotate_image(photo['path'], direction)
 
         if new_md5sum:
-            conn.execute("UPDATE photos SET md5sum = ? WHERE id = ?", (new_md5sum, photo_id))
+            # The rotated file has its sides swapped and no EXIF orientation left
+            conn.execute("UPDATE photos SET md5sum = ?, width = height, height = width, exif_orientation = NULL WHERE id = ?", (new_md5sum, photo_id))
             conn.commit()
             log.info(f"Rotated photo {photo_id} ({direction}) and updated md5sum.")
             # Re-fetch the photo to get the updated data
@@ -466,13 +793,26 @@ async def rotate_photo(photo_id: int, request: Request, authorization: Optional[
         conn.close()
 
 
+@app.get("/admin/index/status", response_class=JSONResponse)
+async def get_index_status():
+    """Returns the phase, counts, rate and ETA of the current or last index run."""
+    status = indexstatus.get_status()
+    if indexer_supervisor is not None and indexer_supervisor.process is not None:
+        status['embedded'] = indexer_supervisor.status()
+    return JSONResponse(content=status)
+
+
 @app.get("/ui/dashboard", response_class=HTMLResponse)
 async def dashboard(request: Request):
     """Serves the dashboard HTML page."""
     conn = database.get_db_connection()
     try:
-        photo_count = conn.execute("SELECT COUNT(*) FROM photos").fetchone()[0]
-        tagged_photo_count = conn.execute("SELECT COUNT(*) FROM photos WHERE tags IS NOT NULL AND tags != ''").fetchone()[0]
+        counters = database.get_photo_counters()
+        if counters is not None:
+            photo_count, tagged_photo_count = counters['total'], counters['tagged']
+        else:
+            photo_count = conn.execute("SELECT COUNT(*) FROM photos").fetchone()[0]
+            tagged_photo_count = conn.execute("SELECT COUNT(*) FROM photos WHERE tags IS NOT NULL AND tags != ''").fetchone()[0]
         
         random_photo = conn.execute("SELECT id FROM photos ORDER BY RANDOM() LIMIT 1").fetchone()
         background_image_url = f"/photos/{random_photo['id']}" if random_photo else ""
@@ -483,9 +823,7 @@ async def dashboard(request: Request):
     finally:
         conn.close()
 
-    tag_counts = caching.get_tag_counts()
-    sorted_tags = sorted(tag_counts.items(), key=lambda item: item[1], reverse=True)
-    top_30_tags = dict(sorted_tags[:30])
+    top_30_tags = dict(caching.get_tag_index().top(30))
     max_count = max(top_30_tags.values()) if top_30_tags else 0
     tag_cloud = [
         {
@@ -497,12 +835,12 @@ async def dashboard(request: Request):
         for tag, count in top_30_tags.items()
     ]
 
-    return templates.TemplateResponse("dashboard.html", {
-        "request": request,
+    return templates.TemplateResponse(request, "dashboard.html", {
         "photo_count": photo_count,
         "tagged_photo_count": tagged_photo_count,
         "tag_cloud": tag_cloud,
-        "background_image_url": background_image_url
+        "background_image_url": background_image_url,
+        "index_status": indexstatus.get_status()
     })
 
 
@@ -516,15 +854,14 @@ async def slideshow(request: Request):
     """Serves the main random slideshow HTML page."""
     api_key = os.environ.get("PHOTOSHARE_API_KEY", "")
     google_maps_api_key = os.environ.get("GOOGLE_MAPS_API_KEY", "")
-    return templates.TemplateResponse("index.html", {
-        "request": request, 
+    return templates.TemplateResponse(request, "index.html", {
         "api_key": api_key, 
         "google_maps_api_key": google_maps_api_key,
         "slideshow_type": "random",
         "tag": None
     })
 
-@app.get("/ui/slideshow/{tag}", response_class=HTMLResponse)
+@app.get("/ui/slideshow/{tag:path}", response_class=HTMLResponse)
 async def slideshow_by_tag(request: Request, tag: str):
     """Serves the slideshow HTML page filtered by tag or special sequence."""
     api_key = os.environ.get("PHOTOSHARE_API_KEY", "")
@@ -538,6 +875,39 @@ async def slideshow_by_tag(request: Request, tag: str):
     special_filters = ['new', 'tagged', 'untagged']
     slideshow_type = "sequence" if base_tag in special_filters or is_shuffle else "random"
 
+    # O(1) lookups in the materialized counters, scanning only if they are missing
+    tag_photo_count = None
+    counters = database.get_photo_counters()
+    try:
+        date_sequence = timeline.parse_sequence(decoded_tag)
+    except ValueError:
+        raise HTTPException(status_code=404, detail="Invalid year.")
+    if decoded_tag.startswith('folder:'):
+        slideshow_type = "sequence"
+        tag_photo_count = folders.count_photos(decoded_tag[len('folder:'):])
+    elif date_sequence:
+        slideshow_type = "sequence"
+        tag_photo_count = timeline.count_photos(*date_sequence)
+    elif tagquery.is_query(decoded_tag):
+        # Boolean tag queries are shown as a shuffled sequence of their matches
+        slideshow_type = "query"
+        tag_photo_count = len(_evaluate_tag_query(decoded_tag))
+    elif counters is not None:
+        tag_photo_count = counters[base_tag] if base_tag in special_filters else database.get_tag_count(decoded_tag)
+    if tag_photo_count is None:
+        tag_photo_count = _count_photos_for_tag(base_tag, decoded_tag)
+
+    return templates.TemplateResponse(request, "index.html", {
+        "api_key": api_key,
+        "google_maps_api_key": google_maps_api_key,
+        "slideshow_type": slideshow_type,
+        "tag": decoded_tag,
+        "tag_photo_count": tag_photo_count
+    })
+
+
+def _count_photos_for_tag(base_tag: str, decoded_tag: str):
+    """Counts photos for a slideshow by scanning, for databases without counters."""
     conn = database.get_db_connection()
     try:
         if base_tag == 'new':
@@ -547,22 +917,22 @@ async def slideshow_by_tag(request: Request, tag: str):
         elif base_tag == 'untagged':
             tag_photo_count = conn.execute("SELECT COUNT(*) FROM photos WHERE tags IS NULL OR tags = ''").fetchone()[0]
         else:
-            tag_pattern = f"%{decoded_tag}%"
-            tag_photo_count = conn.execute("SELECT COUNT(*) FROM photos WHERE tags LIKE ?", (tag_pattern,)).fetchone()[0]
+            condition, params = database.tag_condition(decoded_tag)
+            tag_photo_count = conn.execute(f"SELECT COUNT(*) FROM photos WHERE {condition}", params).fetchone()[0]
     except sqlite3.Error as e:
         log.error(f"Database error when counting photos for tag {decoded_tag}: {e}")
         tag_photo_count = 0
     finally:
         conn.close()
+    return tag_photo_count
 
-    return templates.TemplateResponse("index.html", {
-        "request": request,
-        "api_key": api_key,
-        "google_maps_api_key": google_maps_api_key,
-        "slideshow_type": slideshow_type,
-        "tag": decoded_tag,
-        "tag_photo_count": tag_photo_count
-    })
+
+@app.get("/tags/suggest", response_class=JSONResponse)
+async def suggest_tags(q: str = '', limit: int = 10):
+    """Returns tags starting with q (case-insensitive), most used first, for autocomplete."""
+    limit = max(1, min(limit, 50))
+    suggestions = caching.get_tag_index().suggest(q.strip(), limit)
+    return JSONResponse(content={"suggestions": [{"tag": tag, "count": count} for tag, count in suggestions]})
 
 
 @app.get("/ui/tags", response_class=HTMLResponse)
@@ -578,9 +948,8 @@ async def tags_page(request: Request, sort_by: str = 'tag', order: str = 'asc',
     finally:
         conn.close()
 
-    tags = database.get_all_tags(sort_by=sort_by, order=order, search=search)
-    return templates.TemplateResponse("tags.html", {
-        "request": request,
+    tags = caching.get_tag_index().listing(sort_by=sort_by, order=order, search=search)
+    return templates.TemplateResponse(request, "tags.html", {
         "tags": tags,
         "sort_by": sort_by,
         "order": order,
@@ -593,4 +962,12 @@ async def tags_page(request: Request, sort_by: str = 'tag', order: str = 'asc',
 async def download_tagged_photos(tag: str):
     """Downloads all photos with a specific tag as a zip file."""
     downloader = zipdownload.ZipDownloader()
-    return downloader.create_zip_for_tag(tag)
\ No newline at end of file
+    return downloader.create_zip_for_tag(tag)
+
+
+@app.get("/download/query", response_class=StreamingResponse)
+async def download_query_photos(q: str):
+    """Downloads all photos matching a boolean tag query, e.g. 'family AND beach NOT 2019', as a zip file."""
+    photo_ids = list(_evaluate_tag_query(q))
+    downloader = zipdownload.ZipDownloader()
+    return downloader.create_zip_for_ids(photo_ids, re.sub(r'[^\w-]+', '_', q).strip('_'))
\ No newline at end of file
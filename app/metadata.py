@@ -0,0 +1,205 @@
+import struct
+import logging
+from datetime import datetime
+
+# Header-only metadata reader for JPEG and PNG files. It reads the segment/chunk
+# headers and the EXIF block only, seeking past everything else, so extracting
+# dimensions, DateTimeOriginal, GPS and Orientation never decodes the image.
+
+JPEG_SOI = b'\xff\xd8'
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+# SOF markers carrying frame dimensions (excludes DHT 0xC4, JPG 0xC8 and DAC 0xCC)
+_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+# EXIF tag ids
+_TAG_ORIENTATION = 0x0112
+_TAG_EXIF_IFD = 0x8769
+_TAG_GPS_IFD = 0x8825
+_TAG_DATETIME_ORIGINAL = 0x9003
+_TAG_GPS_LAT_REF = 1
+_TAG_GPS_LAT = 2
+_TAG_GPS_LON_REF = 3
+_TAG_GPS_LON = 4
+
+# Sizes of the TIFF field types used below
+_TYPE_SIZES = {1: 1, 2: 1, 3: 2, 4: 4, 5: 8, 7: 1, 9: 4, 10: 8}
+
+class MetadataError(Exception):
+    """Raised when a file's headers cannot be parsed."""
+
+def read_metadata(image_path):
+    """
+    Reads width, height, datetime_taken, geolocation and orientation from the headers
+    of a JPEG or PNG file. Returns None if the format is not supported or the headers
+    are malformed, so callers can fall back to Pillow.
+    """
+    try:
+        with open(image_path, 'rb') as f:
+            magic = f.read(8)
+            if magic[:2] == JPEG_SOI:
+                f.seek(2)
+                width, height, exif = _read_jpeg(f)
+            elif magic == PNG_SIGNATURE:
+                width, height, exif = _read_png(f)
+            else:
+                return None
+    except (OSError, MetadataError, struct.error) as e:
+        logging.debug(f"Header-only metadata read failed for {image_path}: {e}")
+        return None
+
+    if not width or not height:
+        return None
+
+    tags = {}
+    if exif:
+        try:
+            tags = _parse_tiff(exif)
+        except (MetadataError, struct.error, IndexError, ValueError) as e:
+            logging.debug(f"Could not parse EXIF block of {image_path}: {e}")
+
+    return {
+        'width': width,
+        'height': height,
+        'geolocation': _geolocation(tags),
+        'datetime_taken': _datetime_taken(tags),
+        'orientation': tags.get(_TAG_ORIENTATION),
+    }
+
+def _read_jpeg(f):
+    """Walks JPEG segments up to the first SOF, returning (width, height, exif_bytes)."""
+    exif = None
+    while True:
+        marker = f.read(2)
+        if len(marker) < 2:
+            raise MetadataError("Unexpected end of JPEG headers")
+        if marker[0] != 0xFF:
+            raise MetadataError("Invalid JPEG marker")
+        code = marker[1]
+        # Fill bytes and parameterless markers
+        if code == 0xFF:
+            f.seek(-1, 1)
+            continue
+        if code == 0x01 or 0xD0 <= code <= 0xD7:
+            continue
+        if code in (0xD9, 0xDA):
+            raise MetadataError("No SOF segment before image data")
+
+        length = struct.unpack('>H', f.read(2))[0]
+        if length < 2:
+            raise MetadataError("Invalid JPEG segment length")
+
+        if code in _SOF_MARKERS:
+            _precision, height, width = struct.unpack('>BHH', f.read(5))
+            return width, height, exif
+        if code == 0xE1 and exif is None:
+            payload = f.read(length - 2)
+            if payload.startswith(b'Exif\x00\x00'):
+                exif = payload[6:]
+            continue
+        f.seek(length - 2, 1)
+
+def _read_png(f):
+    """Reads IHDR and walks chunks up to IDAT looking for eXIf, returning (width, height, exif_bytes)."""
+    length, chunk_type = struct.unpack('>I4s', f.read(8))
+    if chunk_type != b'IHDR' or length < 8:
+        raise MetadataError("PNG does not start with IHDR")
+    width, height = struct.unpack('>II', f.read(8))
+    f.seek(length - 8 + 4, 1)  # rest of IHDR and its CRC
+
+    exif = None
+    while True:
+        header = f.read(8)
+        if len(header) < 8:
+            break
+        length, chunk_type = struct.unpack('>I4s', header)
+        if chunk_type in (b'IDAT', b'IEND'):
+            break
+        if chunk_type == b'eXIf':
+            exif = f.read(length)
+            break
+        f.seek(length + 4, 1)
+    return width, height, exif
+
+def _parse_tiff(data):
+    """Parses the IFD0, EXIF and GPS directories of a TIFF/EXIF block into {tag_id: value}."""
+    if data[:2] == b'II':
+        endian = '<'
+    elif data[:2] == b'MM':
+        endian = '>'
+    else:
+        raise MetadataError("Invalid TIFF byte order")
+    if struct.unpack(endian + 'H', data[2:4])[0] != 42:
+        raise MetadataError("Invalid TIFF magic")
+
+    ifd0 = _read_ifd(data, endian, struct.unpack(endian + 'I', data[4:8])[0])
+    tags = {}
+    if _TAG_ORIENTATION in ifd0:
+        tags[_TAG_ORIENTATION] = ifd0[_TAG_ORIENTATION]
+    if _TAG_EXIF_IFD in ifd0:
+        exif_ifd = _read_ifd(data, endian, ifd0[_TAG_EXIF_IFD])
+        if _TAG_DATETIME_ORIGINAL in exif_ifd:
+            tags[_TAG_DATETIME_ORIGINAL] = exif_ifd[_TAG_DATETIME_ORIGINAL]
+    if _TAG_GPS_IFD in ifd0:
+        tags['gps'] = _read_ifd(data, endian, ifd0[_TAG_GPS_IFD])
+    return tags
+
+def _read_ifd(data, endian, offset):
+    """Reads the scalar, ASCII and RATIONAL entries of one IFD."""
+    if offset + 2 > len(data):
+        raise MetadataError("IFD offset out of range")
+    count = struct.unpack(endian + 'H', data[offset:offset + 2])[0]
+    entries = {}
+    for i in range(count):
+        entry = offset + 2 + i * 12
+        if entry + 12 > len(data):
+            break
+        tag, field_type, num = struct.unpack(endian + 'HHI', data[entry:entry + 8])
+        size = _TYPE_SIZES.get(field_type)
+        if size is None:
+            continue
+        if size * num <= 4:
+            value_offset = entry + 8
+        else:
+            value_offset = struct.unpack(endian + 'I', data[entry + 8:entry + 12])[0]
+        raw = data[value_offset:value_offset + size * num]
+        if len(raw) < size * num:
+            continue
+        entries[tag] = _decode_value(raw, endian, field_type, num)
+    return entries
+
+def _decode_value(raw, endian, field_type, num):
+    if field_type == 2:
+        return raw.split(b'\x00', 1)[0].decode('ascii', errors='replace')
+    if field_type in (5, 10):
+        fmt = 'I' if field_type == 5 else 'i'
+        values = struct.unpack(endian + fmt * (2 * num), raw)
+        rationals = tuple(n / d if d else 0.0 for n, d in zip(values[0::2], values[1::2]))
+        return rationals if num > 1 else rationals[0]
+    fmt = {1: 'B', 3: 'H', 4: 'I', 7: 'B', 9: 'i'}[field_type]
+    values = struct.unpack(endian + fmt * num, raw)
+    return values if num > 1 else values[0]
+
+def _datetime_taken(tags):
+    dt_str = tags.get(_TAG_DATETIME_ORIGINAL)
+    if not dt_str or not isinstance(dt_str, str):
+        return None
+    try:
+        return datetime.strptime(dt_str.strip(), '%Y:%m:%d %H:%M:%S').isoformat()
+    except (ValueError, TypeError):
+        return None
+
+def _geolocation(tags):
+    gps = tags.get('gps')
+    if not gps:
+        return None
+    lat, lat_ref, lon, lon_ref = gps.get(_TAG_GPS_LAT), gps.get(_TAG_GPS_LAT_REF), gps.get(_TAG_GPS_LON), gps.get(_TAG_GPS_LON_REF)
+    if not (isinstance(lat, tuple) and isinstance(lon, tuple) and lat_ref and lon_ref) or len(lat) != 3 or len(lon) != 3:
+        return None
+    lat_dec = lat[0] + lat[1] / 60.0 + lat[2] / 3600.0
+    lon_dec = lon[0] + lon[1] / 60.0 + lon[2] / 3600.0
+    if lat_ref in ['S', 'W']:
+        lat_dec = -lat_dec
+    if lon_ref in ['S', 'W']:
+        lon_dec = -lon_dec
+    return f"{lat_dec},{lon_dec}"
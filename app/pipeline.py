@@ -0,0 +1,193 @@
+import time
+import queue
+import logging
+import threading
+
+# Building blocks for the staged indexer: a thread stage for I/O-bound work, a
+# process stage for CPU-bound work, and a tuner that grows or shrinks a stage's
+# concurrency based on the throughput it measures.
+
+_STOP = object()
+
+class StageTuner:
+    """
+    Hill-climbing concurrency tuner. Every interval it compares the stage's completion
+    rate with the previous interval: while throughput keeps improving it keeps stepping
+    in the same direction, otherwise it reverses. It never grows a starved stage.
+    """
+
+    def __init__(self, name: str, workers: int, min_workers: int, max_workers: int, interval: float = 5.0):
+        self.name = name
+        self.workers = max(min_workers, min(workers, max_workers))
+        self.min_workers = min_workers
+        self.max_workers = max_workers
+        self.interval = interval
+        self.completed = 0
+        self._lock = threading.Lock()
+        self._step = 1
+        self._last_time = time.monotonic()
+        self._last_completed = 0
+        self._last_rate = None
+
+    def record(self, n: int = 1):
+        with self._lock:
+            self.completed += n
+
+    def tune(self, backlog: int):
+        """
+        Returns a new worker count when one is due, otherwise None.
+        backlog is the number of items waiting for this stage.
+        """
+        now = time.monotonic()
+        elapsed = now - self._last_time
+        if elapsed < self.interval:
+            return None
+        with self._lock:
+            completed = self.completed
+        rate = (completed - self._last_completed) / elapsed
+        self._last_time, self._last_completed = now, completed
+
+        if self._last_rate is not None and rate < self._last_rate * 0.95:
+            self._step = -self._step
+        self._last_rate = rate
+
+        step = self._step
+        if step > 0 and backlog == 0:
+            # Upstream is the bottleneck; more workers would only sit idle.
+            return None
+        workers = max(self.min_workers, min(self.workers + step, self.max_workers))
+        if workers == self.workers:
+            self._step = -self._step
+            return None
+        logging.info(f"Tuning {self.name} stage from {self.workers} to {workers} workers ({rate:.2f} items/sec).")
+        self.workers = workers
+        return workers
+
+class ThreadStage:
+    """
+    Runs func over items on a resizable set of threads fed by a bounded queue.
+    func's return value is passed to on_result; exceptions are logged and reported as None.
+    """
+
+    def __init__(self, name: str, func, on_result, workers: int, queue_depth: int, tuner: StageTuner = None, initializer=None):
+        self.name = name
+        self.func = func
+        self.initializer = initializer
+        self.on_result = on_result
+        self.input = queue.Queue(maxsize=queue_depth)
+        self.tuner = tuner
+        self._target = 0
+        self._threads = []
+        self._lock = threading.Lock()
+        self.resize(workers)
+
+    def resize(self, workers: int):
+        """Starts threads up to workers; surplus threads exit after their current item."""
+        with self._lock:
+            self._target = workers
+            self._threads = [t for t in self._threads if t.is_alive()]
+            for _ in range(workers - len(self._threads)):
+                thread = threading.Thread(target=self._run, name=f"{self.name}-worker", daemon=True)
+                self._threads.append(thread)
+                thread.start()
+
+    def _should_retire(self):
+        with self._lock:
+            alive = [t for t in self._threads if t.is_alive()]
+            if len(alive) > self._target:
+                self._threads.remove(threading.current_thread())
+                return True
+            return False
+
+    def _run(self):
+        if self.initializer:
+            self.initializer()
+        while True:
+            if self._should_retire():
+                return
+            try:
+                item = self.input.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            if item is _STOP:
+                self.input.put(_STOP)
+                return
+            try:
+                result = self.func(item)
+            except Exception as e:
+                logging.error(f"{self.name} stage failed for {item!r}: {e}")
+                result = None
+            if self.tuner:
+                self.tuner.record()
+            self.on_result(item, result)
+
+    def put(self, item):
+        self.input.put(item)
+
+    def backlog(self):
+        return self.input.qsize()
+
+    def tune(self):
+        if self.tuner:
+            workers = self.tuner.tune(self.backlog())
+            if workers is not None:
+                self.resize(workers)
+
+    def close(self):
+        """Lets queued items drain, then stops the threads."""
+        self.input.put(_STOP)
+        for thread in list(self._threads):
+            thread.join()
+
+class ProcessStage:
+    """
+    Submits items to a multiprocessing pool with a tunable limit on tasks in flight.
+    The pool is sized for the maximum; the limit decides how many processes are busy.
+    """
+
+    def __init__(self, name: str, pool, func, on_result, tuner: StageTuner):
+        self.name = name
+        self.pool = pool
+        self.func = func
+        self.on_result = on_result
+        self.tuner = tuner
+        self._in_flight = 0
+        self._waiting = 0
+        self._cond = threading.Condition()
+
+    def put(self, item, args: tuple = None):
+        """
+        Blocks while the in-flight limit is reached, then submits func(*args).
+        item is handed back to on_result; args defaults to (item,).
+        """
+        with self._cond:
+            self._waiting += 1
+            while self._in_flight >= self.tuner.workers:
+                self._cond.wait()
+            self._waiting -= 1
+            self._in_flight += 1
+        self.pool.apply_async(
+            self.func, args if args is not None else (item,),
+            callback=lambda result: self._done(item, result),
+            error_callback=lambda e: self._failed(item, e),
+        )
+
+    def _done(self, item, result):
+        with self._cond:
+            self._in_flight -= 1
+            self._cond.notify()
+        self.tuner.record()
+        self.on_result(item, result)
+
+    def _failed(self, item, error):
+        logging.error(f"{self.name} stage failed for {item!r}: {error}")
+        self._done(item, None)
+
+    def backlog(self):
+        with self._cond:
+            return self._waiting
+
+    def tune(self):
+        if self.tuner.tune(self.backlog()) is not None:
+            with self._cond:
+                self._cond.notify_all()
@@ -0,0 +1,69 @@
+import json
+import random
+import sqlite3
+from . import database, tagquery
+
+# Orientation and aspect ratio filters for display devices. aspect_ratio is a generated
+# column (see database.ASPECT_RATIO) holding the displayed width / height, with the sides
+# swapped for EXIF orientations 5-8, and it is indexed, so a filter is one range scan on
+# idx_photos_aspect_ratio. Photos within SQUARE_TOLERANCE of 1 count as square.
+
+SQUARE_TOLERANCE = 0.05
+ORIENTATIONS = ('portrait', 'landscape', 'square')
+
+def parse_filter(orientation: str = None, min_aspect: float = None):
+    """
+    Returns the (condition, params) selecting photos of orientation with at least
+    min_aspect, or None when neither is given. Raises ValueError for invalid values.
+    """
+    clauses, params = [], []
+    if orientation:
+        if orientation == 'portrait':
+            clauses.append("aspect_ratio < ?")
+            params.append(1 - SQUARE_TOLERANCE)
+        elif orientation == 'landscape':
+            clauses.append("aspect_ratio > ?")
+            params.append(1 + SQUARE_TOLERANCE)
+        elif orientation == 'square':
+            clauses.append("aspect_ratio BETWEEN ? AND ?")
+            params.extend([1 - SQUARE_TOLERANCE, 1 + SQUARE_TOLERANCE])
+        else:
+            raise ValueError(f"orientation must be one of {', '.join(ORIENTATIONS)}")
+    if min_aspect is not None:
+        if not min_aspect > 0:
+            raise ValueError("min_aspect must be positive")
+        clauses.append("aspect_ratio >= ?")
+        params.append(min_aspect)
+    if not clauses:
+        return None
+    return ' AND '.join(clauses), params
+
+def random_photo_id(conn: sqlite3.Connection, shape_filter):
+    """
+    Id of a random photo matching shape_filter: the first match at or after a random id,
+    wrapping around to the lowest match. Both are a single seek rather than counting matches.
+    """
+    condition, params = shape_filter
+    max_id = conn.execute("SELECT MAX(id) FROM photos").fetchone()[0]
+    if max_id is None:
+        return None
+    row = conn.execute(f"SELECT id FROM photos WHERE {condition} AND id >= ? ORDER BY id LIMIT 1", (*params, random.randint(1, max_id))).fetchone()
+    if row is None:
+        row = conn.execute(f"SELECT id FROM photos WHERE {condition} ORDER BY id LIMIT 1", params).fetchone()
+    return row['id'] if row else None
+
+def restrict(matches: tagquery.Bitmap, shape_filter) -> tagquery.Bitmap:
+    """
+    The photos of a tag query bitmap that match shape_filter. The condition is checked by
+    primary key for the matching ids only, so the cost follows the query, not the library.
+    """
+    if not matches:
+        return matches
+    condition, params = shape_filter
+    conn = database.get_db_connection()
+    try:
+        rows = conn.execute(f"SELECT id FROM photos WHERE id IN (SELECT value FROM json_each(?)) AND {condition}",
+                            (json.dumps(list(matches)), *params))
+        return tagquery.Bitmap.from_ids(row['id'] for row in rows)
+    finally:
+        conn.close()
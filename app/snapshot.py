@@ -0,0 +1,147 @@
+import os
+import mmap
+import time
+import struct
+import logging
+import threading
+from types import MappingProxyType
+from pathlib import Path
+
+# Versioned snapshot of hot aggregates (tag counts and dashboard totals) shared by all
+# web server workers through one memory-mapped file. The leader writes a new file and
+# atomically renames it into place; readers map it read-only, so every worker shares
+# the same page-cache pages and serves the same numbers. Lookups read straight from
+# the mapping: the tag index is sorted, so a single tag is found by binary search
+# without decoding the rest.
+#
+# Layout (little-endian):
+#   header   magic(8) version(u64) created(f64) n_totals(u32) n_tags(u32)
+#   totals   n_totals x [name(16, NUL padded) value(i64)]
+#   index    n_tags x [blob offset(u32) length(u32) count(i64)], sorted by tag bytes
+#   blob     UTF-8 tag names
+
+MAGIC = b'PHSNAP01'
+_HEADER = struct.Struct('<8sQdII')
+_TOTAL = struct.Struct('<16sq')
+_ENTRY = struct.Struct('<IIq')
+
+class SnapshotError(Exception):
+    """Raised when a snapshot file is truncated or has the wrong format."""
+
+def snapshot_path():
+    db_file = os.environ.get("PHOTOSHARE_DATABASE_FILE", "photoshare.db")
+    return Path(db_file).parent / "aggregates.snapshot"
+
+def write_snapshot(path: Path, totals: dict, tag_counts: dict, version: int = None):
+    """Atomically replaces the snapshot at path. version defaults to a monotonic timestamp."""
+    path = Path(path)
+    if version is None:
+        version = time.time_ns()
+    tags = sorted((tag.encode('utf-8'), count) for tag, count in tag_counts.items())
+
+    parts = [_HEADER.pack(MAGIC, version, time.time(), len(totals), len(tags))]
+    for name, value in totals.items():
+        parts.append(_TOTAL.pack(name.encode('ascii')[:16], value))
+    offset = 0
+    for tag, count in tags:
+        parts.append(_ENTRY.pack(offset, len(tag), count))
+        offset += len(tag)
+    parts.extend(tag for tag, _ in tags)
+
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with open(tmp_path, 'wb') as f:
+        f.write(b''.join(parts))
+    os.replace(tmp_path, path)
+
+class Snapshot:
+    """A read-only view of one snapshot file version."""
+
+    def __init__(self, f):
+        self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._mm) < _HEADER.size:
+            raise SnapshotError("Snapshot file is truncated")
+        magic, self.version, self.created, n_totals, self.n_tags = _HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            raise SnapshotError("Not a snapshot file")
+        self._totals_start = _HEADER.size
+        self._index_start = self._totals_start + n_totals * _TOTAL.size
+        self._blob_start = self._index_start + self.n_tags * _ENTRY.size
+        self._n_totals = n_totals
+        self._tag_counts = None
+        if len(self._mm) < self._blob_start:
+            raise SnapshotError("Snapshot file is truncated")
+
+    def totals(self):
+        result = {}
+        for i in range(self._n_totals):
+            name, value = _TOTAL.unpack_from(self._mm, self._totals_start + i * _TOTAL.size)
+            result[name.rstrip(b'\x00').decode('ascii')] = value
+        return result
+
+    def _entry(self, i):
+        offset, length, count = _ENTRY.unpack_from(self._mm, self._index_start + i * _ENTRY.size)
+        start = self._blob_start + offset
+        return start, start + length, count
+
+    def tag_count(self, tag: str) -> int:
+        """Binary search over the sorted index; returns 0 for unknown tags."""
+        key = tag.encode('utf-8')
+        lo, hi = 0, self.n_tags
+        while lo < hi:
+            mid = (lo + hi) // 2
+            start, end, count = self._entry(mid)
+            current = self._mm[start:end]
+            if current == key:
+                return count
+            if current < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return 0
+
+    def tag_counts(self):
+        """
+        All tag counts as a read-only mapping. They are decoded on the first call only,
+        so the tag cloud and the tag index share one dict per snapshot version.
+        """
+        if self._tag_counts is None:
+            result = {}
+            for i in range(self.n_tags):
+                start, end, count = self._entry(i)
+                result[self._mm[start:end].decode('utf-8')] = count
+            self._tag_counts = MappingProxyType(result)
+        return self._tag_counts
+
+    def close(self):
+        self._mm.close()
+
+class SnapshotReader:
+    """
+    Maps the current snapshot file and remaps it when the writer replaces it.
+    Checking for a new version costs one stat() call.
+    """
+
+    def __init__(self, path: Path = None):
+        self.path = Path(path) if path else snapshot_path()
+        self._snapshot = None
+        self._identity = None
+        self._lock = threading.Lock()
+
+    def current(self):
+        """Returns the latest Snapshot, or None if none has been written yet."""
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        identity = (st.st_ino, st.st_mtime_ns, st.st_size)
+        with self._lock:
+            if identity != self._identity:
+                try:
+                    with open(self.path, 'rb') as f:
+                        snapshot = Snapshot(f)
+                except (OSError, ValueError, SnapshotError) as e:
+                    logging.warning(f"Could not map aggregates snapshot {self.path}: {e}")
+                    return self._snapshot
+                # The previous mapping is left to the garbage collector: a request may still be reading it.
+                self._snapshot, self._identity = snapshot, identity
+            return self._snapshot
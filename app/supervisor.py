@@ -0,0 +1,133 @@
+import sys
+import signal
+import logging
+import threading
+import multiprocessing
+from . import indexing, indexstatus, throttle
+
+log = logging.getLogger(__name__)
+
+# Runs the embedded indexer in a child process started with the spawn method, so the
+# multi-threaded web server never forks and the indexer's dispatch loop and worker
+# pool never share its GIL or memory. The child reports progress over a pipe and the
+# supervisor feeds it the web server's request latency for throttling. A child that
+# dies abnormally is restarted with backoff; it resumes from its checkpoint.
+
+MAX_RESTARTS = 5
+RESTART_DELAY = 5
+MAX_RESTART_DELAY = 300
+LATENCY_INTERVAL = 1.0
+STOP_TIMEOUT = 10
+
+def _indexer_main(conn):
+    """Entry point of the indexer child process."""
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(name)s - %(message)s', filename='photoshare.log', filemode='a')
+    # Turn the supervisor's terminate() into an exception so pools and checkpoints close cleanly.
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(1))
+
+    def receive_latency():
+        try:
+            while True:
+                kind, value = conn.recv()
+                if kind == 'latency':
+                    throttle.latency.average_ms = value
+        except (EOFError, OSError):
+            pass
+
+    threading.Thread(target=receive_latency, name="latency-receiver", daemon=True).start()
+    indexing.run_indexing(throttler=throttle.Throttle.from_env(), resume=True, progress_channel=conn)
+
+class IndexerSupervisor:
+    """
+    Starts the indexer child process while holding the index lock, relays progress
+    and latency over its pipe, and restarts it if it crashes. When uvicorn runs
+    several workers only the one that wins the lock supervises an indexer.
+    """
+
+    def __init__(self):
+        self.lock = indexstatus.IndexLock()
+        self.process = None
+        self.progress = None
+        self.restarts = 0
+        self._conn = None
+        self._stopping = threading.Event()
+        self._thread = None
+
+    def start(self) -> bool:
+        """Returns False, starting nothing, if another process holds the index lock."""
+        if not self.lock.acquire():
+            return False
+        self._spawn()
+        self._thread = threading.Thread(target=self._supervise, name="indexer-supervisor", daemon=True)
+        self._thread.start()
+        return True
+
+    def _spawn(self):
+        ctx = multiprocessing.get_context('spawn')
+        self._conn, child_conn = ctx.Pipe()
+        # Not a daemon: daemonic processes may not start the indexer's worker pool.
+        self.process = ctx.Process(target=_indexer_main, args=(child_conn,), name="photoshare-indexer")
+        self.process.start()
+        child_conn.close()
+        log.info(f"Started indexer process {self.process.pid}.")
+
+    def _supervise(self):
+        delay = RESTART_DELAY
+        try:
+            while not self._stopping.is_set():
+                self._relay()
+                if self._stopping.is_set():
+                    break
+                self.process.join()
+                exitcode = self.process.exitcode
+                if exitcode == 0:
+                    log.info("Indexer process finished.")
+                    break
+                if self.restarts >= MAX_RESTARTS:
+                    log.error(f"Indexer process exited with code {exitcode}; giving up after {self.restarts} restarts.")
+                    break
+                log.warning(f"Indexer process exited with code {exitcode}; restarting in {delay}s.")
+                if self._stopping.wait(delay):
+                    break
+                delay = min(delay * 2, MAX_RESTART_DELAY)
+                self.restarts += 1
+                self._spawn()
+        finally:
+            if not self._stopping.is_set():
+                self.lock.release()
+
+    def _relay(self):
+        """Passes messages until the child closes its end of the pipe."""
+        while not self._stopping.is_set():
+            try:
+                if self._conn.poll(LATENCY_INTERVAL):
+                    kind, value = self._conn.recv()
+                    if kind == 'progress':
+                        self.progress = value
+                self._conn.send(('latency', throttle.latency.average_ms))
+            except (EOFError, OSError):
+                return
+
+    def status(self):
+        return {
+            'pid': self.process.pid if self.process else None,
+            'alive': bool(self.process and self.process.is_alive()),
+            'restarts': self.restarts,
+            'progress': self.progress,
+        }
+
+    def stop(self):
+        """Terminates the child (it exits through its cleanup handlers) and releases the lock."""
+        self._stopping.set()
+        if self.process and self.process.is_alive():
+            self.process.terminate()
+            self.process.join(STOP_TIMEOUT)
+            if self.process.is_alive():
+                log.warning("Indexer process did not stop; killing it.")
+                self.process.kill()
+                self.process.join()
+        if self._thread:
+            self._thread.join()
+        if self._conn:
+            self._conn.close()
+        self.lock.release()
@@ -0,0 +1,118 @@
+import bisect
+import heapq
+import threading
+
+# In-memory tag index kept sorted by name, by case-folded name and by count, so
+# the tag cloud, the tags page and tag search never re-read the photos table.
+# load() replaces the contents from a fresh count; adjust() applies a single
+# tag write incrementally with O(log n) searches.
+
+# Suggestions for short prefixes match many tags, so results are memoized until the
+# index next changes.
+SUGGEST_CACHE_SIZE = 1024
+
+class TagIndex:
+    """Sorted views over a tag -> photo count mapping."""
+
+    def __init__(self, tag_counts: dict = None):
+        self._lock = threading.Lock()
+        self.load(tag_counts or {})
+
+    def load(self, tag_counts: dict):
+        counts = {tag: count for tag, count in tag_counts.items() if count > 0}
+        names = sorted(counts)
+        folded = sorted((tag.lower(), tag) for tag in counts)
+        ranked = sorted((-count, tag) for tag, count in counts.items())
+        with self._lock:
+            self._counts, self._names, self._folded, self._ranked = counts, names, folded, ranked
+            self._suggest_cache = {}
+
+    def __len__(self):
+        return len(self._counts)
+
+    def count(self, tag: str) -> int:
+        return self._counts.get(tag, 0)
+
+    def adjust(self, tag: str, delta: int):
+        """Adds delta photos to tag, inserting or dropping it from the sorted views as needed."""
+        tag = tag.strip()
+        if not tag or not delta:
+            return
+        with self._lock:
+            self._suggest_cache = {}
+            old = self._counts.get(tag, 0)
+            new = max(0, old + delta)
+            if old:
+                _remove(self._ranked, (-old, tag))
+            if new:
+                bisect.insort(self._ranked, (-new, tag))
+                self._counts[tag] = new
+                if not old:
+                    bisect.insort(self._names, tag)
+                    bisect.insort(self._folded, (tag.lower(), tag))
+            elif old:
+                del self._counts[tag]
+                _remove(self._names, tag)
+                _remove(self._folded, (tag.lower(), tag))
+
+    def apply_change(self, old_tags: str, new_tags: str):
+        """Applies a photo's tags column changing from old_tags to new_tags (either may be None)."""
+        for tag in (old_tags or '').split(','):
+            self.adjust(tag, -1)
+        for tag in (new_tags or '').split(','):
+            self.adjust(tag, 1)
+
+    def top(self, k: int):
+        """Returns the k most used tags as (tag, count), most used first."""
+        with self._lock:
+            return [(tag, -negative) for negative, tag in self._ranked[:k]]
+
+    def prefix(self, prefix: str):
+        """Returns the tags starting with prefix, case-insensitively, in name order."""
+        folded_prefix = prefix.lower()
+        with self._lock:
+            folded_list = self._folded
+            i = bisect.bisect_left(folded_list, (folded_prefix,))
+            matches = []
+            while i < len(folded_list) and folded_list[i][0].startswith(folded_prefix):
+                matches.append(folded_list[i][1])
+                i += 1
+            return matches
+
+    def suggest(self, prefix: str, limit: int):
+        """Returns up to limit (tag, count) pairs starting with prefix, most used first."""
+        if not prefix:
+            return self.top(limit)
+        key = (prefix.lower(), limit)
+        cache = self._suggest_cache
+        if key in cache:
+            return cache[key]
+        matches = self.prefix(prefix)
+        counts = self._counts
+        best = heapq.nsmallest(limit, matches, key=lambda tag: (-counts.get(tag, 0), tag))
+        result = [(tag, counts.get(tag, 0)) for tag in best]
+        if len(cache) >= SUGGEST_CACHE_SIZE:
+            cache.clear()
+        cache[key] = result
+        return result
+
+    def listing(self, sort_by: str = 'tag', order: str = 'asc', search: str = ''):
+        """Returns [{"tag", "count"}] sorted by 'tag' or 'count', filtered by case-insensitive substring search."""
+        search = search.lower()
+        with self._lock:
+            if sort_by == 'count':
+                # The ranked view is most used first
+                tags = [tag for _, tag in reversed(self._ranked)]
+            else:
+                tags = list(self._names)
+            counts = self._counts
+            if search:
+                tags = [tag for tag in tags if search in tag.lower()]
+            if sort_by in ('tag', 'count') and order == 'desc':
+                tags.reverse()
+            return [{"tag": tag, "count": counts[tag]} for tag in tags]
+
+def _remove(sorted_list: list, item):
+    i = bisect.bisect_left(sorted_list, item)
+    if i < len(sorted_list) and sorted_list[i] == item:
+        del sorted_list[i]
@@ -0,0 +1,414 @@
+import re
+import math
+import time
+import random
+import logging
+import sqlite3
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from . import database
+
+# Boolean tag queries such as `family AND beach NOT 2019` or `(cat OR dog) -outdoor`,
+# resolved against per-tag compressed bitmaps over photo ids (see Bitmap). Terms match tags
+# case-insensitively; operators are the uppercase words AND, OR and NOT (or a leading
+# '-'), adjacent terms are ANDed, and tags containing spaces or operators are quoted.
+
+# Tag writes made elsewhere (the indexer, other workers, scripts) are picked up by
+# reloading in the background once the bitmaps are this old.
+REFRESH_INTERVAL = 60
+
+class TagQueryError(ValueError):
+    """Raised for a malformed tag query."""
+
+_TOKEN = re.compile(r'\s*(?:(\()|(\))|"([^"]*)"|(-)|([^\s()"]+))')
+
+def _tokenize(query: str):
+    tokens = []
+    pos = 0
+    query = query.rstrip()
+    while pos < len(query):
+        match = _TOKEN.match(query, pos)
+        if not match:
+            raise TagQueryError(f"Unexpected character at position {pos}")
+        pos = match.end()
+        lparen, rparen, quoted, minus, word = match.groups()
+        if lparen:
+            tokens.append(('(', None))
+        elif rparen:
+            tokens.append((')', None))
+        elif quoted is not None:
+            tokens.append(('TERM', quoted.strip()))
+        elif minus:
+            tokens.append(('NOT', None))
+        elif word in ('AND', 'OR', 'NOT'):
+            tokens.append((word, None))
+        else:
+            tokens.append(('TERM', word))
+    return tokens
+
+def parse(query: str):
+    """
+    Parses a query into nested tuples: ('tag', name), ('not', x), ('and', x, y), ('or', x, y).
+    Grammar: or := and (OR and)* ; and := unary ([AND] unary)* ; unary := NOT unary | TERM | ( or )
+    """
+    tokens = _tokenize(query)
+    if not tokens:
+        raise TagQueryError("Empty query")
+    pos = 0
+
+    def peek():
+        return tokens[pos][0] if pos < len(tokens) else None
+
+    def take(kind):
+        nonlocal pos
+        if peek() != kind:
+            raise TagQueryError(f"Expected {kind} but found {peek() or 'end of query'}")
+        pos += 1
+        return tokens[pos - 1][1]
+
+    def parse_or():
+        node = parse_and()
+        while peek() == 'OR':
+            take('OR')
+            node = ('or', node, parse_and())
+        return node
+
+    def parse_and():
+        node = parse_unary()
+        while peek() in ('AND', 'NOT', 'TERM', '('):
+            if peek() == 'AND':
+                take('AND')
+            node = ('and', node, parse_unary())
+        return node
+
+    def parse_unary():
+        kind = peek()
+        if kind == 'NOT':
+            take('NOT')
+            return ('not', parse_unary())
+        if kind == '(':
+            take('(')
+            node = parse_or()
+            take(')')
+            return node
+        return ('tag', take('TERM').lower())
+
+    node = parse_or()
+    if pos != len(tokens):
+        raise TagQueryError(f"Unexpected {peek()} in query")
+    return node
+
+def is_query(text: str) -> bool:
+    """True if text uses query syntax rather than naming a single tag."""
+    try:
+        return any(kind != 'TERM' for kind, _ in _tokenize(text))
+    except TagQueryError:
+        return False
+
+# Photo ids are grouped into chunks of 2^CHUNK_BITS by their high bits, roaring-style. A
+# chunk of up to ARRAY_LIMIT ids keeps their low bits in a sorted array('H'), 2 bytes an
+# id; a denser chunk is an 8 KB int bitset, where AND/OR/NOT run as word-parallel C
+# loops. A bitmap's size follows the number of ids in it, not the highest photo id.
+CHUNK_BITS = 16
+ARRAY_LIMIT = 4096
+_CHUNK_SIZE = 1 << CHUNK_BITS
+_CHUNK_BYTES = _CHUNK_SIZE // 8
+_LOW_MASK = _CHUNK_SIZE - 1
+
+# Bit positions set in each byte value, for decoding bitsets
+_BYTE_BITS = [tuple(bit for bit in range(8) if value >> bit & 1) for value in range(256)]
+
+def _bitset(lows) -> int:
+    bits = bytearray(_CHUNK_BYTES)
+    for low in lows:
+        bits[low >> 3] |= 1 << (low & 7)
+    return int.from_bytes(bits, 'little')
+
+def _lows(container):
+    """The sorted low bits in a container."""
+    if not isinstance(container, int):
+        return container
+    lows = array('H')
+    for i, value in enumerate(container.to_bytes(_CHUNK_BYTES, 'little')):
+        if value:
+            base = i * 8
+            lows.extend(base + bit for bit in _BYTE_BITS[value])
+    return lows
+
+def _size(container) -> int:
+    return container.bit_count() if isinstance(container, int) else len(container)
+
+def _compact(container):
+    """container in its smaller representation, or None when it is empty."""
+    if isinstance(container, int):
+        count = container.bit_count()
+        if count > ARRAY_LIMIT:
+            return container
+        return _lows(container) if count else None
+    if len(container) > ARRAY_LIMIT:
+        return _bitset(container)
+    return container if len(container) else None
+
+def _filter(lows, bitset: int, keep: bool):
+    bits = bitset.to_bytes(_CHUNK_BYTES, 'little')
+    return array('H', [low for low in lows if bool(bits[low >> 3] >> (low & 7) & 1) == keep])
+
+def _and(a, b):
+    if isinstance(a, int) and isinstance(b, int):
+        return a & b
+    if isinstance(a, int):
+        a, b = b, a
+    if isinstance(b, int):
+        return _filter(a, b, True)
+    return array('H', sorted(set(a).intersection(b)))
+
+def _or(a, b):
+    if isinstance(a, int) or isinstance(b, int):
+        return (a if isinstance(a, int) else _bitset(a)) | (b if isinstance(b, int) else _bitset(b))
+    return array('H', sorted(set(a).union(b)))
+
+def _and_not(a, b):
+    if isinstance(a, int):
+        return a & ~(b if isinstance(b, int) else _bitset(b))
+    if isinstance(b, int):
+        return _filter(a, b, False)
+    return array('H', sorted(set(a).difference(b)))
+
+class Bitmap:
+    """
+    An immutable compressed set of photo ids. Besides &, | and -, it answers rank (how
+    many members are smaller than an id) and select (the member of a given rank) in
+    logarithmic time, which is all the ordered navigation the sequences need.
+    """
+    __slots__ = ('_chunks', '_keys', '_starts', '_len')
+
+    def __init__(self, chunks=None):
+        self._chunks = chunks or {}
+        self._keys = sorted(self._chunks)
+        # Members in the chunks before each chunk, for rank and select
+        self._starts = []
+        total = 0
+        for key in self._keys:
+            self._starts.append(total)
+            total += _size(self._chunks[key])
+        self._len = total
+
+    @classmethod
+    def from_ids(cls, ids):
+        lows_by_key = {}
+        for photo_id in ids:
+            lows_by_key.setdefault(photo_id >> CHUNK_BITS, set()).add(photo_id & _LOW_MASK)
+        return cls({key: _compact(array('H', sorted(lows))) for key, lows in lows_by_key.items()})
+
+    def __and__(self, other):
+        chunks = {}
+        for key in self._chunks.keys() & other._chunks.keys():
+            container = _compact(_and(self._chunks[key], other._chunks[key]))
+            if container is not None:
+                chunks[key] = container
+        return Bitmap(chunks)
+
+    def __or__(self, other):
+        chunks = dict(self._chunks)
+        for key, container in other._chunks.items():
+            chunks[key] = _compact(_or(chunks[key], container)) if key in chunks else container
+        return Bitmap(chunks)
+
+    def __sub__(self, other):
+        chunks = {}
+        for key, container in self._chunks.items():
+            if key in other._chunks:
+                container = _compact(_and_not(container, other._chunks[key]))
+            if container is not None:
+                chunks[key] = container
+        return Bitmap(chunks)
+
+    def __len__(self):
+        return self._len
+
+    def __iter__(self):
+        """The members in ascending order."""
+        for key in self._keys:
+            base = key << CHUNK_BITS
+            for low in _lows(self._chunks[key]):
+                yield base | low
+
+    def __contains__(self, photo_id: int):
+        container = self._chunks.get(photo_id >> CHUNK_BITS)
+        if container is None:
+            return False
+        low = photo_id & _LOW_MASK
+        if isinstance(container, int):
+            return bool(container >> low & 1)
+        i = bisect_left(container, low)
+        return i < len(container) and container[i] == low
+
+    def rank(self, photo_id: int) -> int:
+        """Number of members smaller than photo_id."""
+        key, low = photo_id >> CHUNK_BITS, photo_id & _LOW_MASK
+        i = bisect_left(self._keys, key)
+        if i == len(self._keys):
+            return self._len
+        count = self._starts[i]
+        if self._keys[i] == key:
+            container = self._chunks[key]
+            count += (container & ((1 << low) - 1)).bit_count() if isinstance(container, int) else bisect_left(container, low)
+        return count
+
+    def select(self, n: int) -> int:
+        """The member of rank n (0-based)."""
+        if not 0 <= n < self._len:
+            raise IndexError(n)
+        i = bisect_right(self._starts, n) - 1
+        key, n = self._keys[i], n - self._starts[i]
+        container = self._chunks[key]
+        if isinstance(container, int):
+            # Binary search over prefix popcounts
+            lo, hi = 0, container.bit_length()
+            while lo < hi:
+                mid = (lo + hi) // 2
+                if (container & ((1 << mid) - 1)).bit_count() > n:
+                    hi = mid
+                else:
+                    lo = mid + 1
+            low = lo - 1
+        else:
+            low = container[n]
+        return key << CHUNK_BITS | low
+
+    def first(self):
+        return self.select(0) if self._len else None
+
+    def last(self):
+        return self.select(self._len - 1) if self._len else None
+
+    def next_after(self, photo_id: int):
+        """Smallest member greater than photo_id, or None."""
+        rank = self.rank(photo_id + 1)
+        return self.select(rank) if rank < self._len else None
+
+    def previous_before(self, photo_id: int):
+        """Largest member smaller than photo_id, or None."""
+        rank = self.rank(photo_id)
+        return self.select(rank - 1) if rank else None
+
+    def random(self):
+        return self.select(random.randrange(self._len)) if self._len else None
+
+    def with_id(self, photo_id: int):
+        return self | Bitmap.from_ids([photo_id])
+
+    def without_id(self, photo_id: int):
+        return self - Bitmap.from_ids([photo_id])
+
+EMPTY = Bitmap()
+
+class ShuffleOrder:
+    """
+    A seeded permutation of the ranks 0..size-1, position = (a * rank + b) mod size with
+    a coprime to size, so stepping through a shuffled match set is O(1) per photo.
+    """
+
+    def __init__(self, size: int, seed: int):
+        self.size = size
+        a = (seed * 2654435761) % size or 1
+        while math.gcd(a, size) != 1:
+            a += 1
+        self._a, self._b = a, seed % size
+        self._a_inverse = pow(a, -1, size)
+
+    def position(self, rank: int) -> int:
+        return (self._a * rank + self._b) % self.size
+
+    def rank(self, position: int) -> int:
+        return (position % self.size - self._b) * self._a_inverse % self.size
+
+
+class TagBitmaps:
+    """
+    Per-tag bitmaps of the photos that are not marked deleted, plus the bitmap of all
+    such photos (the universe NOT is taken against). Loaded lazily, refreshed in the
+    background and adjusted in place by this process's own tag writes.
+    """
+
+    def __init__(self):
+        self._tags = {}
+        self._all = EMPTY
+        self._loaded_at = None
+        self._lock = threading.Lock()
+        self._refreshing = False
+
+    def load(self):
+        conn = database.get_db_connection()
+        try:
+            rows = conn.execute("SELECT id, tags FROM photos WHERE datetime_deleted IS NULL OR datetime_deleted = ''").fetchall()
+        except sqlite3.Error as e:
+            logging.error(f"Database error when loading tag bitmaps: {e}")
+            return
+        finally:
+            conn.close()
+
+        ids_by_tag = {}
+        for row in rows:
+            for tag in _split(row['tags']):
+                ids_by_tag.setdefault(tag, []).append(row['id'])
+        tags = {tag: Bitmap.from_ids(ids) for tag, ids in ids_by_tag.items()}
+        universe = Bitmap.from_ids(row['id'] for row in rows)
+        with self._lock:
+            self._tags, self._all, self._loaded_at = tags, universe, time.monotonic()
+        logging.info(f"Loaded tag bitmaps for {len(tags)} tags over {len(rows)} photos.")
+
+    def _ensure_fresh(self):
+        if self._loaded_at is None:
+            self.load()
+        elif time.monotonic() - self._loaded_at > REFRESH_INTERVAL and not self._refreshing:
+            self._refreshing = True
+            threading.Thread(target=self._refresh, name="tag-bitmaps-refresh", daemon=True).start()
+
+    def _refresh(self):
+        try:
+            self.load()
+        finally:
+            self._refreshing = False
+
+    def evaluate(self, query: str) -> Bitmap:
+        """Returns the bitmap of photos matching query. Raises TagQueryError if it is malformed."""
+        node = parse(query)
+        self._ensure_fresh()
+        with self._lock:
+            return self._evaluate(node)
+
+    def _evaluate(self, node):
+        kind = node[0]
+        if kind == 'tag':
+            return self._tags.get(node[1], EMPTY)
+        if kind == 'not':
+            return self._all - self._evaluate(node[1])
+        left, right = self._evaluate(node[1]), self._evaluate(node[2])
+        return left & right if kind == 'and' else left | right
+
+    def apply_change(self, photo_id: int, old_tags: str, new_tags: str):
+        """Moves photo_id from the bitmaps of old_tags to those of new_tags."""
+        if self._loaded_at is None:
+            return
+        with self._lock:
+            for tag in _split(old_tags):
+                if tag in self._tags:
+                    self._tags[tag] = self._tags[tag].without_id(photo_id)
+            for tag in _split(new_tags):
+                self._tags[tag] = self._tags.get(tag, EMPTY).with_id(photo_id)
+            self._all = self._all.with_id(photo_id)
+
+    def remove_photo(self, photo_id: int, tags: str):
+        if self._loaded_at is None:
+            return
+        self.apply_change(photo_id, tags, None)
+        with self._lock:
+            self._all = self._all.without_id(photo_id)
+
+def _split(tags: str):
+    return {tag.strip().lower() for tag in (tags or '').split(',') if tag.strip()}
+
+# Shared by the endpoints of this process
+bitmaps = TagBitmaps()
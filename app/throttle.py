@@ -0,0 +1,154 @@
+import os
+import time
+import shutil
+import logging
+import threading
+import subprocess
+
+log = logging.getLogger(__name__)
+
+# Delay per file when the latency feedback loop slows an indexer that has no
+# explicit budget: at the lowest factor each hashing thread handles ~2 files/sec.
+BASE_FILE_DELAY = 0.01
+MIN_FACTOR = 0.02
+FEEDBACK_INTERVAL = 1.0
+# Without new requests the latency average halves every IDLE_HALF_LIFE seconds, so one
+# slow request does not hold the indexer back once the server goes quiet.
+IDLE_HALF_LIFE = 5.0
+
+class LatencyMonitor:
+    """Exponentially weighted moving average of web request latency, decaying while idle."""
+
+    def __init__(self, alpha: float = 0.2):
+        self.alpha = alpha
+        self.average_ms = 0.0
+        self.samples = 0
+        self._last_sample = None
+        self._lock = threading.Lock()
+
+    def _decayed(self, now: float) -> float:
+        if self._last_sample is None:
+            return self.average_ms
+        return self.average_ms * 0.5 ** ((now - self._last_sample) / IDLE_HALF_LIFE)
+
+    def record(self, seconds: float):
+        with self._lock:
+            now = time.monotonic()
+            ms = seconds * 1000
+            if self.samples == 0:
+                self.average_ms = ms
+            else:
+                average = self._decayed(now)
+                self.average_ms = average + self.alpha * (ms - average)
+            self._last_sample = now
+            self.samples += 1
+
+    def current_ms(self) -> float:
+        """The average as of now, decayed for the time since the last request."""
+        with self._lock:
+            return self._decayed(time.monotonic())
+
+# Fed by the web server's request middleware, read by the embedded indexer.
+latency = LatencyMonitor()
+
+class _TokenBucket:
+    def __init__(self, rate: float):
+        self.rate = rate
+        self.tokens = rate
+        self.last = time.monotonic()
+
+    def delay_for(self, amount: float, factor: float):
+        """Takes amount tokens and returns how long the caller must sleep to stay within rate * factor."""
+        rate = self.rate * factor
+        now = time.monotonic()
+        self.tokens = min(rate, self.tokens + (now - self.last) * rate)
+        self.last = now
+        self.tokens -= amount
+        return -self.tokens / rate if self.tokens < 0 else 0.0
+
+class Throttle:
+    """
+    Limits indexer I/O to a MB/s and files/s budget and slows further while web
+    request latency is above target. Budgets of None mean unlimited.
+    """
+
+    def __init__(self, mb_per_sec: float = None, files_per_sec: float = None,
+                 latency_target_ms: float = None, nice: int = 10, monitor: LatencyMonitor = None):
+        self.bytes_bucket = _TokenBucket(mb_per_sec * 1024 * 1024) if mb_per_sec else None
+        self.files_bucket = _TokenBucket(files_per_sec) if files_per_sec else None
+        self.latency_target_ms = latency_target_ms
+        self.nice = nice
+        self.monitor = monitor or latency
+        self.factor = 1.0
+        self._lock = threading.Lock()
+        self._last_feedback = time.monotonic()
+
+    @classmethod
+    def from_env(cls):
+        """Builds the throttle used for background indexing from PHOTOSHARE_INDEX_* settings."""
+        def _float(name, default=None):
+            value = os.environ.get(name)
+            try:
+                return float(value) if value else default
+            except ValueError:
+                log.warning(f"Ignoring invalid {name}={value!r}")
+                return default
+
+        return cls(
+            mb_per_sec=_float("PHOTOSHARE_INDEX_THROTTLE_MBPS"),
+            files_per_sec=_float("PHOTOSHARE_INDEX_THROTTLE_FILES"),
+            latency_target_ms=_float("PHOTOSHARE_INDEX_LATENCY_TARGET_MS", 250.0),
+            nice=int(_float("PHOTOSHARE_INDEX_NICE", 10)),
+        )
+
+    def _update_factor(self):
+        """Halves the budget while request latency is above target and recovers gradually below it."""
+        now = time.monotonic()
+        if not self.latency_target_ms or now - self._last_feedback < FEEDBACK_INTERVAL:
+            return
+        self._last_feedback = now
+        current = self.monitor.current_ms()
+        if current > self.latency_target_ms:
+            factor = max(MIN_FACTOR, self.factor * 0.5)
+        elif current < self.latency_target_ms * 0.5:
+            factor = min(1.0, self.factor * 1.25)
+        else:
+            return
+        if factor != self.factor:
+            log.info(f"Indexer throttle factor {self.factor:.2f} -> {factor:.2f} (request latency {current:.0f}ms)")
+            self.factor = factor
+
+    def acquire(self, num_bytes: int = 0, files: int = 1):
+        """Blocks the calling worker until reading num_bytes and files fits the budget."""
+        with self._lock:
+            self._update_factor()
+            delay = 0.0
+            if self.bytes_bucket and num_bytes:
+                delay = max(delay, self.bytes_bucket.delay_for(num_bytes, self.factor))
+            if self.files_bucket and files:
+                delay = max(delay, self.files_bucket.delay_for(files, self.factor))
+            if not self.bytes_bucket and not self.files_bucket and self.factor < 1.0:
+                delay = BASE_FILE_DELAY * (1 / self.factor - 1)
+        if delay > 0:
+            time.sleep(delay)
+
+def lower_priority(nice: int):
+    """
+    Lowers the CPU and I/O priority of the calling thread (Linux) or process. Used as
+    the initializer for indexer worker threads and processes so they yield to the web server.
+    """
+    if not nice:
+        return
+    tid = threading.get_native_id()
+    try:
+        # On Linux setpriority with a thread id only affects that thread.
+        os.setpriority(os.PRIO_PROCESS, tid, min(19, os.getpriority(os.PRIO_PROCESS, tid) + nice))
+    except (AttributeError, OSError) as e:
+        log.debug(f"Could not lower CPU priority: {e}")
+    ionice = shutil.which("ionice")
+    if ionice:
+        try:
+            # Idle I/O class: only gets disk time when nobody else needs it.
+            subprocess.run([ionice, "-c", "3", "-p", str(tid)], check=False, capture_output=True)
+        except OSError as e:
+            log.debug(f"Could not lower I/O priority: {e}")
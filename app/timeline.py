@@ -0,0 +1,91 @@
+import sqlite3
+from datetime import date
+from . import database
+
+# Timeline histogram and date sequences over the generated taken_year and
+# taken_month_day columns (see database.TAKEN_DATE_COLUMNS). Each sequence steps through
+# its photos in datetime_taken order with an index range scan on (column, datetime_taken).
+
+def histogram(year: int = None):
+    """Photos per year, or per month of year, from the timeline counters."""
+    conn = database.get_db_connection()
+    try:
+        if year is None:
+            rows = conn.execute("SELECT year, SUM(count) AS count FROM timeline_counters GROUP BY year HAVING SUM(count) > 0 ORDER BY year").fetchall()
+            return [{"year": row['year'], "count": row['count']} for row in rows]
+        rows = conn.execute("SELECT month, count FROM timeline_counters WHERE year = ? AND count > 0 ORDER BY month", (year,)).fetchall()
+        return [{"year": year, "month": row['month'], "count": row['count']} for row in rows]
+    finally:
+        conn.close()
+
+def parse_sequence(sequence_name: str, day: str = None):
+    """
+    Returns the (column, value) selecting the photos of 'on-this-day' or 'year:YYYY', or
+    None for other sequence names. day ('MM-DD') overrides today's date for on-this-day.
+    Raises ValueError for a malformed year or day.
+    """
+    if sequence_name == 'on-this-day':
+        if day:
+            month, day_of_month = (int(part) for part in day.split('-'))
+            date(2000, month, day_of_month)  # validates, 2000 being a leap year
+        else:
+            today = date.today()
+            month, day_of_month = today.month, today.day
+        return 'taken_month_day', month * 100 + day_of_month
+    if sequence_name.startswith('year:'):
+        return 'taken_year', int(sequence_name[len('year:'):])
+    return None
+
+def count_photos(column: str, value: int) -> int:
+    conn = database.get_db_connection()
+    try:
+        if column == 'taken_year':
+            return conn.execute("SELECT COALESCE(SUM(count), 0) FROM timeline_counters WHERE year = ?", (value,)).fetchone()[0]
+        return conn.execute(
+            f"SELECT COUNT(*) FROM photos WHERE {column} = ? AND (datetime_deleted IS NULL OR datetime_deleted = '')", (value,)
+        ).fetchone()[0]
+    finally:
+        conn.close()
+
+def sequence_photo_id(conn: sqlite3.Connection, column: str, value: int, current_photo_id: int = None, direction: str = None, shape_filter=None):
+    """
+    Returns the id of the earliest photo with column = value, or of the one after ('next')
+    or before current_photo_id in datetime_taken order, wrapping around at the ends.
+    shape_filter (see app/shape.py) further limits the photos. Returns None if there are none.
+    """
+    photo_ids = sequence_photo_ids(conn, column, value, current_photo_id, direction, shape_filter)
+    return photo_ids[0] if photo_ids else None
+
+def sequence_photo_ids(conn: sqlite3.Connection, column: str, value: int, current_photo_id: int = None, direction: str = None, shape_filter=None, count: int = 1):
+    """
+    Like sequence_photo_id, but returns up to count ids continuing in the same direction,
+    wrapping around at most once and stopping before the sequence repeats.
+    """
+    where = f"{column} = ? AND (datetime_deleted IS NULL OR datetime_deleted = '')"
+    params = (value,)
+    if shape_filter:
+        where += f" AND {shape_filter[0]}"
+        params += tuple(shape_filter[1])
+    ascending = "ORDER BY datetime_taken, id"
+    descending = "ORDER BY datetime_taken DESC, id DESC"
+
+    photo_ids = []
+    if direction and current_photo_id:
+        current = conn.execute("SELECT datetime_taken FROM photos WHERE id = ?", (current_photo_id,)).fetchone()
+        if current is not None:
+            operator, order = ('>', ascending) if direction == 'next' else ('<', descending)
+            rows = conn.execute(
+                f"SELECT id FROM photos WHERE {where} AND (datetime_taken, id) {operator} (?, ?) {order} LIMIT ?",
+                (*params, current['datetime_taken'], current_photo_id, count)
+            )
+            photo_ids = [row['id'] for row in rows]
+        order = ascending if direction == 'next' else descending
+    else:
+        order = ascending
+
+    if len(photo_ids) < count:
+        for row in conn.execute(f"SELECT id FROM photos WHERE {where} {order} LIMIT ?", (*params, count - len(photo_ids))):
+            if row['id'] in photo_ids:
+                break
+            photo_ids.append(row['id'])
+    return photo_ids
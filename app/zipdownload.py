@@ -1,3 +1,4 @@
+import json
 import logging
 import sqlite3
 import uuid
@@ -30,6 +31,25 @@ class ZipDownloader:
         if not photos:
             raise HTTPException(status_code=404, detail="No photos found with this tag.")
 
+        return self._zip_response(photos, decoded_tag)
+
+    def create_zip_for_ids(self, photo_ids: list, name: str):
+        """Zips the photos with the given ids, e.g. the matches of a tag query."""
+        conn = database.get_db_connection()
+        try:
+            photos = conn.execute("SELECT path FROM photos WHERE id IN (SELECT value FROM json_each(?))", (json.dumps(photo_ids),)).fetchall()
+        except sqlite3.Error as e:
+            log.error(f"Database error when fetching photos for {name}: {e}")
+            raise HTTPException(status_code=500, detail="Database error.")
+        finally:
+            conn.close()
+
+        if not photos:
+            raise HTTPException(status_code=404, detail="No photos found for this query.")
+
+        return self._zip_response(photos, name)
+
+    def _zip_response(self, photos, name: str):
         zip_io = BytesIO()
         filenames = set()
 
@@ -45,7 +65,7 @@ class ZipDownloader:
         zip_io.seek(0)
         
         date_str = datetime.now().strftime("%Y-%m-%d")
-        zip_filename = f"photos_{decoded_tag}_{date_str}.zip"
+        zip_filename = f"photos_{name}_{date_str}.zip"
         
         return StreamingResponse(
             iter([zip_io.getvalue()]),
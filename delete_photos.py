@@ -6,6 +6,7 @@ import sqlite3
 from datetime import datetime, timezone
 from pathlib import Path
 import shutil
+from app import database
 
 def get_db_path():
     """Gets the database file path from the environment variable."""
@@ -21,7 +22,8 @@ def get_photo_details(photo_path):
     """Gets tags and EXIF data for a photo."""
     conn = get_db_connection()
     try:
-        photo = conn.execute("SELECT tags, datetime_taken, geolocation FROM photos WHERE path = ?", (photo_path,)).fetchone()
+        condition, params = database.path_condition(conn, photo_path)
+        photo = conn.execute(f"SELECT tags, datetime_taken, geolocation FROM photos WHERE {condition}", params).fetchone()
         return photo
     except sqlite3.Error as e:
         print(f"Database error when fetching photo details: {e}")
@@ -86,7 +88,8 @@ def main():
                 conn = get_db_connection()
                 try:
                     iso_date = datetime.now(timezone.utc).isoformat()
-                    conn.execute("UPDATE photos SET datetime_deleted = ? WHERE path = ?", (iso_date, photo_path))
+                    condition, params = database.path_condition(conn, photo_path)
+                    conn.execute(f"UPDATE photos SET datetime_deleted = ? WHERE {condition}", (iso_date, *params))
                     conn.commit()
                 except sqlite3.Error as e:
                     print(f"Database error when updating datetime_deleted: {e}")
@@ -5,9 +5,10 @@ import os
 import sys
 
 import logging
-import hashlib
 from pathlib import Path
 import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
@@ -15,26 +16,27 @@ load_dotenv()
 
 # Set up imports for the application modules
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), 'app')))
-from app import database # noqa
+from app import database, hashing, hashcache # noqa
 
 # Configure logging to print to console
 logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
 
 def _calculate_md5sum(file_path):
     """Calculates the MD5 checksum of a file."""
-    hash_md5 = hashlib.md5()
-    try:
-        with open(file_path, "rb") as f:
-            for chunk in iter(lambda: f.read(4096), b""):
-                hash_md5.update(chunk)
-        return hash_md5.hexdigest()
-    except IOError as e:
-        logging.error(f"Could not read file for md5sum: {file_path}: {e}")
-        return None
+    return hashing.calculate_md5sum(file_path)
+
+def _link_next(pending, hash_cache, link_photo):
+    """Waits for the oldest pending hash, records it in the cache, and links the photo."""
+    f, key, future, md5sum = pending.popleft()
+    if future is not None:
+        md5sum = future.result()
+        hash_cache.put(key, md5sum=md5sum)
+    link_photo(f, md5sum)
 
 @click.command()
 @click.argument('photos_path', type=click.Path(exists=True, file_okay=False, resolve_path=True))
-def import_photos(photos_path):
+@click.option('--jobs', '-j', type=click.IntRange(min=1), default=1, show_default=True, help='Number of files to hash concurrently.')
+def import_photos(photos_path, jobs):
     """
     Scans a directory for photos, and creates relative symbolic links in 'new'
     or 'existing' subdirectories based on whether the photo's MD5 sum is in the database.
@@ -67,64 +69,98 @@ def import_photos(photos_path):
 
     common_extensions = ['.jpg', '.jpeg', '.png', '.gif', '.bmp', '.tiff']
     
-    logging.info("Starting photo discovery and processing...")
+    logging.info(f"Starting photo discovery and processing with {jobs} hashing job(s)...")
     
     all_files = photos_path.glob('**/*')
+    hash_cache = hashcache.HashCache()
+
+    def link_photo(f, md5sum):
+        """Links one hashed photo into new/ or existing/. Always runs on the main thread, in discovery order."""
+        nonlocal processed_count, new_linked_count, existing_linked_count, collision_warnings, last_log_time
+
+        if not md5sum:
+            logging.warning(f"Could not calculate md5sum for {f}, skipping.")
+            return
+
+        processed_count += 1
+
+        # If md5sum is in our set, it's existing. Otherwise, it's new.
+        if md5sum in known_md5sum_set:
+            target_dir = existing_dir
+        else:
+            target_dir = new_dir
+
+        link_path = target_dir / f.name
+        if link_path.exists():
+            if not link_path.samefile(f):
+                logging.warning(f"Filename collision: link '{link_path.name}' already exists. Skipping.")
+                collision_warnings += 1
+            return
+
+        try:
+            relative_path = os.path.relpath(f, target_dir)
+            os.symlink(relative_path, link_path)
+            
+            if target_dir == new_dir:
+                new_linked_count += 1
+                # Add the new md5 to the set to handle duplicates during this run.
+                known_md5sum_set.add(md5sum)
+            else:
+                existing_linked_count += 1
+                
+        except Exception as e:
+            logging.error(f"Failed to create symlink for {f}: {e}")
+
+        # Progress reporting
+        current_time = time.time()
+        if current_time - last_log_time > 15:
+            elapsed_time = current_time - start_time
+            discovery_rate = discovered_count / elapsed_time if elapsed_time > 0 else 0
+            processing_rate = processed_count / elapsed_time if elapsed_time > 0 else 0
+            logging.info(
+                f"Progress: {processed_count} files processed. "
+                f"New Links: {new_linked_count}, Existing Links: {existing_linked_count}. "
+                f"Discovery: {discovery_rate:.2f} files/s, "
+                f"Processing: {processing_rate:.2f} files/s, "
+                f"Hashing: {hashing.stats.bytes / (1024 * 1024) / elapsed_time if elapsed_time > 0 else 0:.2f} MB/s."
+            )
+            last_log_time = current_time
+
+    # Hashing runs on a thread pool; the futures are consumed in submission order so
+    # linking (and therefore which duplicate wins and which name collides) is the same
+    # as a serial run. The window bounds how far hashing may run ahead of linking.
+    window = jobs * 4
+    pending = deque()
+
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        for f in all_files:
+            if f.is_dir() or f.parent.name in ['new', 'existing']:
+                continue
 
-    for f in all_files:
-        if f.is_dir() or f.parent.name in ['new', 'existing']:
-            continue
+            if f.suffix.lower() not in common_extensions:
+                continue
 
-        if f.suffix.lower() in common_extensions:
             discovered_count += 1
-            
-            md5sum = _calculate_md5sum(f)
-            if not md5sum:
-                logging.warning(f"Could not calculate md5sum for {f}, skipping.")
+
+            try:
+                key = hashcache.cache_key(f.stat())
+            except OSError as e:
+                logging.warning(f"Could not stat {f}, skipping: {e}")
                 continue
-            
-            processed_count += 1
 
-            # If md5sum is in our set, it's existing. Otherwise, it's new.
-            if md5sum in known_md5sum_set:
-                target_dir = existing_dir
+            cached = hash_cache.get(key)
+            if cached and cached['md5sum']:
+                pending.append((f, key, None, cached['md5sum']))
             else:
-                target_dir = new_dir
+                pending.append((f, key, executor.submit(_calculate_md5sum, f), None))
 
-            link_path = target_dir / f.name
-            if link_path.exists():
-                if not link_path.samefile(f):
-                    logging.warning(f"Filename collision: link '{link_path.name}' already exists. Skipping.")
-                    collision_warnings += 1
-                continue
+            while len(pending) > window:
+                _link_next(pending, hash_cache, link_photo)
 
-            try:
-                relative_path = os.path.relpath(f, target_dir)
-                os.symlink(relative_path, link_path)
-                
-                if target_dir == new_dir:
-                    new_linked_count += 1
-                    # Add the new md5 to the set to handle duplicates during this run.
-                    known_md5sum_set.add(md5sum)
-                else:
-                    existing_linked_count += 1
-                    
-            except Exception as e:
-                logging.error(f"Failed to create symlink for {f}: {e}")
-
-            # Progress reporting
-            current_time = time.time()
-            if current_time - last_log_time > 15:
-                elapsed_time = current_time - start_time
-                discovery_rate = discovered_count / elapsed_time if elapsed_time > 0 else 0
-                processing_rate = processed_count / elapsed_time if elapsed_time > 0 else 0
-                logging.info(
-                    f"Progress: {processed_count} files processed. "
-                    f"New Links: {new_linked_count}, Existing Links: {existing_linked_count}. "
-                    f"Discovery: {discovery_rate:.2f} files/s, "
-                    f"Processing: {processing_rate:.2f} files/s."
-                )
-                last_log_time = current_time
+        while pending:
+            _link_next(pending, hash_cache, link_photo)
+
+    hash_cache.close()
 
     # Final summary
     total_time = time.time() - start_time
@@ -135,6 +171,8 @@ def import_photos(photos_path):
     logging.info(f"Total time: {total_time:.2f}s")
     logging.info(f"Files discovered: {discovered_count} ({discovery_rate:.2f} files/s)")
     logging.info(f"Files processed: {processed_count} ({processing_rate:.2f} files/s)")
+    logging.info(f"Hashing throughput: {hashing.stats.summary()}")
+    logging.info(f"Hash cache: {hash_cache.summary()}")
     logging.info(f"New photos linked: {new_linked_count}")
     logging.info(f"Existing photos linked: {existing_linked_count}")
     if collision_warnings > 0:
@@ -13,7 +13,7 @@ load_dotenv()
 
 # Set up imports for the application modules
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), 'app')))
-from app import indexing, database # noqa
+from app import indexing, indexstatus, database, hashing, throttle # noqa
 
 # Configure logging to print to console
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -26,32 +26,72 @@ def cli():
 @cli.command()
 @click.option('--md5sum', '-m', is_flag=True, help='Update md5sum for existing photos.')
 @click.option('--folder', '-f', type=click.Path(exists=True, file_okay=False, resolve_path=True), help='Only index a specific folder.')
-def index(md5sum, folder):
+@click.option('--throttle-mbps', type=float, help='Limit hashing reads to this many MB/s.')
+@click.option('--throttle-files', type=float, help='Limit processing to this many files/s.')
+@click.option('--nice', type=click.IntRange(0, 19), default=0, help='Lower CPU/IO priority of indexing workers by this amount.')
+@click.option('--resume', '-r', is_flag=True, help='Continue an interrupted run over the same folders from its checkpoint.')
+def index(md5sum, folder, throttle_mbps, throttle_files, nice, resume):
     """
     Scans photo directories and builds the database index.
-    Creates a lock file to prevent the web service from starting a duplicate scan.
+    Holds the index lock to prevent the web service from starting a duplicate scan.
     """
-    db_file = os.environ.get("PHOTOSHARE_DATABASE_FILE", "photoshare.db")
-    lock_file = Path(db_file).parent / "index.lock"
-
-    if lock_file.exists():
-        click.echo("Lock file exists. Another indexing process may be running.")
+    lock = indexstatus.IndexLock()
+    if not lock.acquire():
+        click.echo("Another indexing process is running.")
         raise click.Abort()
+    click.echo(f"Acquired index lock at {lock.path}")
 
-    try:
-        # Create lock file
-        lock_file.touch()
-        click.echo(f"Created lock file at {lock_file}")
-
+    with lock:
         # Initialize DB and run indexing
         database.init_db()
-        indexing.run_indexing(update_md5sum=md5sum, folder=folder)
+        throttler = None
+        if throttle_mbps or throttle_files or nice:
+            throttler = throttle.Throttle(mb_per_sec=throttle_mbps, files_per_sec=throttle_files, nice=nice)
+        indexing.run_indexing(update_md5sum=md5sum, folder=folder, throttler=throttler, resume=resume)
+
+@cli.command('normalize-paths')
+def normalize_paths():
+    """
+    Stores each folder path once instead of in every photo row.
+    One-way migration; the photos view keeps existing queries and scripts working.
+    """
+    lock = indexstatus.IndexLock()
+    if not lock.acquire():
+        click.echo("Another indexing process is running.")
+        raise click.Abort()
+    with lock:
+        database.init_db()
+        if not database.normalize_paths():
+            raise click.ClickException("Migration failed, see the log for details.")
+    click.echo("Photo paths are normalized.")
 
-    finally:
-        # Ensure lock file is removed
-        if lock_file.exists():
-            lock_file.unlink()
-            click.echo(f"Removed lock file at {lock_file}")
+@cli.command('move-folder')
+@click.argument('old_path')
+@click.argument('new_path')
+def move_folder(old_path, new_path):
+    """
+    Repoints photos under OLD_PATH to NEW_PATH after a folder was moved or renamed,
+    so the next index run finds them without rehashing.
+    """
+    moved = database.move_directory(os.path.abspath(old_path), os.path.abspath(new_path))
+    if moved is None:
+        raise click.ClickException("Move failed, see the log for details.")
+    click.echo(f"Updated {moved} rows.")
+
+@cli.command()
+@click.argument('folder', type=click.Path(exists=True, file_okay=False, resolve_path=True))
+@click.option('--algorithm', '-a', type=click.Choice(hashing.SUPPORTED_ALGORITHMS), default='md5', show_default=True, help='Digest to benchmark.')
+@click.option('--buffer-kb', '-b', type=int, default=hashing.DEFAULT_BUFFER_SIZE // 1024, show_default=True, help='Read buffer size in KB.')
+def hashbench(folder, algorithm, buffer_kb):
+    """
+    Hashes every photo in FOLDER and reports throughput in MB/s.
+    Use it to tune PHOTOSHARE_HASH_BUFFER_KB for your storage.
+    """
+    hashing.stats.reset()
+    for f in Path(folder).glob('**/*'):
+        if f.is_file() and f.suffix.lower() in ['.jpg', '.jpeg', '.png']:
+            hashing.calculate_hash(f, algorithm=algorithm, buffer_size=buffer_kb * 1024)
+    click.echo(f"{algorithm} with {buffer_kb} KB buffer: {hashing.stats.summary()}")
 
 if __name__ == '__main__':
     cli()
@@ -10,6 +10,11 @@ import sqlite3
 def reset_cache():
     """Fixture to reset the cache before each test."""
     caching._tag_counts_cache = {}
+    caching._role = caching.STANDALONE
+    caching._reader = None
+    caching._tag_index = caching.tagindex.TagIndex()
+    caching._tag_index_version = None
+    caching._fallback_loaded = False
     yield
 
 @patch('app.database.get_db_connection')
@@ -106,3 +111,38 @@ def test_background_refresh_task(mock_update_cache, mock_timer):
     mock_update_cache.assert_called_once()
     mock_timer.assert_called_with(300, caching._background_refresh_task)
     mock_timer_instance.start.assert_called_once()
+
+def test_follower_reads_snapshot_written_by_leader(tmp_path, monkeypatch):
+    """Test that a follower worker serves the leader's counts instead of recomputing them."""
+    monkeypatch.setenv("PHOTOSHARE_DATABASE_FILE", str(tmp_path / "test.db"))
+    monkeypatch.setattr(caching, "_calculate_tag_counts", lambda: {'cat': 3, 'dog': 1})
+    monkeypatch.setattr(caching, "_calculate_totals", lambda: {'photos': 10, 'tagged': 4})
+
+    with patch('threading.Timer'):
+        caching.start_background_refresh(caching.LEADER)
+    assert caching._tag_counts_cache == {}, "The leader serves from the snapshot too"
+
+    monkeypatch.setattr(caching, "_calculate_tag_counts", MagicMock(side_effect=AssertionError("follower recomputed")))
+    with patch('threading.Timer') as mock_timer:
+        caching.start_background_refresh(caching.FOLLOWER)
+    mock_timer.assert_not_called()
+    assert caching.get_tag_counts() == {'cat': 3, 'dog': 1}
+    assert caching.get_totals() == {'photos': 10, 'tagged': 4}
+
+def test_follower_calculates_locally_before_first_snapshot(tmp_path, monkeypatch):
+    """Test that a follower started before the leader's first snapshot computes the aggregates once itself."""
+    monkeypatch.setenv("PHOTOSHARE_DATABASE_FILE", str(tmp_path / "test.db"))
+    calculate = MagicMock(return_value={'cat': 2})
+    monkeypatch.setattr(caching, "_calculate_tag_counts", calculate)
+    monkeypatch.setattr(caching, "_calculate_totals", lambda: {'photos': 5})
+
+    with patch('threading.Timer'):
+        caching.start_background_refresh(caching.FOLLOWER)
+    assert caching.get_tag_counts() == {'cat': 2}
+    assert caching.get_totals() == {'photos': 5}
+    assert caching.get_tag_index().top(5) == [('cat', 2)]
+    calculate.assert_called_once()
+
+    caching.snapshot.write_snapshot(caching._reader.path, {'photos': 6}, {'cat': 3})
+    assert caching.get_tag_counts() == {'cat': 3}
+    assert caching.get_totals() == {'photos': 6}
@@ -0,0 +1,55 @@
+import os
+import sys
+
+# Add project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import database
+
+def _tag_counters(conn):
+    return {row['tag']: row['count'] for row in conn.execute("SELECT tag, count FROM tag_counters WHERE count > 0")}
+
+def test_counters_follow_writes(tmp_path, monkeypatch):
+    monkeypatch.setenv("PHOTOSHARE_DATABASE_FILE", str(tmp_path / "test.db"))
+    database.init_db()
+    assert database.get_photo_counters() == {'total': 0, 'tagged': 0, 'untagged': 0, 'new': 0, 'deleted': 0}
+
+    conn = database.get_db_connection()
+    conn.execute("INSERT INTO photos (path, width, height, tags, datetime_added) VALUES ('a.jpg', 1, 1, 'cat, dog', '2024-01-01')")
+    conn.execute("INSERT INTO photos (path, width, height, tags) VALUES ('b.jpg', 1, 1, 'cat')")
+    conn.execute("INSERT INTO photos (path, width, height) VALUES ('c.jpg', 1, 1)")
+    conn.commit()
+    assert database.get_photo_counters() == {'total': 3, 'tagged': 2, 'untagged': 1, 'new': 1, 'deleted': 0}
+    assert _tag_counters(conn) == {'cat': 2, 'dog': 1}
+
+    conn.execute("UPDATE photos SET tags = 'bird' WHERE path = 'c.jpg'")
+    conn.execute("UPDATE photos SET tags = '', datetime_deleted = '2024-02-01' WHERE path = 'b.jpg'")
+    conn.execute("DELETE FROM photos WHERE path = 'a.jpg'")
+    conn.commit()
+    assert database.get_photo_counters() == {'total': 2, 'tagged': 1, 'untagged': 1, 'new': 0, 'deleted': 1}
+    assert _tag_counters(conn) == {'bird': 1}
+    assert database.get_tag_count('bird') == 1
+    assert database.get_tag_count('cat') == 0
+
+    # A rolled back write leaves the counters untouched
+    conn.execute("INSERT INTO photos (path, width, height, tags) VALUES ('d.jpg', 1, 1, 'bird')")
+    conn.rollback()
+    assert database.get_tag_count('bird') == 1
+    conn.close()
+
+def test_counters_are_built_for_existing_photos(tmp_path, monkeypatch):
+    """Tests that migrating a database with photos and awkward tag names counts them all."""
+    db_path = tmp_path / "test.db"
+    monkeypatch.setenv("PHOTOSHARE_DATABASE_FILE", str(db_path))
+    import sqlite3
+    conn = sqlite3.connect(db_path)
+    conn.execute("CREATE TABLE photos (id INTEGER PRIMARY KEY, path TEXT, width INTEGER, height INTEGER, tags TEXT, datetime_added TEXT)")
+    conn.execute("""INSERT INTO photos (path, width, height, tags, datetime_added) VALUES ('a.jpg', 1, 1, 'say "cheese",back\\slash', 'x')""")
+    conn.execute("INSERT INTO photos (path, width, height, tags, datetime_added) VALUES ('b.jpg', 1, 1, NULL, 'x')")
+    conn.commit()
+    conn.close()
+
+    database.init_db()
+    assert database.get_photo_counters() == {'total': 2, 'tagged': 1, 'untagged': 1, 'new': 2, 'deleted': 0}
+    assert database.get_tag_count('say "cheese"') == 1
+    assert database.get_tag_count('back\\slash') == 1
@@ -0,0 +1,67 @@
+import os
+import sys
+import pytest
+
+# Add project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import database, folders
+
+PATHS = [
+    '/p/2015/Italy/rome.jpg',
+    '/p/2015/Italy/Venice/canal.jpg',
+    '/p/2015/Italy/Venice/gondola.jpg',
+    '/p/2015/Italyx/other.jpg',
+    '/p/2015/paris.jpg',
+    '/p/2016/home.jpg',
+]
+
+@pytest.fixture(params=['flat', 'normalized'])
+def db(request, tmp_path, monkeypatch):
+    monkeypatch.setenv("PHOTOSHARE_DATABASE_FILE", str(tmp_path / "test.db"))
+    database.init_db()
+    conn = database.get_db_connection()
+    conn.executemany("INSERT INTO photos (path, width, height) VALUES (?, 1, 1)", [(p,) for p in PATHS])
+    conn.commit()
+    conn.close()
+    if request.param == 'normalized':
+        database.normalize_paths()
+    return request.param
+
+def _id(path):
+    return PATHS.index(path) + 1
+
+def test_list_folders_counts_subtrees(db):
+    listing = folders.list_folders('/p/2015')
+    assert listing['folder'] == '/p/2015/'
+    assert listing['photo_count'] == 1
+    assert listing['total_count'] == 5
+    assert listing['folders'] == [
+        {"name": "Italy", "path": "/p/2015/Italy/", "photo_count": 3},
+        {"name": "Italyx", "path": "/p/2015/Italyx/", "photo_count": 1},
+    ]
+    assert folders.count_photos('/p/') == 6
+
+    conn = database.get_db_connection()
+    conn.execute("UPDATE photos SET datetime_deleted = '2024-01-01' WHERE id = ?", (_id('/p/2015/Italy/rome.jpg'),))
+    conn.execute("UPDATE photos SET path = '/p/2016/canal.jpg' WHERE id = ?", (_id('/p/2015/Italy/Venice/canal.jpg'),))
+    conn.commit()
+    conn.close()
+    assert folders.count_photos('/p/2015/Italy') == 1
+    assert folders.count_photos('/p/2016') == 2
+
+def test_sequence_steps_through_subtree_and_wraps(db):
+    conn = database.get_db_connection()
+    italy = '/p/2015/Italy'
+    if db == 'normalized':
+        # Folder by folder: a folder's own photos come before its subfolders
+        order = [_id('/p/2015/Italy/rome.jpg'), _id('/p/2015/Italy/Venice/canal.jpg'), _id('/p/2015/Italy/Venice/gondola.jpg')]
+    else:
+        order = [_id('/p/2015/Italy/Venice/canal.jpg'), _id('/p/2015/Italy/Venice/gondola.jpg'), _id('/p/2015/Italy/rome.jpg')]
+
+    assert folders.sequence_photo_id(conn, italy) == order[0]
+    assert folders.sequence_photo_id(conn, italy, order[0], 'next') == order[1]
+    assert folders.sequence_photo_id(conn, italy, order[2], 'next') == order[0]
+    assert folders.sequence_photo_id(conn, italy, order[0], 'previous') == order[2]
+    assert folders.sequence_photo_id(conn, '/p/none') is None
+    conn.close()
@@ -0,0 +1,66 @@
+import os
+import sys
+import pytest
+
+# Add project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import database, geo
+
+LOCATIONS = [
+    '45.5231,-122.6765',   # Portland
+    '45.5300,-122.6800',   # ~800 m away
+    '47.6062,-122.3321',   # Seattle
+    '48.8566,2.3522',      # Paris
+    None,
+    'not a place',
+    '95.0,10.0',
+]
+
+@pytest.fixture(params=['flat', 'normalized'])
+def db(request, tmp_path, monkeypatch):
+    monkeypatch.setenv("PHOTOSHARE_DATABASE_FILE", str(tmp_path / "test.db"))
+    database.init_db()
+    conn = database.get_db_connection()
+    conn.executemany("INSERT INTO photos (path, width, height, geolocation) VALUES (?, 1, 1, ?)", [(f"/p/{i}.jpg", g) for i, g in enumerate(LOCATIONS)])
+    conn.commit()
+    conn.close()
+    if request.param == 'normalized':
+        database.normalize_paths()
+    return request.param
+
+def test_near_uses_the_rtree_and_sorts_by_distance(db):
+    conn = database.get_db_connection()
+    coords = [tuple(r) for r in conn.execute("SELECT latitude, longitude FROM photos ORDER BY id")]
+    assert coords[0] == (45.5231, -122.6765)
+    assert coords[4:] == [(None, None)] * 3
+    assert conn.execute("SELECT COUNT(*) FROM photo_locations").fetchone()[0] == 4
+    conn.close()
+
+    matches = geo.near(45.5231, -122.6765, 2000)
+    assert [row['id'] for row, _ in matches] == [1, 2]
+    assert matches[0][1] == 0
+    assert 800 < matches[1][1] < 830
+    assert [row['id'] for row, _ in geo.near(45.5231, -122.6765, 300000)] == [1, 2, 3]
+
+def test_clusters_follow_writes(db):
+    world = geo.parse_bbox('-180,-90,180,90')
+    assert geo.clusters(world, 0) != []
+    assert sum(c['count'] for c in geo.clusters(world, 0)) == 4
+    pacific_northwest = geo.clusters(geo.parse_bbox('-125,44,-120,49'), 5)
+    assert sorted(c['count'] for c in pacific_northwest) == [1, 2]
+
+    conn = database.get_db_connection()
+    conn.execute("UPDATE photos SET geolocation = '48.8600,2.3500' WHERE id = 3")
+    conn.execute("UPDATE photos SET datetime_deleted = '2024-01-01' WHERE id = 2")
+    conn.commit()
+    conn.close()
+    paris = geo.clusters(geo.parse_bbox('2,48,3,49'), 2)
+    assert paris == [{"lat": pytest.approx(48.8583), "lon": pytest.approx(2.3511), "count": 2}]
+    assert geo.near(45.5231, -122.6765, 2000)[0][0]['id'] == 1
+    assert len(geo.near(45.5231, -122.6765, 2000)) == 1
+
+def test_parse_bbox_rejects_bad_input():
+    for bbox in ['1,2,3', 'a,b,c,d', '10,0,5,1', '0,-100,1,1']:
+        with pytest.raises(ValueError):
+            geo.parse_bbox(bbox)
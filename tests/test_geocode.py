@@ -0,0 +1,81 @@
+import os
+import sys
+import pytest
+
+# Add project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import database, geocode
+
+GEONAMES = [
+    ['5746545', 'Portland', 'Portland', '', '45.52345', '-122.67621', 'P', 'PPLA2', 'US', '', 'OR'],
+    ['5809844', 'Seattle', 'Seattle', '', '47.60621', '-122.33207', 'P', 'PPLA2', 'US', '', 'WA'],
+    ['2988507', 'Paris', 'Paris', '', '48.85341', '2.3488', 'P', 'PPLC', 'FR', '', '11'],
+]
+
+@pytest.fixture
+def gazetteer_file(tmp_path, monkeypatch):
+    path = tmp_path / "cities.txt"
+    path.write_text(''.join('\t'.join(fields) + '\n' for fields in GEONAMES) + "Vancouver\t45.6387\t-122.6615\n", encoding='utf-8')
+    monkeypatch.setenv("PHOTOSHARE_GAZETTEER", str(path))
+    monkeypatch.setattr(geocode, '_gazetteer', None)
+    return path
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    monkeypatch.setenv("PHOTOSHARE_DATABASE_FILE", str(tmp_path / "test.db"))
+    database.init_db()
+
+def test_nearest_place_within_range(gazetteer_file):
+    gazetteer = geocode.Gazetteer.load(str(gazetteer_file))
+    assert gazetteer.size == 4
+    assert gazetteer.nearest(45.53, -122.68) == 'Portland, US'
+    assert gazetteer.nearest(45.62, -122.66) == 'Vancouver'
+    assert gazetteer.nearest(48.80, 2.40) == 'Paris, FR'
+    assert gazetteer.nearest(0.0, 0.0) is None
+    assert gazetteer.nearest(46.2, -122.7) is None  # nothing within 50 km
+
+def test_update_places_resolves_each_photo_once(gazetteer_file, db):
+    conn = database.get_db_connection()
+    conn.executemany("INSERT INTO photos (path, width, height, geolocation) VALUES (?, 1, 1, ?)", [
+        ('/p/a.jpg', '45.5231,-122.6765'), ('/p/b.jpg', '45.5232,-122.6766'), ('/p/c.jpg', '10.0,10.0'), ('/p/d.jpg', None)
+    ])
+    conn.commit()
+    conn.close()
+
+    assert geocode.update_places() == 3
+    assert geocode.update_places() == 0
+
+    conn = database.get_db_connection()
+    assert [row['place'] for row in conn.execute("SELECT place FROM photos ORDER BY id")] == ['Portland, US', 'Portland, US', '', None]
+    # a and b round to the same cache key
+    assert conn.execute("SELECT COUNT(*) FROM place_cache").fetchone()[0] == 2
+    conn.close()
+
+def test_moved_location_is_resolved_again(gazetteer_file, db):
+    exif = {'width': 1, 'height': 1, 'geolocation': '45.5231,-122.6765', 'datetime_taken': None}
+    database.add_photo_to_index('/p/a.jpg', 'md5', exif)
+    geocode.update_places()
+
+    database.add_photo_to_index('/p/a.jpg', 'md5', exif)
+    conn = database.get_db_connection()
+    assert conn.execute("SELECT place FROM photos").fetchone()['place'] == 'Portland, US'
+    conn.close()
+
+    database.add_photo_to_index('/p/a.jpg', 'md5', dict(exif, geolocation='47.6062,-122.3321'))
+    conn = database.get_db_connection()
+    assert conn.execute("SELECT place FROM photos").fetchone()['place'] is None
+    conn.close()
+    assert geocode.update_places() == 1
+
+def test_without_gazetteer_nothing_is_resolved(db, monkeypatch):
+    monkeypatch.delenv("PHOTOSHARE_GAZETTEER", raising=False)
+    assert geocode.update_places() == 0
+
+def test_unreadable_gazetteer_skips_place_resolution(db, tmp_path, monkeypatch):
+    path = tmp_path / "cities.txt"
+    path.write_bytes("Zürich\t47.37\t8.54\n".encode('latin-1'))
+    monkeypatch.setenv("PHOTOSHARE_GAZETTEER", str(path))
+    monkeypatch.setattr(geocode, '_gazetteer', None)
+    assert geocode.get_gazetteer() is None
+    assert geocode.update_places() == 0
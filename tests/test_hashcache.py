@@ -0,0 +1,34 @@
+import os
+import sys
+
+# Add project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import database, hashcache
+
+def test_hash_cache_round_trip(tmp_path):
+    """
+    Tests that hashes persist across HashCache instances and that a changed
+    file (new size/mtime) misses the cache.
+    """
+    db_path = str(tmp_path / "test.db")
+    database.init_db(db_path)
+
+    photo = tmp_path / "photo.jpg"
+    photo.write_bytes(b"abc")
+    key = hashcache.cache_key(photo.stat())
+
+    with hashcache.HashCache(db_path) as cache:
+        assert cache.get(key) is None
+        cache.put(key, quick_hash="quick")
+        cache.put(key, md5sum="md5")
+
+    with hashcache.HashCache(db_path) as cache:
+        assert cache.get(key) == {'md5sum': "md5", 'quick_hash': "quick"}
+        # A later quick-hash only update must not erase the md5sum
+        cache.put(key, quick_hash="quick2")
+        cache.flush()
+        assert cache.get(key) == {'md5sum': "md5", 'quick_hash': "quick2"}
+
+        photo.write_bytes(b"abcd")
+        assert cache.get(hashcache.cache_key(photo.stat())) is None
@@ -0,0 +1,68 @@
+import os
+import sys
+import hashlib
+
+# Add project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import hashing
+
+def test_calculate_md5sum_matches_hashlib(tmp_path):
+    """
+    Tests that the buffered engine produces the same md5 as a plain hashlib read,
+    including when the file spans several buffers.
+    """
+    data = os.urandom(300 * 1024 + 17)
+    photo = tmp_path / "photo.jpg"
+    photo.write_bytes(data)
+
+    assert hashing.calculate_hash(photo, algorithm='md5', buffer_size=64 * 1024) == hashlib.md5(data).hexdigest()
+    assert hashing.calculate_md5sum(photo) == hashlib.md5(data).hexdigest()
+
+def test_calculate_hash_blake2b(tmp_path):
+    """Tests that blake2b is supported alongside md5."""
+    data = b"photoshare" * 1000
+    photo = tmp_path / "photo.jpg"
+    photo.write_bytes(data)
+
+    assert hashing.calculate_hash(photo, algorithm='blake2b') == hashlib.blake2b(data).hexdigest()
+
+def test_calculate_hash_missing_file(tmp_path):
+    """Tests that an unreadable file returns None."""
+    assert hashing.calculate_md5sum(tmp_path / "missing.jpg") is None
+
+def test_hash_stats_throughput(tmp_path):
+    """Tests that hashed bytes are recorded for throughput reporting."""
+    photo = tmp_path / "photo.jpg"
+    photo.write_bytes(b"x" * 4096)
+
+    hashing.stats.reset()
+    hashing.calculate_md5sum(photo)
+
+    assert hashing.stats.files == 1
+    assert hashing.stats.bytes == 4096
+    assert "MB/s" in hashing.stats.summary()
+
+def test_quick_hash_covers_size_and_edges(tmp_path):
+    """Tests that the quick-hash changes with the size or the edges but not the middle."""
+    data = bytearray(os.urandom(512 * 1024))
+    original = tmp_path / "original.jpg"
+    original.write_bytes(data)
+
+    middle = bytearray(data)
+    middle[256 * 1024] ^= 0xFF
+    middle_changed = tmp_path / "middle.jpg"
+    middle_changed.write_bytes(middle)
+
+    tail = bytearray(data)
+    tail[-1] ^= 0xFF
+    tail_changed = tmp_path / "tail.jpg"
+    tail_changed.write_bytes(tail)
+
+    truncated = tmp_path / "truncated.jpg"
+    truncated.write_bytes(data[:-1])
+
+    quick = hashing.calculate_quick_hash(original)
+    assert hashing.calculate_quick_hash(middle_changed) == quick
+    assert hashing.calculate_quick_hash(tail_changed) != quick
+    assert hashing.calculate_quick_hash(truncated) != quick
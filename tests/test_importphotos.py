@@ -0,0 +1,27 @@
+import os
+import sys
+from click.testing import CliRunner
+
+# Add project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from importphotos import import_photos
+
+def test_parallel_import_links_duplicates_once(tmp_path, monkeypatch):
+    """
+    Tests that a parallel import links each unique photo into 'new' and
+    sends in-run duplicates to 'existing', as a serial import does.
+    """
+    monkeypatch.setenv("PHOTOSHARE_DATABASE_FILE", str(tmp_path / "test.db"))
+    src = tmp_path / "import"
+    (src / "card").mkdir(parents=True)
+    for i in range(20):
+        (src / "card" / f"img{i:02d}.jpg").write_bytes(f"photo {i}".encode())
+    (src / "zz_copy.jpg").write_bytes(b"photo 3")
+
+    result = CliRunner().invoke(import_photos, [str(src), "--jobs", "4"])
+
+    assert result.exit_code == 0, result.output
+    assert len(list((src / "new").iterdir())) == 20
+    existing = [p.name for p in (src / "existing").iterdir()]
+    assert len(existing) == 1 and existing[0] in ("img03.jpg", "zz_copy.jpg")
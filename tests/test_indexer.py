@@ -2,6 +2,7 @@
 
 import os
 import sys
+import pytest
 from unittest.mock import patch, MagicMock
 
 # Add project root to the Python path
@@ -9,9 +10,25 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')
 
 from app import indexing
 
+class _InlinePool:
+    """Runs pool jobs in-process so tests can observe worker behaviour."""
+    def __init__(self, *args, **kwargs):
+        pass
+    def __enter__(self):
+        return self
+    def __exit__(self, *exc):
+        return False
+    def apply_async(self, func, args, callback=None, error_callback=None):
+        try:
+            result = func(*args)
+        except Exception as e:
+            error_callback(e)
+        else:
+            callback(result)
+
 @patch('app.database.get_db_connection')
-@patch('app.indexing.Pool') # Mock the Pool class
-def test_indexer_ignores_patterns(mock_pool, mock_get_db, tmp_path, monkeypatch):
+@patch('app.indexing.Pool', _InlinePool)
+def test_indexer_ignores_patterns(mock_get_db, tmp_path, monkeypatch):
     """
     Tests that the indexer correctly ignores files matching patterns
     in the specified ignore file.
@@ -38,19 +55,161 @@ def test_indexer_ignores_patterns(mock_pool, mock_get_db, tmp_path, monkeypatch)
     mock_conn.execute.return_value.fetchall.return_value = []
     mock_get_db.return_value = mock_conn
 
-    # Mock the instance of the Pool and its imap_unordered method
-    mock_pool_instance = mock_pool.return_value.__enter__.return_value
-    # This simulates that the pool returns no results, we check the jobs sent to it
-    mock_pool_instance.imap_unordered.return_value = []
+    # Record the jobs sent to the hash stage; returning None simulates that no
+    # results come back, we only check which photos were scheduled
+    jobs_sent_to_pipeline = []
+    monkeypatch.setattr(indexing, "_hash_photo", lambda job: jobs_sent_to_pipeline.append(job))
 
     # 2. Run the indexer
     indexing.run_indexing()
 
     # 3. Assert the results
-    # Get the list of jobs that would have been sent to the pool
-    jobs_sent_to_pool = mock_pool_instance.imap_unordered.call_args[0][1]
-    processed_photos = [job[0] for job in jobs_sent_to_pool]
+    processed_photos = [job[0] for job in jobs_sent_to_pipeline]
 
     assert len(processed_photos) == 1, "Should only attempt to process one photo"
     assert processed_photos[0] == good_photo, "The wrong photo was processed"
     assert ignored_photo not in processed_photos, "The ignored photo was processed"
+
+def _make_photo(path, color):
+    from PIL import Image
+    path.parent.mkdir(parents=True, exist_ok=True)
+    Image.new('RGB', (200, 100), color).save(path)
+
+def test_indexer_detects_moves_with_quick_hash(tmp_path, monkeypatch):
+    """
+    Tests that a moved photo keeps its record and is matched by quick-hash
+    without computing a full md5sum.
+    """
+    from app import database
+    db_path = tmp_path / "test.db"
+    monkeypatch.setenv("PHOTOSHARE_DATABASE_FILE", str(db_path))
+    monkeypatch.delenv("PHOTOSHARE_PHOTO_IGNORE_PATS", raising=False)
+    monkeypatch.setattr(indexing, "Pool", _InlinePool)
+    database.init_db()
+
+    photo_root = tmp_path / "photos"
+    _make_photo(photo_root / "a" / "red.jpg", "red")
+    _make_photo(photo_root / "a" / "blue.jpg", "blue")
+    indexing.run_indexing(folder=str(photo_root))
+
+    conn = database.get_db_connection()
+    original = conn.execute("SELECT id, md5sum, quick_hash FROM photos WHERE path LIKE '%red.jpg'").fetchone()
+    conn.close()
+    assert original['quick_hash']
+
+    (photo_root / "b").mkdir()
+    (photo_root / "a" / "red.jpg").rename(photo_root / "b" / "red.jpg")
+
+    md5_calls = []
+    monkeypatch.setattr(indexing, "_calculate_md5sum", lambda p: md5_calls.append(p))
+    indexing.run_indexing(folder=str(photo_root))
+
+    conn = database.get_db_connection()
+    rows = conn.execute("SELECT id, path, md5sum FROM photos").fetchall()
+    conn.close()
+    assert len(rows) == 2
+    moved = [row for row in rows if row['id'] == original['id']][0]
+    assert moved['path'] == str(photo_root / "b" / "red.jpg")
+    assert moved['md5sum'] == original['md5sum']
+    assert md5_calls == [], "Unchanged and moved files should not be fully hashed"
+
+def test_indexer_rehashes_files_edited_in_place(tmp_path, monkeypatch):
+    """
+    Tests that a file whose size or mtime changed gets a fresh md5sum, not only a fresh quick-hash.
+    """
+    from app import database, hashing
+    monkeypatch.setenv("PHOTOSHARE_DATABASE_FILE", str(tmp_path / "test.db"))
+    monkeypatch.delenv("PHOTOSHARE_PHOTO_IGNORE_PATS", raising=False)
+    monkeypatch.setattr(indexing, "Pool", _InlinePool)
+    database.init_db()
+
+    photo_root = tmp_path / "photos"
+    photo = photo_root / "red.jpg"
+    _make_photo(photo, "red")
+    indexing.run_indexing(folder=str(photo_root))
+
+    from PIL import Image
+    Image.new('RGB', (300, 100), "green").save(photo)
+    os.utime(photo, ns=(os.stat(photo).st_atime_ns, os.stat(photo).st_mtime_ns + 10**9))
+    indexing.run_indexing(folder=str(photo_root))
+
+    conn = database.get_db_connection()
+    row = conn.execute("SELECT width, md5sum, quick_hash FROM photos").fetchone()
+    conn.close()
+    assert row['md5sum'] == hashing.calculate_md5sum(str(photo))
+    assert row['quick_hash'] == hashing.calculate_quick_hash(str(photo))
+
+@pytest.mark.parametrize('edited_name', ['0-edited.jpg', 'z-edited.jpg'])
+def test_indexer_confirms_duplicates_with_md5(tmp_path, monkeypatch, edited_name):
+    """
+    Tests that a second file quick-hash matching an already claimed move is only skipped
+    as a duplicate when its md5sum matches, so an edited copy is indexed as a new photo.
+    """
+    from app import database, hashing
+    from PIL import Image
+    monkeypatch.setenv("PHOTOSHARE_DATABASE_FILE", str(tmp_path / "test.db"))
+    monkeypatch.delenv("PHOTOSHARE_PHOTO_IGNORE_PATS", raising=False)
+    monkeypatch.setattr(indexing, "Pool", _InlinePool)
+    database.init_db()
+
+    photo_root = tmp_path / "photos"
+    original = photo_root / "a" / "noise.jpg"
+    original.parent.mkdir(parents=True)
+    Image.frombytes('RGB', (600, 600), os.urandom(600 * 600 * 3)).save(original, quality=95)
+    assert os.path.getsize(original) > 4 * hashing.QUICK_HASH_EDGE_SIZE
+    indexing.run_indexing(folder=str(photo_root))
+
+    # Move the photo, and add a copy with its middle bytes changed: same size and edges
+    data = bytearray(original.read_bytes())
+    (photo_root / "b").mkdir()
+    original.rename(photo_root / "b" / "noise.jpg")
+    data[len(data) // 2] ^= 0xFF
+    (photo_root / "b" / edited_name).write_bytes(bytes(data))
+    indexing.run_indexing(folder=str(photo_root))
+
+    conn = database.get_db_connection()
+    rows = {row['path']: row for row in conn.execute("SELECT id, path, md5sum FROM photos")}
+    conn.close()
+    assert sorted(rows) == sorted([str(photo_root / "b" / edited_name), str(photo_root / "b" / "noise.jpg")])
+    moved = rows[str(photo_root / "b" / "noise.jpg")]
+    assert moved['id'] == 1 and moved['md5sum'] == hashing.calculate_md5sum(moved['path'])
+
+def test_indexer_resumes_from_checkpoint(tmp_path, monkeypatch):
+    """
+    Tests that a resumed run skips directories walked and photos processed
+    before the interruption, and clears the checkpoint when it completes.
+    """
+    from app import checkpoint, database
+    db_path = tmp_path / "test.db"
+    monkeypatch.setenv("PHOTOSHARE_DATABASE_FILE", str(db_path))
+    monkeypatch.delenv("PHOTOSHARE_PHOTO_IGNORE_PATS", raising=False)
+    monkeypatch.setattr(indexing, "Pool", _InlinePool)
+    database.init_db()
+
+    photo_root = tmp_path / "photos"
+    _make_photo(photo_root / "a" / "red.jpg", "red")
+    _make_photo(photo_root / "a" / "blue.jpg", "blue")
+    _make_photo(photo_root / "b" / "green.jpg", "green")
+
+    # Keep the checkpoint of a completed run, then rewind it to a run that was
+    # killed after walking directory "a" and processing its photos.
+    with patch.object(checkpoint.IndexCheckpoint, "finish"):
+        indexing.run_indexing(folder=str(photo_root))
+    conn = database.get_db_connection()
+    conn.execute("DELETE FROM index_checkpoint_files WHERE path LIKE '%green.jpg'")
+    conn.execute("DELETE FROM photos WHERE path LIKE '%green.jpg'")
+    conn.execute("""UPDATE index_checkpoint SET phase = 'discovery', walk_position = '[0, "a"]'""")
+    conn.commit()
+    conn.close()
+
+    scheduled = []
+    hash_photo = indexing._hash_photo
+    monkeypatch.setattr(indexing, "_hash_photo", lambda job: scheduled.append(job[0]) or hash_photo(job))
+    indexing.run_indexing(folder=str(photo_root), resume=True)
+
+    assert scheduled == [photo_root / "b" / "green.jpg"]
+    conn = database.get_db_connection()
+    assert conn.execute("SELECT COUNT(*) FROM photos").fetchone()[0] == 3
+    assert conn.execute("SELECT COUNT(*) FROM index_checkpoint_files").fetchone()[0] == 0
+    assert conn.execute("SELECT COUNT(*) FROM index_checkpoint").fetchone()[0] == 0
+    conn.close()
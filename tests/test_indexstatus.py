@@ -0,0 +1,65 @@
+import os
+import sys
+
+# Add project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import database, indexstatus
+
+def test_index_lock_is_exclusive(tmp_path):
+    lock_file = tmp_path / "index.lock"
+    assert not indexstatus.is_locked(lock_file)
+
+    first = indexstatus.IndexLock(lock_file)
+    assert first.acquire()
+    assert lock_file.read_text() == str(os.getpid())
+    assert indexstatus.is_locked(lock_file)
+    assert not indexstatus.IndexLock(lock_file).acquire(), "A second indexer must not get the lock"
+
+    first.release()
+    assert not lock_file.exists()
+    assert not indexstatus.is_locked(lock_file)
+
+def test_leftover_lock_file_is_not_locked(tmp_path):
+    """A lock file left behind by a crashed indexer does not block a new one."""
+    lock_file = tmp_path / "index.lock"
+    lock_file.write_text("12345")
+    assert not indexstatus.is_locked(lock_file)
+    lock = indexstatus.IndexLock(lock_file)
+    assert lock.acquire()
+    lock.release()
+
+def test_progress_is_reported(tmp_path, monkeypatch):
+    monkeypatch.setenv("PHOTOSHARE_DATABASE_FILE", str(tmp_path / "test.db"))
+    database.init_db()
+    assert indexstatus.get_status() == {'running': False, 'stalled': False, 'phase': None}
+
+    with indexstatus.IndexLock() as lock:
+        assert lock.acquire()
+        reporter = indexstatus.ProgressReporter()
+        reporter.start()
+        reporter.update(phase='processing', discovered=10, total=8, processed=4, rate=2.0, eta='2s')
+        reporter.write()
+
+        status = indexstatus.get_status()
+        assert status['running'] and not status['stalled']
+        assert (status['phase'], status['processed'], status['total'], status['eta']) == ('processing', 4, 8, '2s')
+        reporter.stop('finished')
+
+    status = indexstatus.get_status()
+    assert not status['running'] and not status['stalled']
+    assert status['phase'] == 'finished'
+    assert status['finished'] is not None
+
+def test_dead_run_is_reported_stalled(tmp_path, monkeypatch):
+    monkeypatch.setenv("PHOTOSHARE_DATABASE_FILE", str(tmp_path / "test.db"))
+    database.init_db()
+    reporter = indexstatus.ProgressReporter()
+    reporter.start()
+    reporter.update(phase='discovery', discovered=3)
+    reporter.write()
+    reporter._stop.set()  # the indexer died without finishing
+
+    status = indexstatus.get_status()
+    assert status['stalled'] and not status['running']
+    assert status['discovered'] == 3
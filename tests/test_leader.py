@@ -0,0 +1,24 @@
+import os
+import sys
+import threading
+
+# Add project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import leader
+
+def test_one_leader_and_follower_takes_over(tmp_path):
+    lock_file = tmp_path / "leader.lock"
+    promoted = threading.Event()
+
+    first = leader.LeaderElection(on_elected=lambda: None, path=lock_file, retry_interval=0.05)
+    second = leader.LeaderElection(on_elected=promoted.set, path=lock_file, retry_interval=0.05)
+    assert first.start()
+    assert not second.start()
+    assert not second.is_leader
+    assert not promoted.wait(0.2), "A follower must not be promoted while the leader is alive"
+
+    first.stop()
+    assert promoted.wait(5)
+    assert second.is_leader
+    second.stop()
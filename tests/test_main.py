@@ -72,4 +72,169 @@ def test_get_random_photo_wrong_api_key(test_client):
     """
     headers = {"Authorization": "Client-ID wrong_key"}
     response = test_client.get("/photos/random", headers=headers)
-    assert response.status_code == 401
\ No newline at end of file
+    assert response.status_code == 401
+def test_suggest_tags(test_client):
+    """
+    Tests that tags saved through the API are suggested by prefix, most used first.
+    """
+    headers = {"Authorization": "Client-ID test_key"}
+    photo_id = test_client.get("/photos/random", headers=headers).json()["id"]
+    response = test_client.post(f"/photo/tag/{photo_id}", headers=headers, json={"tags": "suggestme, suggestion"})
+    assert response.status_code == 204
+
+    response = test_client.get("/tags/suggest", params={"q": "SUGG", "limit": 5})
+    assert response.status_code == 200
+    tags = [s["tag"] for s in response.json()["suggestions"]]
+    assert sorted(tags) == ["suggestion", "suggestme"]
+    assert response.json()["suggestions"][0]["count"] == 1
+
+def test_tag_query_endpoints(test_client, monkeypatch):
+    """
+    Tests that random, sequence and zip endpoints accept boolean tag queries.
+    """
+    from app import tagquery
+    monkeypatch.setattr(tagquery, "bitmaps", tagquery.TagBitmaps())
+    headers = {"Authorization": "Client-ID test_key"}
+    photo_id = test_client.get("/photos/random", headers=headers).json()["id"]
+    test_client.post(f"/photo/tag/{photo_id}", headers=headers, json={"tags": "queryme, other"})
+
+    response = test_client.get("/photos/random", headers=headers, params={"q": "queryme AND NOT missing"})
+    assert response.status_code == 200
+    assert response.json()["id"] == photo_id
+
+    response = test_client.get("/photos/sequence/query", headers=headers, params={"q": "queryme other", "current_photo_id": photo_id, "direction": "next"})
+    assert response.json()["id"] == photo_id
+
+    assert test_client.get("/photos/random", headers=headers, params={"q": "queryme AND"}).status_code == 400
+    assert test_client.get("/photos/random", headers=headers, params={"q": "missing"}).status_code == 404
+    assert test_client.get("/download/query", params={"q": "queryme OR other"}).status_code == 200
+
+def test_tag_query_slideshow_page(test_client, monkeypatch):
+    """
+    Tests that a boolean tag query slideshow page renders with the number of matches.
+    """
+    from app import tagquery
+    monkeypatch.setattr(tagquery, "bitmaps", tagquery.TagBitmaps())
+    headers = {"Authorization": "Client-ID test_key"}
+    photo_id = test_client.get("/photos/random", headers=headers).json()["id"]
+    test_client.post(f"/photo/tag/{photo_id}", headers=headers, json={"tags": "family, beach"})
+
+    response = test_client.get("/ui/slideshow/family AND beach")
+    assert response.status_code == 200
+    assert '<span id="tag-count">1</span> <span id="tag-label">matching</span>' in response.text
+
+def test_tag_slideshow_count_matches_random_photos(test_client, tmp_path):
+    """
+    Tests that a tag slideshow's header count and its random photos use the same exact tag matching.
+    """
+    headers = {"Authorization": "Client-ID test_key"}
+    conn = database.get_db_connection()
+    ids = [conn.execute("SELECT MIN(id) FROM photos").fetchone()[0]]
+    ids.append(conn.execute("INSERT INTO photos (path, width, height) VALUES (?, 100, 100)", (str(tmp_path / "other.jpg"),)).lastrowid)
+    conn.commit()
+    conn.close()
+    test_client.post(f"/photo/tag/{ids[0]}", headers=headers, json={"tags": "cat"})
+    test_client.post(f"/photo/tag/{ids[1]}", headers=headers, json={"tags": "category"})
+
+    response = test_client.get("/ui/slideshow/cat")
+    assert '<span id="tag-count">1</span>' in response.text
+    assert {test_client.get("/photos/random", headers=headers, params={"tag": "cat"}).json()["id"] for _ in range(10)} == {ids[0]}
+
+def test_missing_photo_file_is_dropped_from_tag_lookups(test_client, monkeypatch, tmp_path):
+    """
+    Tests that serving a photo whose file is gone removes it from tag suggestions and queries.
+    """
+    from app import tagquery
+    monkeypatch.setattr(tagquery, "bitmaps", tagquery.TagBitmaps())
+    headers = {"Authorization": "Client-ID test_key"}
+    conn = database.get_db_connection()
+    photo_id = conn.execute("INSERT INTO photos (path, width, height) VALUES (?, 100, 100)", (str(tmp_path / "gone.jpg"),)).lastrowid
+    conn.commit()
+    conn.close()
+    test_client.post(f"/photo/tag/{photo_id}", headers=headers, json={"tags": "vanished"})
+    assert test_client.get("/photos/random", headers=headers, params={"q": "vanished OR nothing"}).json()["id"] == photo_id
+
+    assert test_client.get(f"/photos/{photo_id}").status_code == 410
+    assert test_client.get("/tags/suggest", params={"q": "vanish"}).json()["suggestions"] == []
+    assert test_client.get("/photos/random", headers=headers, params={"q": "vanished OR nothing"}).status_code == 404
+
+def test_search_photos(test_client):
+    """
+    Tests that /search/photos finds photos by tag and returns paginated results.
+    """
+    headers = {"Authorization": "Client-ID test_key"}
+    photo_id = test_client.get("/photos/random", headers=headers).json()["id"]
+    test_client.post(f"/photo/tag/{photo_id}", headers=headers, json={"tags": "searchable"})
+
+    response = test_client.get("/search/photos", headers=headers, params={"query": "searchab", "per_page": 5})
+    assert response.status_code == 200
+    data = response.json()
+    assert data["total"] == 1
+    assert data["total_pages"] == 1
+    assert data["results"][0]["id"] == photo_id
+    assert test_client.get("/search/photos", params={"query": "searchable"}).status_code == 401
+
+def test_folders_and_folder_sequence(test_client, sample_photos_path):
+    """
+    Tests folder browsing from the photo roots and a folder slideshow sequence.
+    """
+    headers = {"Authorization": "Client-ID test_key"}
+    response = test_client.get("/folders", headers=headers)
+    assert response.status_code == 200
+    root = response.json()["folders"][0]
+    assert root["photo_count"] > 0
+
+    response = test_client.get("/folders", headers=headers, params={"parent": root["path"]})
+    assert response.json()["total_count"] == root["photo_count"]
+
+    response = test_client.get(f"/photos/sequence/folder:{root['path']}", headers=headers)
+    assert response.status_code == 200
+    assert test_client.get("/photos/sequence/folder:/no/such/folder", headers=headers).status_code == 404
+
+def test_timeline_and_date_sequences(test_client):
+    """
+    Tests the timeline histogram and that date sequences validate their parameters.
+    """
+    headers = {"Authorization": "Client-ID test_key"}
+    assert test_client.get("/timeline").status_code == 401
+    response = test_client.get("/timeline", headers=headers)
+    assert response.status_code == 200
+    assert response.json()["year"] is None
+
+    assert test_client.get("/photos/sequence/year:abc", headers=headers).status_code == 400
+    assert test_client.get("/photos/sequence/on-this-day", headers=headers, params={"day": "13-01"}).status_code == 400
+    assert test_client.get("/photos/sequence/year:1800", headers=headers).status_code == 404
+
+def test_geo_endpoints(test_client):
+    """
+    Tests parameter validation and response shape of the geospatial endpoints.
+    """
+    headers = {"Authorization": "Client-ID test_key"}
+    response = test_client.get("/photos/near", headers=headers, params={"lat": 45.5, "lon": -122.6, "radius": 500})
+    assert response.status_code == 200
+    assert "photos" in response.json()
+    assert test_client.get("/photos/near", headers=headers, params={"lat": 95, "lon": 0}).status_code == 400
+
+    assert test_client.get("/geo/clusters", params={"bbox": "-180,-90,180,90"}).status_code == 401
+    response = test_client.get("/geo/clusters", headers=headers, params={"bbox": "-180,-90,180,90", "zoom": 2})
+    assert response.status_code == 200
+    assert response.json()["zoom"] == 2
+    assert test_client.get("/geo/clusters", headers=headers, params={"bbox": "oops"}).status_code == 400
+
+def test_orientation_filters(test_client):
+    """
+    Tests that random and sequence photos honour orientation and min_aspect.
+    """
+    headers = {"Authorization": "Client-ID test_key"}
+    for orientation in ('portrait', 'landscape', 'square'):
+        for url in ("/photos/random", "/photos/sequence/shuffle", "/photos/sequence/tagged"):
+            response = test_client.get(url, headers=headers, params={"orientation": orientation})
+            assert response.status_code in (200, 404)
+            if response.status_code == 200:
+                data = response.json()
+                ratio = data["width"] / data["height"]
+                assert (ratio < 1) if orientation == 'portrait' else (ratio > 1) if orientation == 'landscape' else abs(ratio - 1) <= 0.05
+
+    assert test_client.get("/photos/random", headers=headers, params={"orientation": "diagonal"}).status_code == 400
+    assert test_client.get("/photos/sequence/shuffle", headers=headers, params={"min_aspect": 0}).status_code == 400
+    assert test_client.get("/photos/random", headers=headers, params={"min_aspect": 100}).status_code == 404
@@ -0,0 +1,70 @@
+import os
+import sys
+import pytest
+from PIL import Image
+
+# Add project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import indexing, metadata
+
+def _exif():
+    exif = Image.Exif()
+    exif[0x0112] = 6
+    exif.get_ifd(0x8769)[0x9003] = "2019:07:04 12:30:45"
+    exif.get_ifd(0x8825).update({1: "N", 2: (40.0, 26.0, 46.0), 3: "W", 4: (79.0, 58.0, 56.0)})
+    return exif
+
+@pytest.mark.parametrize("suffix", [".jpg", ".png"])
+def test_read_metadata_matches_pillow(tmp_path, suffix):
+    """
+    Tests that the header-only reader extracts the same fields as the Pillow fallback.
+    """
+    photo = tmp_path / f"photo{suffix}"
+    Image.new('RGB', (320, 240), 'green').save(photo, exif=_exif())
+
+    fast = metadata.read_metadata(photo)
+    slow = indexing._get_exif_data_with_pillow(photo)
+
+    assert fast['width'] == 320 and fast['height'] == 240
+    assert fast['datetime_taken'] == "2019-07-04T12:30:45"
+    assert fast['orientation'] == 6
+    lat, lon = (float(v) for v in fast['geolocation'].split(','))
+    assert lat == pytest.approx(40.446111, abs=1e-5)
+    assert lon == pytest.approx(-79.982222, abs=1e-5)
+    if suffix == ".jpg":
+        assert fast == slow
+
+def test_read_metadata_without_exif(tmp_path):
+    """Tests that dimensions are read from files without EXIF data."""
+    photo = tmp_path / "plain.jpg"
+    Image.new('RGB', (64, 48)).save(photo)
+
+    assert metadata.read_metadata(photo) == {
+        'width': 64, 'height': 48, 'geolocation': None, 'datetime_taken': None, 'orientation': None
+    }
+
+@pytest.mark.parametrize("datetime_original, latitude", [(7, 40.5), ((7, 8), (40.0, 26.0))])
+def test_read_metadata_ignores_wrongly_typed_exif(tmp_path, datetime_original, latitude):
+    """Tests that a DateTimeOriginal or GPS latitude of the wrong EXIF type is skipped, not raised."""
+    exif = _exif()
+    exif.get_ifd(0x8769)[0x9003] = datetime_original
+    exif.get_ifd(0x8825)[2] = latitude
+    photo = tmp_path / "odd.jpg"
+    Image.new('RGB', (64, 48)).save(photo, exif=exif)
+
+    assert metadata.read_metadata(photo) == {
+        'width': 64, 'height': 48, 'geolocation': None, 'datetime_taken': None, 'orientation': 6
+    }
+
+def test_read_metadata_unsupported_falls_back(tmp_path):
+    """Tests that unsupported or corrupt files return None and the indexer falls back to Pillow."""
+    gif = tmp_path / "anim.gif"
+    Image.new('RGB', (30, 20)).save(gif)
+    corrupt = tmp_path / "corrupt.jpg"
+    corrupt.write_bytes(b"\xff\xd8\xff\xe0\x00")
+
+    assert metadata.read_metadata(gif) is None
+    assert metadata.read_metadata(corrupt) is None
+    assert indexing._get_exif_data(gif)['width'] == 30
+    assert indexing._get_exif_data(corrupt) is None
@@ -0,0 +1,87 @@
+import os
+import sys
+
+# Add project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import database
+
+EXIF = {'width': 10, 'height': 20, 'geolocation': None, 'datetime_taken': None}
+
+def _setup(tmp_path, monkeypatch):
+    monkeypatch.setenv("PHOTOSHARE_DATABASE_FILE", str(tmp_path / "test.db"))
+    database.init_db()
+    conn = database.get_db_connection()
+    conn.executemany("INSERT INTO photos (path, width, height, tags) VALUES (?, 1, 1, ?)", [
+        ('/nas/photos/2015/Italy/rome.jpg', 'travel'),
+        ('/nas/photos/2015/Italy/Venice/canal.jpg', 'travel, water'),
+        ('/nas/photos/2016/home.jpg', None),
+    ])
+    conn.commit()
+    conn.close()
+    assert database.normalize_paths()
+
+def test_normalize_keeps_photos_and_derived_data(tmp_path, monkeypatch):
+    _setup(tmp_path, monkeypatch)
+    conn = database.get_db_connection()
+    assert database.is_normalized(conn)
+    rows = conn.execute("SELECT id, path, tags FROM photos ORDER BY id").fetchall()
+    assert [(r['id'], r['path']) for r in rows] == [
+        (1, '/nas/photos/2015/Italy/rome.jpg'), (2, '/nas/photos/2015/Italy/Venice/canal.jpg'), (3, '/nas/photos/2016/home.jpg')
+    ]
+    assert [r['path'] for r in conn.execute("SELECT path FROM directories ORDER BY path")] == [
+        '/nas/photos/2015/Italy/', '/nas/photos/2015/Italy/Venice/', '/nas/photos/2016/'
+    ]
+    assert conn.execute("SELECT COUNT(*) FROM photo_files").fetchone()[0] == 3
+    conn.close()
+    assert database.get_tag_count('travel') == 2
+    assert database.search_photos('venice', 10)[0] == 1
+
+    # Running init_db again on a normalized database is a no-op
+    database.init_db()
+    assert database.get_photo_counters()['total'] == 3
+
+def test_writes_through_the_view(tmp_path, monkeypatch):
+    _setup(tmp_path, monkeypatch)
+    database.add_photo_to_index('/nas/photos/2017/new.jpg', 'abc', EXIF)
+    database.add_photo_to_index('/nas/photos/2015/Italy/rome.jpg', 'def', EXIF, update_md5sum=True)
+    database.move_photo(3, '/nas/photos/2017/home.jpg')
+
+    conn = database.get_db_connection()
+    conn.execute("UPDATE photos SET tags = 'family' WHERE id = 3")
+    conn.execute("DELETE FROM photos WHERE id = 2")
+    conn.commit()
+    rows = {r['path']: r for r in conn.execute("SELECT * FROM photos")}
+    conn.close()
+
+    assert sorted(rows) == ['/nas/photos/2015/Italy/rome.jpg', '/nas/photos/2017/home.jpg', '/nas/photos/2017/new.jpg']
+    assert rows['/nas/photos/2017/new.jpg']['md5sum'] == 'abc'
+    assert rows['/nas/photos/2017/new.jpg']['metadata_extraction_attempts'] == 1
+    assert rows['/nas/photos/2015/Italy/rome.jpg']['md5sum'] == 'def'
+    assert rows['/nas/photos/2017/home.jpg']['tags'] == 'family'
+    assert database.get_photo_counters() == {'total': 3, 'tagged': 2, 'untagged': 1, 'new': 1, 'deleted': 0}
+    assert database.search_photos('2017 family', 10)[0] == 1
+
+def test_move_directory_updates_folder_rows(tmp_path, monkeypatch):
+    _setup(tmp_path, monkeypatch)
+    assert database.move_directory('/nas/photos/2015/Italy', '/nas/archive/Italia') == 2
+
+    conn = database.get_db_connection()
+    paths = sorted(r['path'] for r in conn.execute("SELECT path FROM photos"))
+    conn.close()
+    assert paths == ['/nas/archive/Italia/Venice/canal.jpg', '/nas/archive/Italia/rome.jpg', '/nas/photos/2016/home.jpg']
+    assert database.search_photos('italia', 10)[0] == 2
+    assert database.search_photos('italy', 10)[0] == 0
+
+def test_move_directory_without_normalized_paths(tmp_path, monkeypatch):
+    monkeypatch.setenv("PHOTOSHARE_DATABASE_FILE", str(tmp_path / "test.db"))
+    database.init_db()
+    conn = database.get_db_connection()
+    conn.executemany("INSERT INTO photos (path, width, height) VALUES (?, 1, 1)", [('/a/b/1.jpg',), ('/a/b/c/2.jpg',), ('/a/bc/3.jpg',)])
+    conn.commit()
+    conn.close()
+
+    assert database.move_directory('/a/b/', '/x') == 2
+    conn = database.get_db_connection()
+    assert sorted(r['path'] for r in conn.execute("SELECT path FROM photos")) == ['/a/bc/3.jpg', '/x/1.jpg', '/x/c/2.jpg']
+    conn.close()
@@ -0,0 +1,39 @@
+import os
+import sys
+from unittest.mock import patch
+
+# Add project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import pipeline
+
+def _advance(tuner, clock, completed, backlog=10):
+    clock[0] += tuner.interval
+    tuner.record(completed)
+    return tuner.tune(backlog)
+
+def test_stage_tuner_climbs_while_throughput_improves():
+    """Tests that the tuner keeps adding workers while throughput rises and backs off when it drops."""
+    clock = [0.0]
+    with patch('time.monotonic', lambda: clock[0]):
+        tuner = pipeline.StageTuner("test", workers=2, min_workers=1, max_workers=8)
+        assert _advance(tuner, clock, 100) == 3
+        assert _advance(tuner, clock, 150) == 4
+        assert _advance(tuner, clock, 90) == 3
+
+def test_stage_tuner_does_not_grow_starved_stage():
+    """Tests that a stage with nothing queued is not given more workers."""
+    clock = [0.0]
+    with patch('time.monotonic', lambda: clock[0]):
+        tuner = pipeline.StageTuner("test", workers=2, min_workers=1, max_workers=8)
+        assert _advance(tuner, clock, 100, backlog=0) is None
+        assert tuner.workers == 2
+
+def test_thread_stage_processes_all_items():
+    """Tests that a thread stage runs every queued item and reports each result."""
+    results = []
+    stage = pipeline.ThreadStage("test", lambda x: x * 2, lambda item, result: results.append(result), workers=3, queue_depth=4)
+    for i in range(20):
+        stage.put(i)
+    stage.close()
+    assert sorted(results) == [i * 2 for i in range(20)]
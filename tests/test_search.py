@@ -0,0 +1,51 @@
+import os
+import sys
+
+# Add project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import database
+
+def _paths(result):
+    total, rows = result
+    return total, [os.path.basename(row['path']) for row in rows]
+
+def test_search_covers_tags_filenames_and_folders(tmp_path, monkeypatch):
+    monkeypatch.setenv("PHOTOSHARE_DATABASE_FILE", str(tmp_path / "test.db"))
+    database.init_db()
+    conn = database.get_db_connection()
+    conn.executemany("INSERT INTO photos (path, width, height, tags) VALUES (?, 1, 1, ?)", [
+        ('/photos/2019/Yellowstone Trip/IMG_0001.jpg', 'geyser, family'),
+        ('/photos/2020/beach/IMG_0002.jpg', 'Yellowstone'),
+        ('/photos/2020/beach/sunset_over_water.png', ''),
+    ])
+    conn.commit()
+
+    # Tag matches outrank folder matches
+    assert _paths(database.search_photos('yellowstone', 10)) == (2, ['IMG_0002.jpg', 'IMG_0001.jpg'])
+    assert _paths(database.search_photos('sunset wat', 10)) == (1, ['sunset_over_water.png'])
+    assert _paths(database.search_photos('img beach', 1, 0)) == (1, ['IMG_0002.jpg'])
+    assert database.search_photos('"*)(', 10) == (0, [])
+
+    # Tag writes, moves and soft deletes are reflected without a rebuild
+    conn.execute("UPDATE photos SET tags = 'old faithful' WHERE path LIKE '%IMG_0001.jpg'")
+    conn.execute("UPDATE photos SET path = '/photos/archive/dusk.png' WHERE path LIKE '%sunset_over_water.png'")
+    conn.execute("UPDATE photos SET datetime_deleted = '2024-01-01' WHERE path LIKE '%IMG_0002.jpg'")
+    conn.commit()
+    conn.close()
+    assert _paths(database.search_photos('faithful', 10)) == (1, ['IMG_0001.jpg'])
+    assert _paths(database.search_photos('sunset', 10)) == (0, [])
+    assert _paths(database.search_photos('archive', 10)) == (1, ['dusk.png'])
+    assert _paths(database.search_photos('yellowstone', 10)) == (1, ['IMG_0001.jpg'])
+
+def test_index_is_built_for_existing_photos(tmp_path, monkeypatch):
+    monkeypatch.setenv("PHOTOSHARE_DATABASE_FILE", str(tmp_path / "test.db"))
+    database.init_db()
+    conn = database.get_db_connection()
+    conn.execute("INSERT INTO photos (path, width, height, tags) VALUES ('/a/b/c.jpg', 1, 1, 'kitten')")
+    conn.execute("DROP TABLE photos_fts")
+    conn.commit()
+    conn.close()
+
+    database.init_db()
+    assert _paths(database.search_photos('kitten', 10)) == (1, ['c.jpg'])
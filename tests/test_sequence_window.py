@@ -0,0 +1,76 @@
+import os
+import sys
+import pytest
+from fastapi.testclient import TestClient
+from datetime import datetime, timedelta, timezone
+import importlib
+
+# Add project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Import the modules that will need reloading
+from app import main, database
+
+@pytest.fixture
+def client(monkeypatch, tmp_path):
+    """
+    Creates a TestClient over five photos, 1-4 tagged and 1-5 added newest last.
+    """
+    monkeypatch.setenv("PHOTOSHARE_DATABASE_FILE", str(tmp_path / "test_window.db"))
+    monkeypatch.setenv("PHOTOSHARE_API_KEY", "test_key_window")
+    ignore_file = tmp_path / "ignore.txt"
+    ignore_file.touch()
+    monkeypatch.setenv("PHOTOSHARE_PHOTO_IGNORE_PATS", str(ignore_file))
+
+    importlib.reload(database)
+    importlib.reload(main)
+    database.init_db()
+    now = datetime.now(timezone.utc)
+    conn = database.get_db_connection()
+    conn.executemany(
+        "INSERT INTO photos (id, path, width, height, datetime_taken, datetime_added, tags) VALUES (?, ?, 100, 100, ?, ?, ?)",
+        [(i, f"/fake/{i}.jpg", f"2020-01-0{i}T00:00:00", (now + timedelta(minutes=i)).isoformat(), "tag1" if i < 5 else None) for i in range(1, 6)]
+    )
+    conn.commit()
+    conn.close()
+
+    with TestClient(main.app) as client:
+        yield client
+
+HEADERS = {"Authorization": "Client-ID test_key_window"}
+
+def _window(client, sequence_name, **params):
+    response = client.get(f"/photos/sequence/{sequence_name}", headers=HEADERS, params=params)
+    assert response.status_code == 200
+    return response.json()
+
+def test_window_wraps_around_without_repeating(client):
+    assert [p["id"] for p in _window(client, "tagged", current_photo_id=2, direction="next", count=3)["photos"]] == [3, 4, 1]
+    assert [p["id"] for p in _window(client, "tagged", current_photo_id=2, direction="previous", count=3)["photos"]] == [1, 4, 3]
+    assert [p["id"] for p in _window(client, "tagged", current_photo_id=2, direction="next", count=20)["photos"]] == [3, 4, 1, 2]
+    assert [p["id"] for p in _window(client, "tagged", count=2)["photos"]] == [1, 2]
+    assert [p["id"] for p in _window(client, "new", current_photo_id=5, direction="next", count=2)["photos"]] == [4, 3]
+
+@pytest.mark.parametrize("direction", ["next", "previous"])
+def test_window_matches_single_steps(client, direction):
+    for sequence_name, params in [("shuffle", {"shuffle_id": 3}), ("tagged-shuffle", {"shuffle_id": 3}),
+                                  ("folder:/fake", {}), ("year:2020", {}), ("query", {"q": "tag1"}),
+                                  ("query-shuffle", {"q": "tag1", "shuffle_id": 3})]:
+        single = _window(client, sequence_name, **params)
+        ids = [single["id"]]
+        for _ in range(6):
+            ids.append(_window(client, sequence_name, current_photo_id=ids[-1], direction=direction, **params)["id"])
+        expected = ids[:ids.index(ids[0], 1)]
+
+        window = _window(client, sequence_name, current_photo_id=ids[0], direction=direction, count=10, **params)
+        assert [p["id"] for p in window["photos"]] == expected[1:] + expected[:1]
+        if direction == "next":
+            assert [p["id"] for p in _window(client, sequence_name, count=2, **params)["photos"]] == expected[:2]
+        if "shuffle_id" in params:
+            assert window["shuffle_id"] == 3
+
+def test_new_window_starts_at_random_photo(client):
+    ids = [p["id"] for p in _window(client, "new", count=5)["photos"]]
+    assert sorted(ids) == [1, 2, 3, 4, 5]
+    newest_first = [5, 4, 3, 2, 1]
+    assert ids in [newest_first[i:] + newest_first[:i] for i in range(5)]
@@ -0,0 +1,89 @@
+import os
+import sys
+import pytest
+from unittest.mock import patch
+
+# Add project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import database, folders, shape, tagquery, timeline
+
+# (path, width, height, exif_orientation, datetime_taken)
+PHOTOS = [
+    ('/p/a/1.jpg', 4000, 3000, None, '2020-05-01T10:00:00'),  # landscape 1.33
+    ('/p/a/2.jpg', 4000, 3000, 6, '2020-05-02T10:00:00'),     # turned a quarter: portrait 0.75
+    ('/p/a/3.jpg', 3000, 4000, 1, '2020-05-03T10:00:00'),     # portrait 0.75
+    ('/p/b/4.jpg', 1000, 1020, None, '2021-05-04T10:00:00'),  # square 0.98
+    ('/p/b/5.jpg', 6000, 2000, None, '2020-05-05T10:00:00'),  # panorama 3.0
+]
+
+@pytest.fixture(params=['flat', 'normalized'])
+def db(request, tmp_path, monkeypatch):
+    monkeypatch.setenv("PHOTOSHARE_DATABASE_FILE", str(tmp_path / "test.db"))
+    database.init_db()
+    conn = database.get_db_connection()
+    conn.executemany("INSERT INTO photos (path, width, height, exif_orientation, datetime_taken) VALUES (?, ?, ?, ?, ?)", PHOTOS)
+    conn.commit()
+    conn.close()
+    if request.param == 'normalized':
+        database.normalize_paths()
+    return request.param
+
+def _ids(shape_filter):
+    conn = database.get_db_connection()
+    try:
+        return [row['id'] for row in conn.execute(f"SELECT id FROM photos WHERE {shape_filter[0]} ORDER BY id", shape_filter[1])]
+    finally:
+        conn.close()
+
+def test_parse_filter():
+    assert shape.parse_filter() is None
+    assert shape.parse_filter('landscape', 2.0) == ("aspect_ratio > ? AND aspect_ratio >= ?", [1.05, 2.0])
+    with pytest.raises(ValueError):
+        shape.parse_filter('diagonal')
+    with pytest.raises(ValueError):
+        shape.parse_filter(min_aspect=-1)
+
+def test_aspect_ratio_follows_exif_orientation(db):
+    conn = database.get_db_connection()
+    ratios = [round(row['aspect_ratio'], 2) for row in conn.execute("SELECT aspect_ratio FROM photos ORDER BY id")]
+    plan = ' '.join(row['detail'] for row in conn.execute("EXPLAIN QUERY PLAN SELECT id FROM photos WHERE aspect_ratio < 0.95"))
+    conn.close()
+    assert ratios == [1.33, 0.75, 0.75, 0.98, 3.0]
+    assert 'idx_photos_aspect_ratio' in plan
+
+    assert _ids(shape.parse_filter('portrait')) == [2, 3]
+    assert _ids(shape.parse_filter('square')) == [4]
+    assert _ids(shape.parse_filter('landscape')) == [1, 5]
+    assert _ids(shape.parse_filter(min_aspect=2.0)) == [5]
+
+def test_random_and_restrict(db):
+    portrait = shape.parse_filter('portrait')
+    conn = database.get_db_connection()
+    assert {shape.random_photo_id(conn, portrait) for _ in range(100)} == {2, 3}
+    with patch('random.randint', lambda a, b: b):
+        assert shape.random_photo_id(conn, portrait) == 2, "Should wrap around past the last match"
+    assert shape.random_photo_id(conn, shape.parse_filter(min_aspect=10)) is None
+    conn.close()
+    assert list(shape.restrict(tagquery.Bitmap.from_ids([1, 2, 3, 4, 5]), portrait)) == [2, 3]
+    assert list(shape.restrict(tagquery.Bitmap.from_ids([1, 3, 99]), portrait)) == [3]
+    assert list(shape.restrict(tagquery.EMPTY, portrait)) == []
+
+def test_folder_and_timeline_sequences(db):
+    landscape = shape.parse_filter('landscape')
+    conn = database.get_db_connection()
+    assert folders.sequence_photo_id(conn, '/p', shape_filter=landscape) == 1
+    assert folders.sequence_photo_id(conn, '/p', 1, 'next', landscape) == 5
+    assert folders.sequence_photo_id(conn, '/p', 5, 'next', landscape) == 1
+    assert folders.sequence_photo_id(conn, '/p/b', shape_filter=shape.parse_filter('portrait')) is None
+    assert timeline.sequence_photo_id(conn, 'taken_year', 2020, 1, 'next', landscape) == 5
+    assert timeline.sequence_photo_id(conn, 'taken_year', 2020, 1, 'previous', landscape) == 5
+    conn.close()
+
+def test_indexer_stores_exif_orientation(db):
+    database.add_photo_to_index('/p/c/6.jpg', 'md5', {'width': 4000, 'height': 3000, 'geolocation': None, 'datetime_taken': None, 'orientation': 8})
+    database.add_photo_to_index('/p/c/7.jpg', 'md5', {'width': 4000, 'height': 3000, 'geolocation': None, 'datetime_taken': None, 'orientation': 'bogus'})
+    conn = database.get_db_connection()
+    rows = conn.execute("SELECT exif_orientation, aspect_ratio FROM photos WHERE id > 5 ORDER BY id").fetchall()
+    conn.close()
+    assert [(row['exif_orientation'], row['aspect_ratio']) for row in rows] == [(8, 0.75), (None, 4000 / 3000)]
@@ -0,0 +1,41 @@
+import os
+import sys
+
+# Add project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import snapshot
+
+def test_snapshot_round_trip(tmp_path):
+    path = tmp_path / "aggregates.snapshot"
+    counts = {'cat': 3, 'dog': 1, 'zürich': 2, 'a long tag name': 7}
+    snapshot.write_snapshot(path, {'photos': 10, 'tagged': 4}, counts, version=1)
+
+    current = snapshot.SnapshotReader(path).current()
+    assert current.version == 1
+    assert current.totals() == {'photos': 10, 'tagged': 4}
+    assert current.tag_counts() == counts
+    assert current.tag_counts() is current.tag_counts(), "Tag counts are decoded once per version"
+    assert current.tag_count('zürich') == 2
+    assert current.tag_count('cat') == 3
+    assert current.tag_count('missing') == 0
+
+def test_reader_picks_up_new_version(tmp_path):
+    path = tmp_path / "aggregates.snapshot"
+    reader = snapshot.SnapshotReader(path)
+    assert reader.current() is None
+
+    snapshot.write_snapshot(path, {'photos': 1}, {'cat': 1}, version=1)
+    first = reader.current()
+    assert reader.current() is first, "An unchanged file is not remapped"
+
+    snapshot.write_snapshot(path, {'photos': 2}, {'cat': 2}, version=2)
+    second = reader.current()
+    assert second.version == 2
+    assert second.tag_count('cat') == 2
+    assert first.tag_count('cat') == 1, "Readers of the old version keep a consistent view"
+
+def test_invalid_snapshot_is_ignored(tmp_path):
+    path = tmp_path / "aggregates.snapshot"
+    path.write_bytes(b'not a snapshot file at all')
+    assert snapshot.SnapshotReader(path).current() is None
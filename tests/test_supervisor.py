@@ -0,0 +1,69 @@
+import os
+import sys
+
+# Add project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import indexstatus, supervisor
+
+class _FakeProcess:
+    def __init__(self, exitcode):
+        self.pid = 4242
+        self.exitcode = exitcode
+    def join(self, timeout=None):
+        pass
+    def is_alive(self):
+        return False
+
+class _ClosedPipe:
+    def poll(self, timeout):
+        raise EOFError
+    def close(self):
+        pass
+
+def test_supervisor_restarts_crashed_indexer(tmp_path, monkeypatch):
+    monkeypatch.setenv("PHOTOSHARE_DATABASE_FILE", str(tmp_path / "test.db"))
+    monkeypatch.setattr(supervisor, "RESTART_DELAY", 0)
+    exitcodes = [1, 0]
+    spawned = []
+
+    def fake_spawn(self):
+        spawned.append(indexstatus.is_locked())
+        self.process = _FakeProcess(exitcodes[len(spawned) - 1])
+        self._conn = _ClosedPipe()
+
+    monkeypatch.setattr(supervisor.IndexerSupervisor, "_spawn", fake_spawn)
+    sup = supervisor.IndexerSupervisor()
+    assert sup.start()
+    sup._thread.join(5)
+
+    assert spawned == [True, True], "The index lock is held while the indexer runs"
+    assert sup.restarts == 1
+    assert not indexstatus.is_locked(), "The lock is released once the indexer finishes"
+    sup.stop()
+
+def test_supervisor_gives_up_after_max_restarts(tmp_path, monkeypatch):
+    monkeypatch.setenv("PHOTOSHARE_DATABASE_FILE", str(tmp_path / "test.db"))
+    monkeypatch.setattr(supervisor, "RESTART_DELAY", 0)
+    monkeypatch.setattr(supervisor, "MAX_RESTARTS", 2)
+
+    def fake_spawn(self):
+        self.process = _FakeProcess(1)
+        self._conn = _ClosedPipe()
+
+    monkeypatch.setattr(supervisor.IndexerSupervisor, "_spawn", fake_spawn)
+    sup = supervisor.IndexerSupervisor()
+    assert sup.start()
+    sup._thread.join(5)
+    assert sup.restarts == 2
+    assert not indexstatus.is_locked()
+
+def test_only_one_supervisor_starts_an_indexer(tmp_path, monkeypatch):
+    """Simulates two uvicorn workers starting up against the same database."""
+    monkeypatch.setenv("PHOTOSHARE_DATABASE_FILE", str(tmp_path / "test.db"))
+    lock = indexstatus.IndexLock()
+    assert lock.acquire()
+    try:
+        assert not supervisor.IndexerSupervisor().start()
+    finally:
+        lock.release()
@@ -0,0 +1,50 @@
+import os
+import sys
+import random
+
+# Add project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.tagindex import TagIndex
+
+def test_top_listing_and_search():
+    index = TagIndex({'cat': 5, 'Dog': 2, 'dogs': 3, 'bird': 1})
+    assert index.top(2) == [('cat', 5), ('dogs', 3)]
+    assert [t['tag'] for t in index.listing()] == ['Dog', 'bird', 'cat', 'dogs']
+    assert [t['tag'] for t in index.listing(order='desc')] == ['dogs', 'cat', 'bird', 'Dog']
+    assert [t['count'] for t in index.listing(sort_by='count')] == [1, 2, 3, 5]
+    assert index.listing(search='DOG') == [{'tag': 'Dog', 'count': 2}, {'tag': 'dogs', 'count': 3}]
+    assert index.prefix('do') == ['Dog', 'dogs']
+    assert index.prefix('x') == []
+
+def test_incremental_updates_match_a_rebuild():
+    rng = random.Random(7)
+    tags = [f"tag{i}" for i in range(20)]
+    counts = {}
+    index = TagIndex()
+    for _ in range(2000):
+        tag = rng.choice(tags)
+        delta = rng.choice([1, 1, -1])
+        index.adjust(tag, delta)
+        counts[tag] = max(0, counts.get(tag, 0) + delta)
+
+    rebuilt = TagIndex(counts)
+    assert index.listing() == rebuilt.listing()
+    assert index.listing(sort_by='count') == rebuilt.listing(sort_by='count')
+    assert index.top(5) == rebuilt.top(5)
+    assert len(index) == len([c for c in counts.values() if c])
+
+def test_apply_change_moves_counts_between_tags():
+    index = TagIndex({'cat': 1})
+    index.apply_change('cat', ' dog , bird')
+    assert index.count('cat') == 0
+    assert index.prefix('') == ['bird', 'dog']
+    index.apply_change('dog,bird', None)
+    assert len(index) == 0
+
+def test_suggest_ranks_prefix_matches_by_count():
+    index = TagIndex({'beach': 3, 'Berlin': 9, 'bees': 3, 'cat': 50})
+    assert index.suggest('be', 2) == [('Berlin', 9), ('beach', 3)]
+    assert index.suggest('BEE', 5) == [('bees', 3)]
+    assert index.suggest('', 1) == [('cat', 50)]
+    assert index.suggest('z', 5) == []
@@ -0,0 +1,95 @@
+import os
+import sys
+import random
+import pytest
+
+# Add project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import database, tagquery
+from app.tagquery import TagBitmaps, TagQueryError
+
+@pytest.fixture
+def bitmaps(tmp_path, monkeypatch):
+    monkeypatch.setenv("PHOTOSHARE_DATABASE_FILE", str(tmp_path / "test.db"))
+    database.init_db()
+    conn = database.get_db_connection()
+    rows = [
+        ('1.jpg', 'family, beach', None),
+        ('2.jpg', 'Family, beach, 2019', None),
+        ('3.jpg', 'family', None),
+        ('4.jpg', 'beach, new york', None),
+        ('5.jpg', '', None),
+        ('6.jpg', 'family, beach', '2024-01-01'),
+    ]
+    conn.executemany("INSERT INTO photos (path, width, height, tags, datetime_deleted) VALUES (?, 1, 1, ?, ?)", rows)
+    conn.commit()
+    conn.close()
+    return TagBitmaps()
+
+def _ids(bitmaps, query):
+    return list(bitmaps.evaluate(query))
+
+def test_boolean_operators(bitmaps):
+    assert _ids(bitmaps, 'family AND beach NOT 2019') == [1]
+    assert _ids(bitmaps, 'family beach') == [1, 2]
+    assert _ids(bitmaps, 'FAMILY OR "new york"') == [1, 2, 3, 4]
+    assert _ids(bitmaps, '-beach') == [3, 5]
+    assert _ids(bitmaps, 'NOT (family OR beach)') == [5]
+    assert _ids(bitmaps, 'unknown OR 2019') == [2]
+
+def test_malformed_queries_raise(bitmaps):
+    for query in ['', '(family', 'family AND', 'family )', 'OR beach']:
+        with pytest.raises(TagQueryError):
+            bitmaps.evaluate(query)
+
+def test_is_query():
+    assert tagquery.is_query('family AND beach')
+    assert tagquery.is_query('-2019')
+    assert not tagquery.is_query('family')
+    assert not tagquery.is_query('new-shuffle')
+
+def test_incremental_changes(bitmaps):
+    bitmaps.evaluate('family')
+    bitmaps.apply_change(5, '', 'family')
+    bitmaps.apply_change(1, 'family, beach', 'beach')
+    assert _ids(bitmaps, 'family') == [2, 3, 5]
+    bitmaps.remove_photo(3, 'family')
+    assert _ids(bitmaps, 'family') == [2, 5]
+    assert _ids(bitmaps, 'NOT beach') == [5]
+
+@pytest.mark.parametrize('size', [300, 20000])
+def test_bitmap_navigation(size):
+    rng = random.Random(3)
+    ids = sorted(rng.sample(range(1, 200000), size))  # sparse and dense chunks
+    bitmap = tagquery.Bitmap.from_ids(ids)
+    assert list(bitmap) == ids and len(bitmap) == size
+    assert [bitmap.select(n) for n in range(0, size, 7)] == ids[::7]
+    assert bitmap.first() == ids[0]
+    assert bitmap.last() == ids[-1]
+    for i in range(0, size, 13):
+        photo_id = ids[i]
+        assert photo_id in bitmap and photo_id + 200000 not in bitmap
+        assert bitmap.rank(photo_id) == i
+        assert bitmap.next_after(photo_id) == (ids[i + 1] if i + 1 < size else None)
+        assert bitmap.previous_before(photo_id) == (ids[i - 1] if i else None)
+
+def test_bitmap_set_operations():
+    rng = random.Random(5)
+    for a_size, b_size in [(100, 50), (10000, 300), (30000, 40000)]:
+        a_ids = set(rng.sample(range(150000), a_size))
+        b_ids = set(rng.sample(range(150000), b_size))
+        a, b = tagquery.Bitmap.from_ids(a_ids), tagquery.Bitmap.from_ids(b_ids)
+        assert list(a & b) == sorted(a_ids & b_ids)
+        assert list(a | b) == sorted(a_ids | b_ids)
+        assert list(a - b) == sorted(a_ids - b_ids)
+        assert list(b - a) == sorted(b_ids - a_ids)
+    assert list(tagquery.EMPTY.with_id(70000).with_id(3).without_id(70000)) == [3]
+
+def test_shuffle_order_is_a_permutation():
+    for size in [1, 2, 10, 97, 1000]:
+        for seed in [100, 1234, 9999]:
+            order = tagquery.ShuffleOrder(size, seed)
+            positions = [order.position(rank) for rank in range(size)]
+            assert sorted(positions) == list(range(size))
+            assert [order.rank(position) for position in positions] == list(range(size))
@@ -0,0 +1,53 @@
+import os
+import sys
+from unittest.mock import patch
+
+# Add project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import throttle
+
+def test_throttle_enforces_file_budget():
+    """Tests that exceeding the files/s budget makes the caller sleep."""
+    clock = [100.0]
+    sleeps = []
+    with patch('time.monotonic', lambda: clock[0]), patch('time.sleep', sleeps.append):
+        t = throttle.Throttle(files_per_sec=10, latency_target_ms=None)
+        for _ in range(10):
+            t.acquire(files=1)
+        assert sleeps == []
+        t.acquire(files=1)
+        assert sleeps == [0.1]
+
+def test_throttle_backs_off_when_latency_rises():
+    """Tests that high request latency shrinks the budget and low latency restores it."""
+    clock = [100.0]
+    monitor = throttle.LatencyMonitor()
+    with patch('time.monotonic', lambda: clock[0]), patch('time.sleep'):
+        t = throttle.Throttle(mb_per_sec=10, latency_target_ms=200, monitor=monitor)
+        monitor.record(1.0)
+        clock[0] += 2
+        t.acquire(num_bytes=1)
+        assert t.factor == 0.5
+
+        for _ in range(50):
+            monitor.record(0.01)
+        clock[0] += 2
+        t.acquire(num_bytes=1)
+        assert t.factor == 0.625
+
+def test_latency_decays_while_idle():
+    """Tests that one slow request stops holding the indexer back once requests stop."""
+    clock = [100.0]
+    monitor = throttle.LatencyMonitor()
+    with patch('time.monotonic', lambda: clock[0]), patch('time.sleep'):
+        t = throttle.Throttle(mb_per_sec=10, latency_target_ms=200, monitor=monitor)
+        monitor.record(5.0)
+        clock[0] += 2
+        t.acquire(num_bytes=1)
+        assert t.factor == 0.5
+
+        clock[0] += 10 * throttle.IDLE_HALF_LIFE
+        assert monitor.current_ms() < 10
+        t.acquire(num_bytes=1)
+        assert t.factor == 0.625
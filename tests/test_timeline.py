@@ -0,0 +1,64 @@
+import os
+import sys
+import pytest
+
+# Add project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import database, timeline
+
+TAKEN = [
+    '2015-07-04T10:00:00',
+    '2015-07-04T09:00:00',
+    '2015-12-25T08:00:00',
+    '2019-07-04T12:00:00',
+    None,
+    'unknown',
+]
+
+@pytest.fixture(params=['flat', 'normalized'])
+def db(request, tmp_path, monkeypatch):
+    monkeypatch.setenv("PHOTOSHARE_DATABASE_FILE", str(tmp_path / "test.db"))
+    database.init_db()
+    conn = database.get_db_connection()
+    conn.executemany("INSERT INTO photos (path, width, height, datetime_taken) VALUES (?, 1, 1, ?)", [(f"/p/{i}.jpg", t) for i, t in enumerate(TAKEN)])
+    conn.commit()
+    conn.close()
+    if request.param == 'normalized':
+        database.normalize_paths()
+    return request.param
+
+def test_generated_columns_and_histogram(db):
+    conn = database.get_db_connection()
+    rows = conn.execute("SELECT taken_year, taken_month, taken_month_day FROM photos ORDER BY id").fetchall()
+    assert [tuple(r) for r in rows] == [(2015, 7, 704), (2015, 7, 704), (2015, 12, 1225), (2019, 7, 704), (None, None, None), (None, None, None)]
+    plan = ' '.join(r[3] for r in conn.execute("EXPLAIN QUERY PLAN SELECT id FROM photos WHERE taken_month_day = 704 ORDER BY datetime_taken, id"))
+    assert 'idx_photos_taken_month_day' in plan
+
+    assert timeline.histogram() == [{"year": 2015, "count": 3}, {"year": 2019, "count": 1}]
+    assert timeline.histogram(2015) == [{"year": 2015, "month": 7, "count": 2}, {"year": 2015, "month": 12, "count": 1}]
+
+    # The rollup follows date edits and soft deletes
+    conn.execute("UPDATE photos SET datetime_taken = '2019-01-01T00:00:00' WHERE id = 3")
+    conn.execute("UPDATE photos SET datetime_deleted = '2024-01-01' WHERE id = 1")
+    conn.execute("DELETE FROM photos WHERE id = 4")
+    conn.commit()
+    conn.close()
+    assert timeline.histogram() == [{"year": 2015, "count": 1}, {"year": 2019, "count": 1}]
+
+def test_date_sequences(db):
+    conn = database.get_db_connection()
+    on_this_day = timeline.parse_sequence('on-this-day', '07-04')
+    assert on_this_day == ('taken_month_day', 704)
+    assert timeline.sequence_photo_id(conn, *on_this_day) == 2
+    assert timeline.sequence_photo_id(conn, *on_this_day, 2, 'next') == 1
+    assert timeline.sequence_photo_id(conn, *on_this_day, 4, 'next') == 2
+    assert timeline.sequence_photo_id(conn, *on_this_day, 2, 'previous') == 4
+    assert timeline.sequence_photo_id(conn, *timeline.parse_sequence('year:2015'), 1, 'next') == 3
+    assert timeline.count_photos(*on_this_day) == 3
+    assert timeline.count_photos('taken_year', 2015) == 3
+    assert timeline.parse_sequence('new') is None
+    for bad in [('year:abc', None), ('on-this-day', '02-30')]:
+        with pytest.raises(ValueError):
+            timeline.parse_sequence(*bad)
+    conn.close()